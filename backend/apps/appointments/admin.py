@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment, AppointmentHistory, LiveQueue
+from .models import Appointment, AppointmentHistory, LiveQueue, QueueSequence, DailyTokenCounter, ConsultationStats, AppointmentSeries
 
 
 @admin.register(Appointment)
@@ -26,5 +26,31 @@ class AppointmentHistoryAdmin(admin.ModelAdmin):
 
 @admin.register(LiveQueue)
 class LiveQueueAdmin(admin.ModelAdmin):
-    list_display = ['appointment', 'queue_position', 'status', 'called_at']
-    list_filter = ['status']
+    list_display = ['appointment', 'queue_date', 'priority', 'sequence', 'status', 'called_at']
+    list_filter = ['status', 'priority', 'queue_date']
+
+
+@admin.register(QueueSequence)
+class QueueSequenceAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'date', 'last_sequence']
+    list_filter = ['date']
+
+
+@admin.register(DailyTokenCounter)
+class DailyTokenCounterAdmin(admin.ModelAdmin):
+    list_display = ['clinic', 'date', 'last_token', 'updated_at']
+    list_filter = ['date']
+
+
+@admin.register(ConsultationStats)
+class ConsultationStatsAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'appointment_type', 'ewma_minutes', 'samples', 'updated_at']
+    list_filter = ['appointment_type']
+
+
+@admin.register(AppointmentSeries)
+class AppointmentSeriesAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'doctor', 'clinic', 'weekdays', 'start_time', 'start_date', 'end_date', 'materialized_until', 'is_active']
+    list_filter = ['is_active', 'interval_weeks']
+    search_fields = ['patient__user__first_name', 'doctor__user__first_name']
+
@@ -0,0 +1,109 @@
+"""
+Contention-safe appointment booking.
+
+The unique_active_doctor_slot constraint is the source of truth: a
+booking is a single INSERT inside a savepoint, and a violation of that
+constraint becomes a SlotConflictError instead of a pre-check query that
+can race. Any other integrity error is a bug, not a conflict, and is
+re-raised.
+
+Clients may first place a short-lived hold on a slot while the patient
+fills in the booking form. Holds live in the cache (cache.add is atomic),
+so a popular slot is claimed by one client without touching the database.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from apps.core.exceptions import SlotConflictError
+from .models import Appointment
+
+HOLD_TTL = 120  # seconds
+
+SLOT_CONSTRAINT = 'unique_active_doctor_slot'
+# SQLite names the columns of a violated unique index instead of the index
+SLOT_COLUMNS = 'appointments.doctor_id, appointments.appointment_date, appointments.start_time'
+
+
+def is_slot_conflict(error) -> bool:
+    """Whether an IntegrityError came from the unique_active_doctor_slot constraint."""
+    diag = getattr(error.__cause__, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None)
+    if constraint:
+        return constraint == SLOT_CONSTRAINT
+    message = str(error)
+    return SLOT_CONSTRAINT in message or SLOT_COLUMNS in message
+
+
+def _hold_key(doctor_id, day, start_time):
+    return f"slot_hold:{doctor_id}:{day.isoformat()}:{start_time.strftime('%H:%M')}"
+
+
+def place_hold(doctor_id, day, start_time, user_id):
+    """Claim a slot for HOLD_TTL seconds. Returns a hold token, or None if already held."""
+    token = uuid.uuid4().hex
+    if cache.add(_hold_key(doctor_id, day, start_time), {'token': token, 'user': str(user_id)}, HOLD_TTL):
+        return token
+    return None
+
+
+def release_hold(doctor_id, day, start_time, token):
+    """Drop a hold if ``token`` still owns it."""
+    key = _hold_key(doctor_id, day, start_time)
+    hold = cache.get(key)
+    if hold and hold['token'] == token:
+        cache.delete(key)
+        return True
+    return False
+
+
+def check_hold(doctor_id, day, start_time, token=None):
+    """Raise SlotConflictError if someone else holds the slot."""
+    hold = cache.get(_hold_key(doctor_id, day, start_time))
+    if hold and hold['token'] != token:
+        raise SlotConflictError('This time slot is being booked by someone else')
+
+
+def book_appointment(hold_token=None, notify=True, **fields) -> Appointment:
+    """
+    Create an appointment with a single INSERT attempt.
+    
+    Raises SlotConflictError if the slot is held by another client or was
+    booked concurrently. ``notify=False`` skips the confirmation message.
+    """
+    doctor_id = fields.get('doctor_id') or fields['doctor'].id
+    day = fields['appointment_date']
+    start_time = fields['start_time']
+    
+    check_hold(doctor_id, day, start_time, hold_token)
+    
+    try:
+        with transaction.atomic():
+            appointment = Appointment(**fields)
+            appointment._skip_notifications = not notify
+            appointment.save()
+    except IntegrityError as e:
+        if not is_slot_conflict(e):
+            raise
+        raise SlotConflictError()
+    
+    if hold_token:
+        release_hold(doctor_id, day, start_time, hold_token)
+    return appointment
+
+
+def move_appointment(appointment, **changes) -> Appointment:
+    """Save new date/time (and other) fields, resolving slot conflicts like booking."""
+    for field, value in changes.items():
+        setattr(appointment, field, value)
+    
+    try:
+        with transaction.atomic():
+            appointment.save()
+    except IntegrityError as e:
+        appointment.refresh_from_db()
+        if not is_slot_conflict(e):
+            raise
+        raise SlotConflictError()
+    return appointment
@@ -0,0 +1,242 @@
+"""
+Bulk appointment creation for clinic data migrations.
+
+A batch is validated with a handful of set-based queries (no per-row
+lookups). Fees are resolved once per doctor-clinic, tokens are reserved
+as one range per clinic-day, and appointments and their history rows are
+written with bulk_create. bulk_create skips model signals, so their side
+effects run here once per batch: cache invalidation after commit, and one
+coalesced publish of confirmation messages, which can also be suppressed.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from apps.core.dispatch import batched_dispatch
+from apps.core.exceptions import SlotConflictError
+from apps.clinics.models import Clinic
+from apps.doctors.availability import invalidate_booked
+from apps.doctors.models import Doctor, DoctorClinic
+from apps.patients.models import Patient
+from .booking import is_slot_conflict
+from .calendar import bump_calendar_version
+from .models import BOOKED_STATUSES, Appointment, AppointmentHistory, AppointmentSeries, DailyTokenCounter
+from .stats import invalidate_doctor_dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 5000
+
+# Statuses an imported appointment may start in; tokens are only issued
+# for the first two, matching Appointment.save()
+IMPORT_STATUSES = ['scheduled', 'confirmed', 'completed', 'cancelled', 'no_show']
+TOKEN_STATUSES = ['scheduled', 'confirmed']
+
+
+class BulkAppointmentRowSerializer(serializers.Serializer):
+    """Shape of one row in a bulk import; references are validated per batch."""
+    
+    patient = serializers.UUIDField()
+    doctor = serializers.UUIDField()
+    clinic = serializers.UUIDField()
+    appointment_date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    appointment_type = serializers.ChoiceField(choices=Appointment.APPOINTMENT_TYPES, default='new')
+    status = serializers.ChoiceField(choices=IMPORT_STATUSES, default='scheduled')
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+    consultation_fee = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    series = serializers.UUIDField(required=False)
+    
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({'end_time': 'End time must be after start time.'})
+        return attrs
+
+
+def validate_rows(rows, clinic_ids=None):
+    """
+    Validate a batch of raw rows.
+    
+    Args:
+        rows: Iterable of dicts.
+        clinic_ids: If given, rows for other clinics are rejected.
+    
+    Returns (valid, errors): valid is a list of (index, data) pairs and
+    errors a list of {'row': index, 'errors': ...} dicts.
+    """
+    valid = []
+    errors = []
+    for index, row in enumerate(rows):
+        serializer = BulkAppointmentRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'row': index, 'errors': serializer.errors})
+    
+    if not valid:
+        return valid, errors
+    
+    # Resolve every reference with one query per model
+    patients = set(Patient.objects.filter(
+        id__in={data['patient'] for _, data in valid}, is_active=True
+    ).values_list('id', flat=True))
+    doctors = dict(Doctor.objects.filter(
+        id__in={data['doctor'] for _, data in valid}, is_active=True
+    ).values_list('id', 'consultation_fee'))
+    clinics = set(Clinic.objects.filter(
+        id__in={data['clinic'] for _, data in valid}, is_active=True
+    ).values_list('id', flat=True))
+    series_ids = {data['series'] for _, data in valid if data.get('series')}
+    series = {
+        series_id: (patient_id, doctor_id, clinic_id)
+        for series_id, patient_id, doctor_id, clinic_id in AppointmentSeries.objects.filter(
+            id__in=series_ids
+        ).values_list('id', 'patient_id', 'doctor_id', 'clinic_id')
+    } if series_ids else {}
+    doctor_clinics = {
+        (doctor_id, clinic_id): fee
+        for doctor_id, clinic_id, fee in DoctorClinic.objects.filter(
+            doctor_id__in=doctors, clinic_id__in=clinics, is_active=True
+        ).values_list('doctor_id', 'clinic_id', 'consultation_fee')
+    }
+    
+    # Slots already taken, and slots taken earlier in this batch
+    taken = set(Appointment.objects.filter(
+        doctor_id__in=doctors,
+        appointment_date__in={data['appointment_date'] for _, data in valid},
+        status__in=BOOKED_STATUSES,
+        is_active=True
+    ).values_list('doctor_id', 'appointment_date', 'start_time'))
+    
+    checked = []
+    for index, data in valid:
+        row_errors = {}
+        if data['patient'] not in patients:
+            row_errors['patient'] = 'Unknown patient.'
+        if data['doctor'] not in doctors:
+            row_errors['doctor'] = 'Unknown doctor.'
+        if data['clinic'] not in clinics or (clinic_ids is not None and data['clinic'] not in clinic_ids):
+            row_errors['clinic'] = 'Unknown clinic.'
+        elif data['doctor'] in doctors and (data['doctor'], data['clinic']) not in doctor_clinics:
+            row_errors['clinic'] = 'Doctor does not practise at this clinic.'
+        
+        if data.get('series'):
+            if data['series'] not in series:
+                row_errors['series'] = 'Unknown series.'
+            elif series[data['series']] != (data['patient'], data['doctor'], data['clinic']):
+                row_errors['series'] = 'Series belongs to another patient, doctor or clinic.'
+        
+        if data['status'] in BOOKED_STATUSES:
+            slot = (data['doctor'], data['appointment_date'], data['start_time'])
+            if slot in taken:
+                row_errors['start_time'] = 'This time slot is already booked.'
+            taken.add(slot)
+        
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+            continue
+        
+        if data.get('consultation_fee') is None:
+            data['consultation_fee'] = doctor_clinics[(data['doctor'], data['clinic'])] or doctors[data['doctor']]
+        checked.append((index, data))
+    
+    errors.sort(key=lambda error: error['row'])
+    return checked, errors
+
+
+def invalidate_caches(appointments):
+    """
+    Drop the cached availability, dashboard stats and calendar feeds that
+    ``appointments`` appear in, once the current transaction commits.
+    
+    Doing it earlier would let a concurrent reader rebuild a cache from the
+    pre-commit rows under the new version and keep serving it.
+    """
+    doctor_days = defaultdict(set)
+    for appointment in appointments:
+        doctor_days[appointment.doctor_id].add(appointment.appointment_date)
+    patient_ids = {appointment.patient_id for appointment in appointments}
+    
+    def invalidate():
+        for doctor_id, days in doctor_days.items():
+            invalidate_booked(doctor_id, *days)
+            invalidate_doctor_dashboard_stats(doctor_id, *days)
+        bump_calendar_version('doctor', *doctor_days)
+        bump_calendar_version('patient', *patient_ids)
+    
+    transaction.on_commit(invalidate)
+
+
+def bulk_create_appointments(rows, notify=True, changed_by=None, note='Bulk import'):
+    """
+    Insert validated rows (the data half of validate_rows output).
+    
+    Returns the created appointments. Raises SlotConflictError if a slot
+    was booked concurrently between validation and insert.
+    """
+    appointments = [
+        Appointment(
+            patient_id=data['patient'],
+            doctor_id=data['doctor'],
+            clinic_id=data['clinic'],
+            appointment_date=data['appointment_date'],
+            start_time=data['start_time'],
+            end_time=data['end_time'],
+            appointment_type=data['appointment_type'],
+            status=data['status'],
+            reason=data['reason'],
+            consultation_fee=data['consultation_fee'],
+            series_id=data.get('series')
+        )
+        for data in rows
+    ]
+    if not appointments:
+        return []
+    
+    # One token range per clinic-day, issued in start-time order
+    needs_token = defaultdict(list)
+    for appointment in appointments:
+        if appointment.status in TOKEN_STATUSES:
+            needs_token[(appointment.clinic_id, appointment.appointment_date)].append(appointment)
+    
+    with batched_dispatch():
+        try:
+            with transaction.atomic():
+                for (clinic_id, day), group in needs_token.items():
+                    first = DailyTokenCounter.allocate(clinic_id, day, count=len(group))
+                    group.sort(key=lambda appointment: appointment.start_time)
+                    for offset, appointment in enumerate(group):
+                        appointment.token_number = first + offset
+                
+                Appointment.objects.bulk_create(appointments, batch_size=1000)
+                AppointmentHistory.objects.bulk_create([
+                    AppointmentHistory(
+                        appointment=appointment,
+                        previous_status='',
+                        new_status=appointment.status,
+                        changed_by=changed_by,
+                        notes=note
+                    )
+                    for appointment in appointments
+                ], batch_size=1000)
+                
+                if notify:
+                    from apps.notifications.messages import confirmation_messages
+                    from apps.notifications.outbox import enqueue
+                    confirmed = Appointment.objects.filter(
+                        id__in=[appointment.id for appointment in appointments],
+                        status__in=TOKEN_STATUSES
+                    ).select_related('patient__user', 'doctor__user', 'clinic')
+                    enqueue([message for appointment in confirmed for message in confirmation_messages(appointment)])
+        except IntegrityError as e:
+            if not is_slot_conflict(e):
+                raise
+            raise SlotConflictError('One or more time slots were booked while importing')
+    
+    invalidate_caches(appointments)
+    
+    logger.info(f"Bulk created {len(appointments)} appointments")
+    return appointments
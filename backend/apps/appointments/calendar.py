@@ -0,0 +1,186 @@
+"""
+ICS calendar feeds.
+
+Calendar apps poll feeds every few minutes, so each doctor and patient has
+a change version in the cache (a random tag plus the time it changed).
+Appointment writes bump it. A feed request compares the version against
+If-None-Match / If-Modified-Since and answers 304 before any appointment
+is read. Full responses are streamed straight from a database cursor.
+"""
+import secrets
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Appointment, CalendarFeedToken
+
+# Feed range defaults and caps, in days
+DEFAULT_DAYS_BACK = 30
+DEFAULT_DAYS_AHEAD = 180
+MAX_DAYS_BACK = 365
+MAX_DAYS_AHEAD = 730
+
+FEED_TOKEN_CACHE_TTL = 5 * 60
+EVENTS_PER_CHUNK = 200
+
+
+# Change versions
+
+def _version_key(kind, owner_id):
+    return f"calendar:version:{kind}:{owner_id}"
+
+
+def get_calendar_version(kind, owner_id):
+    """Return (tag, changed_at) for a doctor or patient calendar."""
+    key = _version_key(kind, owner_id)
+    version = cache.get(key)
+    if version is None:
+        # Unknown (first request or evicted): start a fresh version now
+        cache.add(key, (uuid.uuid4().hex, timezone.now().replace(microsecond=0)), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_calendar_version(kind, *owner_ids):
+    changed_at = timezone.now().replace(microsecond=0)
+    cache.set_many({
+        _version_key(kind, owner_id): (uuid.uuid4().hex, changed_at)
+        for owner_id in owner_ids if owner_id
+    }, None)
+
+
+# Feed tokens
+
+def _token_cache_key(token):
+    return f"calendar:token:{token}"
+
+
+def create_feed_token(user) -> CalendarFeedToken:
+    return CalendarFeedToken.objects.create(user=user, token=secrets.token_urlsafe(32))
+
+
+def revoke_feed_token(feed_token):
+    feed_token.is_active = False
+    feed_token.save(update_fields=['is_active', 'updated_at'])
+    cache.delete(_token_cache_key(feed_token.token))
+
+
+def resolve_feed_token(token):
+    """Map a feed token to ('doctor' | 'patient', owner_id), or None."""
+    key = _token_cache_key(token)
+    owner = cache.get(key)
+    if owner is not None:
+        return owner or None
+    
+    feed_token = CalendarFeedToken.objects.filter(
+        token=token,
+        is_active=True
+    ).select_related('user__doctor_profile', 'user__patient_profile').first()
+    
+    owner = ()
+    if feed_token:
+        user = feed_token.user
+        if user.user_type == 'doctor' and hasattr(user, 'doctor_profile'):
+            owner = ('doctor', user.doctor_profile.id)
+        elif user.user_type == 'patient' and hasattr(user, 'patient_profile'):
+            owner = ('patient', user.patient_profile.id)
+        CalendarFeedToken.objects.filter(pk=feed_token.pk).update(last_used_at=timezone.now())
+    
+    # Unknown tokens are cached too, so a stale subscription can't hammer the database
+    cache.set(key, owner, FEED_TOKEN_CACHE_TTL)
+    return owner or None
+
+
+# Rendering
+
+def feed_range(days_back=None, days_ahead=None):
+    today = date.today()
+    days_back = min(max(int(days_back or DEFAULT_DAYS_BACK), 0), MAX_DAYS_BACK)
+    days_ahead = min(max(int(days_ahead or DEFAULT_DAYS_AHEAD), 0), MAX_DAYS_AHEAD)
+    return today - timedelta(days=days_back), today + timedelta(days=days_ahead)
+
+
+def feed_appointments(kind, owner_id, start, end):
+    return Appointment.objects.filter(
+        **{f'{kind}_id': owner_id},
+        appointment_date__range=(start, end),
+        is_active=True
+    ).select_related('clinic', 'doctor__user', 'patient__user').order_by('appointment_date', 'start_time')
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold content lines at 75 octets as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Don't split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _local(day, at):
+    # Floating local time: appointments are stored as clinic wall-clock times
+    return datetime.combine(day, at).strftime('%Y%m%dT%H%M%S')
+
+
+def _event(appointment, kind, stamp):
+    if kind == 'doctor':
+        summary = f"{appointment.patient.user.full_name} ({appointment.get_appointment_type_display()})"
+    else:
+        summary = f"Dr. {appointment.doctor.user.full_name} at {appointment.clinic.name}"
+    
+    location = f"{appointment.clinic.name}, {appointment.clinic.address}"
+    description = f"Token {appointment.token_number or '-'} - {appointment.get_status_display()}"
+    
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{appointment.id}@hms",
+        f"DTSTAMP:{stamp}",
+        f"LAST-MODIFIED:{appointment.updated_at.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART:{_local(appointment.appointment_date, appointment.start_time)}",
+        f"DTEND:{_local(appointment.appointment_date, appointment.end_time)}",
+        f"SUMMARY:{_escape(summary)}",
+        f"LOCATION:{_escape(location)}",
+        f"DESCRIPTION:{_escape(description)}",
+        f"STATUS:{'CANCELLED' if appointment.status in ['cancelled', 'no_show'] else 'CONFIRMED'}",
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+def render_feed(kind, appointments, name):
+    """Yield the ICS document in chunks of EVENTS_PER_CHUNK events."""
+    stamp = timezone.now().astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//HMS//Appointments//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f"X-WR-CALNAME:{_escape(name)}",
+    ])
+    
+    chunk = []
+    for appointment in appointments.iterator(chunk_size=EVENTS_PER_CHUNK):
+        chunk.append(_event(appointment, kind, stamp))
+        if len(chunk) >= EVENTS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('END:VCALENDAR\r\n')
+    yield ''.join(chunk)
@@ -0,0 +1,122 @@
+"""
+Wait time estimates for the live queue.
+
+Each doctor keeps an exponentially weighted moving average of
+consultation length per appointment type (ConsultationStats). A
+completed consultation folds into it with one UPDATE. Estimates are not
+stored: when the queue is read, each entry's wait is a running sum over
+those averages for the patients ahead of it.
+"""
+import logging
+from itertools import accumulate
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.doctors.models import Doctor
+from .models import ConsultationStats
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest consultation in the moving average
+EWMA_ALPHA = 0.2
+
+# Samples needed before a type's average replaces the doctor's configured duration
+MIN_SAMPLES = 3
+
+# Durations outside this range (in minutes) are treated as bookkeeping noise,
+# e.g. a consultation that was never marked complete until the end of the day
+MIN_DURATION = 1
+MAX_DURATION = 180
+
+
+def record_consultation(doctor_id, appointment_type, started_at, completed_at):
+    """Fold one finished consultation into the doctor's moving average."""
+    if not started_at or not completed_at:
+        return
+    
+    minutes = (completed_at - started_at).total_seconds() / 60
+    if not MIN_DURATION <= minutes <= MAX_DURATION:
+        logger.info(f"Ignoring consultation of {minutes:.1f} min for doctor {doctor_id}")
+        return
+    
+    stats = ConsultationStats.objects.filter(doctor_id=doctor_id, appointment_type=appointment_type)
+    updated = stats.update(
+        ewma_minutes=F('ewma_minutes') + EWMA_ALPHA * (minutes - F('ewma_minutes')),
+        samples=F('samples') + 1,
+        updated_at=timezone.now()
+    )
+    if updated:
+        return
+    
+    try:
+        with transaction.atomic():
+            ConsultationStats.objects.create(
+                doctor_id=doctor_id,
+                appointment_type=appointment_type,
+                ewma_minutes=minutes
+            )
+    except IntegrityError:
+        # Created concurrently - fold this sample into that row instead
+        stats.update(
+            ewma_minutes=F('ewma_minutes') + EWMA_ALPHA * (minutes - F('ewma_minutes')),
+            samples=F('samples') + 1,
+            updated_at=timezone.now()
+        )
+
+
+def expected_durations(doctor_ids):
+    """Map doctor_id -> function of appointment_type giving expected consultation minutes."""
+    defaults = dict(Doctor.objects.filter(id__in=doctor_ids).values_list('id', 'consultation_duration'))
+    learned = {}
+    for doctor_id, appointment_type, ewma in ConsultationStats.objects.filter(
+        doctor_id__in=doctor_ids,
+        samples__gte=MIN_SAMPLES
+    ).values_list('doctor_id', 'appointment_type', 'ewma_minutes'):
+        learned[(doctor_id, appointment_type)] = ewma
+    
+    def for_doctor(doctor_id):
+        default = defaults.get(doctor_id)
+        return lambda appointment_type: learned.get((doctor_id, appointment_type), default)
+    return {doctor_id: for_doctor(doctor_id) for doctor_id in doctor_ids}
+
+
+def fill_wait_estimates(entries):
+    """
+    Set estimated_wait_time (minutes) on active queue entries read in
+    serving order. Nothing is written back.
+    
+    Per doctor, the patient currently called or with the doctor contributes
+    their expected time left; each waiting patient then adds their own
+    expected duration for everyone behind them.
+    """
+    by_doctor = {}
+    for entry in entries:
+        by_doctor.setdefault(entry.doctor_id, []).append(entry)
+    if not by_doctor:
+        return
+    
+    durations = expected_durations(list(by_doctor))
+    now = timezone.now()
+    for doctor_id, doctor_entries in by_doctor.items():
+        duration_for = durations[doctor_id]
+        
+        # Time left for patients already called or in consultation
+        in_service = 0.0
+        waiting = []
+        for entry in doctor_entries:
+            expected = duration_for(entry.appointment.appointment_type) or 0
+            if entry.status == 'waiting':
+                waiting.append((entry, expected))
+                continue
+            
+            entry.estimated_wait_time = 0
+            if entry.status in ('called', 'with_doctor'):
+                elapsed = (now - entry.started_at).total_seconds() / 60 if entry.started_at else 0
+                in_service = max(in_service, expected - elapsed, 0)
+        
+        # Wait for position n is the in-service remainder plus positions 1..n-1
+        offsets = accumulate((expected for _, expected in waiting), initial=in_service)
+        for (entry, _), offset in zip(waiting, offsets):
+            entry.estimated_wait_time = round(offset)
@@ -0,0 +1,153 @@
+"""
+Live queue event fan-out.
+
+Queue changes are published once per change to a per-clinic and a per-doctor
+channel. Each ASGI process keeps a single upstream subscription and fans the
+events out to its local stream subscribers, so hundreds of waiting-room
+displays cost one broadcast instead of hundreds of polling queries.
+
+Backends (settings.QUEUE_EVENTS_BACKEND):
+    redis: Redis pub/sub, works across web and worker processes.
+    local: In-process only, for single-process development servers.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from apps.core.redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'hms:queue:'
+
+# Events buffered per subscriber before it is told to resync
+SUBSCRIBER_BUFFER = 100
+
+RESYNC_EVENT = json.dumps({'event': 'queue.resync'})
+
+
+def clinic_channel(clinic_id) -> str:
+    return f"{CHANNEL_PREFIX}clinic:{clinic_id}"
+
+
+def doctor_channel(doctor_id) -> str:
+    return f"{CHANNEL_PREFIX}doctor:{doctor_id}"
+
+
+class QueueEventHub:
+    """
+    Per-process registry of live queue stream subscribers.
+    """
+    
+    def __init__(self, backend='redis'):
+        self.backend = backend
+        self._subscribers = {}  # channel -> set of asyncio.Queue
+        self._loop = None
+        self._reader = None
+    
+    def publish(self, channels, payload: dict):
+        """Publish an event to the given channels (callable from sync code)."""
+        data = json.dumps(payload, cls=DjangoJSONEncoder)
+        
+        if self.backend == 'redis':
+            pipeline = get_redis_client().pipeline(transaction=False)
+            for channel in channels:
+                pipeline.publish(channel, data)
+            pipeline.execute()
+        elif self._loop and not self._loop.is_closed():
+            for channel in channels:
+                self._loop.call_soon_threadsafe(self._fan_out, channel, data)
+    
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        """Register a local subscriber queue for a channel."""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        
+        if self.backend == 'redis':
+            self._ensure_reader()
+        
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+    
+    def _fan_out(self, channel: str, data: str):
+        """Deliver an event to every local subscriber of a channel."""
+        for queue in self._subscribers.get(channel, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and ask it to refetch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_EVENT)
+    
+    def _ensure_reader(self):
+        """Start the single upstream Redis subscription for this event loop."""
+        if self._reader and not self._reader.done() and self._reader.get_loop() is self._loop:
+            return
+        self._reader = self._loop.create_task(self._read_redis())
+    
+    async def _read_redis(self):
+        from redis import asyncio as aioredis
+        
+        while self._subscribers:
+            client = aioredis.from_url(settings.REDIS_URL)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                    while self._subscribers:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=5.0)
+                        if message and message['type'] == 'pmessage':
+                            self._fan_out(message['channel'].decode(), message['data'].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Queue event subscription failed: {e}")
+                # Events may have been missed while disconnected
+                for channel in list(self._subscribers):
+                    self._fan_out(channel, RESYNC_EVENT)
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+hub = QueueEventHub(backend=getattr(settings, 'QUEUE_EVENTS_BACKEND', 'redis'))
+
+
+def publish_queue_change(clinic_id, doctor_id, *conditions, **filters):
+    """
+    Publish the current state of the matching LiveQueue entries once the
+    surrounding transaction commits.
+    """
+    transaction.on_commit(lambda: _publish_entries(clinic_id, doctor_id, conditions, filters))
+
+
+def _publish_entries(clinic_id, doctor_id, conditions, filters):
+    from .models import LiveQueue
+    from .queue import queue_entries
+    from .serializers import LiveQueueSerializer
+    
+    try:
+        entries = queue_entries(LiveQueue.objects.filter(*conditions, **filters))
+        hub.publish(
+            [clinic_channel(clinic_id), doctor_channel(doctor_id)],
+            {
+                'event': 'queue.updated',
+                'clinic': str(clinic_id),
+                'doctor': str(doctor_id),
+                'entries': LiveQueueSerializer(entries, many=True).data,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to publish queue change: {e}")
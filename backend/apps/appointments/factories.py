@@ -0,0 +1,64 @@
+"""
+factory-boy factories for appointments, queue entries and series.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import factory
+
+from apps.clinics.factories import ClinicFactory
+from apps.doctors.factories import DoctorFactory
+from apps.patients.factories import PatientFactory
+from .models import Appointment, AppointmentSeries, LiveQueue
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def _slot_start(n):
+    minutes = (n % SLOTS_PER_DAY) * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def _slot_end(appointment):
+    start = datetime.combine(appointment.appointment_date, appointment.start_time)
+    return min((start + timedelta(minutes=SLOT_MINUTES)).time(), time(23, 59))
+
+
+class AppointmentFactory(factory.django.DjangoModelFactory):
+    """Each appointment gets its own quarter-hour slot, so sequences never collide."""
+    
+    class Meta:
+        model = Appointment
+    
+    patient = factory.SubFactory(PatientFactory)
+    doctor = factory.SubFactory(DoctorFactory)
+    clinic = factory.SubFactory(ClinicFactory)
+    appointment_date = factory.Sequence(lambda n: date.today() + timedelta(days=n // SLOTS_PER_DAY))
+    start_time = factory.Sequence(_slot_start)
+    end_time = factory.LazyAttribute(_slot_end)
+    consultation_fee = Decimal('500.00')
+
+
+class LiveQueueFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = LiveQueue
+    
+    appointment = factory.SubFactory(AppointmentFactory, status='checked_in')
+    clinic = factory.SelfAttribute('appointment.clinic')
+    doctor = factory.SelfAttribute('appointment.doctor')
+    queue_date = factory.SelfAttribute('appointment.appointment_date')
+    sequence = factory.Sequence(lambda n: n + 1)
+
+
+class AppointmentSeriesFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = AppointmentSeries
+    
+    patient = factory.SubFactory(PatientFactory)
+    doctor = factory.SubFactory(DoctorFactory)
+    clinic = factory.SubFactory(ClinicFactory)
+    weekdays = factory.LazyFunction(lambda: [0])
+    start_time = time(9, 0)
+    end_time = time(9, 30)
+    start_date = factory.LazyFunction(date.today)
@@ -0,0 +1,62 @@
+"""
+ICS calendar feed endpoint.
+
+Plain Django view: calendar apps authenticate with the feed token in the
+URL, and conditional GET handling (ETag / Last-Modified -> 304) runs off
+the cached change version before any appointment is queried.
+"""
+from datetime import datetime, time
+
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+
+from .calendar import feed_appointments, feed_range, get_calendar_version, render_feed, resolve_feed_token
+
+
+def _feed_state(request, token):
+    """Resolve owner, version and range once per request."""
+    if not hasattr(request, '_calendar_feed'):
+        owner = resolve_feed_token(token)
+        if owner is None:
+            raise Http404('Unknown calendar feed')
+        
+        try:
+            start, end = feed_range(request.GET.get('days_back'), request.GET.get('days_ahead'))
+        except ValueError:
+            start, end = feed_range()
+        
+        tag, changed_at = get_calendar_version(*owner)
+        # The window moves daily, so a new day is a change too
+        today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        request._calendar_feed = {
+            'owner': owner,
+            'range': (start, end),
+            'etag': f"{tag}-{start.isoformat()}-{end.isoformat()}",
+            'last_modified': max(changed_at, today),
+        }
+    return request._calendar_feed
+
+
+def _etag(request, token):
+    return _feed_state(request, token)['etag']
+
+
+def _last_modified(request, token):
+    return _feed_state(request, token)['last_modified']
+
+
+@require_GET
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def calendar_feed(request, token):
+    state = _feed_state(request, token)
+    kind, owner_id = state['owner']
+    start, end = state['range']
+    
+    response = StreamingHttpResponse(
+        render_feed(kind, feed_appointments(kind, owner_id, start, end), 'HMS Appointments'),
+        content_type='text/calendar; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
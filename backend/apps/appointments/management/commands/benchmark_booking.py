@@ -0,0 +1,165 @@
+"""
+Benchmark booking hot paths under parallel load.
+
+Usage:
+    python manage.py benchmark_booking --threads 16 --operations 2000
+    python manage.py benchmark_booking --mode slot --threads 32 --operations 320
+"""
+import statistics
+import threading
+import time as clock
+from datetime import date, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.appointments.booking import book_appointment
+from apps.appointments.models import Appointment, DailyTokenCounter
+from apps.clinics.models import Clinic
+from apps.core.exceptions import SlotConflictError
+from apps.doctors.models import DoctorClinic
+from apps.patients.models import Patient
+
+
+class Command(BaseCommand):
+    help = 'Benchmark token allocation, or many clients booking one slot, under parallel load.'
+    
+    # A date no real booking uses, so the benchmark never touches live data
+    BENCHMARK_DATE = date(2999, 12, 31)
+    BENCHMARK_TIME = time(10, 0)
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument('--clinic', help='Clinic ID (defaults to the first clinic)')
+        parser.add_argument(
+            '--mode',
+            choices=['tokens', 'slot'],
+            default='tokens',
+            help="'tokens' allocates daily tokens; 'slot' has every worker book the same slot"
+        )
+    
+    def handle(self, *args, **options):
+        clinic = self._get_clinic(options['clinic'])
+        if options['mode'] == 'slot':
+            return self._benchmark_slot(clinic, options['threads'], options['operations'])
+        
+        threads = options['threads']
+        operations = options['operations']
+        
+        DailyTokenCounter.objects.filter(clinic=clinic, date=self.BENCHMARK_DATE).delete()
+        try:
+            results, elapsed = self._run(
+                threads,
+                operations,
+                lambda: DailyTokenCounter.allocate(clinic.id, self.BENCHMARK_DATE)
+            )
+        finally:
+            DailyTokenCounter.objects.filter(clinic=clinic, date=self.BENCHMARK_DATE).delete()
+        
+        tokens = [value for value, _ in results]
+        duplicates = len(tokens) - len(set(tokens))
+        gaps = (max(tokens) - len(tokens)) if tokens else 0
+        
+        self._report('Token allocation', results, elapsed, threads)
+        self.stdout.write(f"  duplicates:  {duplicates}")
+        self.stdout.write(f"  gaps:        {gaps}")
+        
+        if duplicates:
+            raise CommandError(f"{duplicates} duplicate tokens allocated")
+    
+    def _benchmark_slot(self, clinic, threads, operations):
+        doctor_clinic = DoctorClinic.objects.filter(clinic=clinic).first()
+        patient = Patient.objects.first()
+        if not doctor_clinic or not patient:
+            raise CommandError('Slot mode needs a clinic with a doctor and at least one patient')
+        
+        def attempt():
+            try:
+                book_appointment(
+                    notify=False,
+                    patient=patient,
+                    doctor_id=doctor_clinic.doctor_id,
+                    clinic=clinic,
+                    appointment_date=self.BENCHMARK_DATE,
+                    start_time=self.BENCHMARK_TIME,
+                    end_time=time(self.BENCHMARK_TIME.hour, 30)
+                )
+                return 'booked'
+            except SlotConflictError:
+                return 'conflict'
+        
+        self._cleanup_slot(doctor_clinic, clinic)
+        try:
+            results, elapsed = self._run(threads, operations, attempt)
+        finally:
+            self._cleanup_slot(doctor_clinic, clinic)
+        
+        outcomes = [value for value, _ in results]
+        booked = outcomes.count('booked')
+        
+        self._report('Single-slot booking', results, elapsed, threads)
+        self.stdout.write(f"  booked:      {booked}")
+        self.stdout.write(f"  conflicts:   {outcomes.count('conflict')}")
+        
+        if booked != 1:
+            raise CommandError(f"Slot was booked {booked} times")
+    
+    def _cleanup_slot(self, doctor_clinic, clinic):
+        Appointment.objects.filter(
+            doctor_id=doctor_clinic.doctor_id,
+            appointment_date=self.BENCHMARK_DATE
+        ).delete()
+        DailyTokenCounter.objects.filter(clinic=clinic, date=self.BENCHMARK_DATE).delete()
+    
+    def _get_clinic(self, clinic_id):
+        queryset = Clinic.objects.all()
+        clinic = queryset.filter(id=clinic_id).first() if clinic_id else queryset.first()
+        if not clinic:
+            raise CommandError('No clinic found to benchmark against')
+        return clinic
+    
+    def _run(self, threads, operations, operation):
+        """Run `operation` from `threads` workers; return [(result, seconds)] and wall time."""
+        results = []
+        lock = threading.Lock()
+        per_thread = max(1, operations // threads)
+        barrier = threading.Barrier(threads)
+        
+        def worker():
+            local = []
+            barrier.wait()
+            try:
+                for _ in range(per_thread):
+                    started = clock.perf_counter()
+                    value = operation()
+                    local.append((value, clock.perf_counter() - started))
+            finally:
+                connection.close()
+            with lock:
+                results.extend(local)
+        
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = clock.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results, clock.perf_counter() - started
+    
+    def _report(self, title, results, elapsed, threads):
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        if not latencies:
+            self.stdout.write(f"{title}: no operations completed")
+            return
+        
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(f"  threads:     {threads}")
+        self.stdout.write(f"  operations:  {len(latencies)}")
+        self.stdout.write(f"  throughput:  {len(latencies) / elapsed:.1f} ops/s")
+        self.stdout.write(f"  latency p50: {statistics.median(latencies):.2f} ms")
+        self.stdout.write(f"  latency p95: {percentile(0.95):.2f} ms")
+        self.stdout.write(f"  latency p99: {percentile(0.99):.2f} ms")
@@ -0,0 +1,83 @@
+"""
+Import appointments from a CSV file.
+
+The header row names the fields: patient, doctor, clinic (IDs),
+appointment_date (YYYY-MM-DD), start_time, end_time (HH:MM), and
+optionally appointment_type, status, reason and consultation_fee.
+
+Usage:
+    python manage.py import_appointments appointments.csv --no-notify
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.appointments.bulk import MAX_BATCH_SIZE, bulk_create_appointments, validate_rows
+from apps.core.exceptions import SlotConflictError
+
+
+class Command(BaseCommand):
+    help = 'Bulk import appointments from a CSV file.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-notify', action='store_true', help='Do not send confirmation messages')
+        parser.add_argument('--skip-invalid', action='store_true', help='Import valid rows and report the rest')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+    
+    def handle(self, *args, **options):
+        batch_size = min(options['batch_size'], MAX_BATCH_SIZE)
+        
+        try:
+            handle = open(options['path'], newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+        
+        created = 0
+        failed = 0
+        with handle:
+            for offset, batch in self._batches(csv.DictReader(handle), batch_size):
+                valid, errors = validate_rows(batch)
+                for error in errors:
+                    # +2: header line, and CSV lines are 1-based
+                    self.stderr.write(f"Line {offset + error['row'] + 2}: {error['errors']}")
+                
+                if errors and not options['skip_invalid']:
+                    raise CommandError(
+                        f"{len(errors)} invalid rows in batch starting at line {offset + 2}; "
+                        f"nothing from this batch was imported (use --skip-invalid to import the rest). "
+                        f"{self._imported(created, options)}"
+                    )
+                
+                if not options['dry_run']:
+                    try:
+                        bulk_create_appointments([data for _, data in valid], notify=not options['no_notify'])
+                    except SlotConflictError as e:
+                        raise CommandError(
+                            f"Batch of lines {offset + 2}-{offset + len(batch) + 1} was not imported: {e.message}. "
+                            f"{self._imported(created, options)}"
+                        )
+                created += len(valid)
+                failed += len(errors)
+        
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {created} appointments, {failed} rows rejected"))
+    
+    def _batches(self, reader, batch_size):
+        """Yield (offset, rows) for consecutive batches of the CSV."""
+        batch = []
+        offset = 0
+        for row in reader:
+            batch.append({key: value for key, value in row.items() if value != ''})
+            if len(batch) >= batch_size:
+                yield offset, batch
+                offset += len(batch)
+                batch = []
+        if batch:
+            yield offset, batch
+    
+    def _imported(self, created, options):
+        if options['dry_run']:
+            return f"{created} rows before it validated"
+        return f"{created} appointments from earlier batches were imported and kept"
@@ -1,12 +1,17 @@
 """
 Appointment models for HMS.
 """
-from django.db import models
+from datetime import date as date_cls
+
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
-from apps.core.models import BaseModel
+from apps.core.models import BaseModel, FieldTrackerMixin
+
+# Appointment statuses that keep the doctor's slot taken
+BOOKED_STATUSES = ['scheduled', 'confirmed', 'rescheduled', 'checked_in', 'in_progress']
 
 
-class Appointment(BaseModel):
+class Appointment(FieldTrackerMixin, BaseModel):
     """
     Appointment model for scheduling consultations.
     """
@@ -33,6 +38,13 @@ class Appointment(BaseModel):
     patient = models.ForeignKey('patients.Patient', on_delete=models.CASCADE, related_name='appointments')
     doctor = models.ForeignKey('doctors.Doctor', on_delete=models.CASCADE, related_name='appointments')
     clinic = models.ForeignKey('clinics.Clinic', on_delete=models.CASCADE, related_name='appointments')
+    series = models.ForeignKey(
+        'AppointmentSeries',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='appointments'
+    )
     
     # Appointment Details
     appointment_date = models.DateField()
@@ -79,6 +91,8 @@ class Appointment(BaseModel):
     reminder_sent = models.BooleanField(default=False)
     reminder_sent_at = models.DateTimeField(null=True, blank=True)
     
+    tracked_fields = ('status', 'appointment_date', 'start_time')
+    
     class Meta:
         db_table = 'appointments'
         ordering = ['appointment_date', 'start_time']
@@ -87,6 +101,14 @@ class Appointment(BaseModel):
             models.Index(fields=['patient', 'status']),
             models.Index(fields=['status', 'appointment_date']),
         ]
+        constraints = [
+            # One live booking per doctor slot; the database arbitrates concurrent bookings
+            models.UniqueConstraint(
+                fields=['doctor', 'appointment_date', 'start_time'],
+                condition=models.Q(status__in=BOOKED_STATUSES, is_active=True),
+                name='unique_active_doctor_slot'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.patient.user.full_name} - Dr. {self.doctor.user.full_name} ({self.appointment_date})"
@@ -109,14 +131,100 @@ class Appointment(BaseModel):
     
     def _generate_token(self):
         """Generate daily token number for the clinic."""
-        today_appointments = Appointment.objects.filter(
-            clinic=self.clinic,
-            appointment_date=self.appointment_date,
-            token_number__isnull=False
-        ).exclude(id=self.id)
+        return DailyTokenCounter.allocate(self.clinic_id, self.appointment_date)
+
+
+class AppointmentSeries(BaseModel):
+    """
+    Recurring appointment rule, e.g. every Monday and Thursday at 10:00.
+    
+    Occurrences are created as ordinary Appointment rows only inside a
+    rolling horizon (see series.py); materialized_until records how far
+    that has got.
+    """
+    patient = models.ForeignKey('patients.Patient', on_delete=models.CASCADE, related_name='appointment_series')
+    doctor = models.ForeignKey('doctors.Doctor', on_delete=models.CASCADE, related_name='appointment_series')
+    clinic = models.ForeignKey('clinics.Clinic', on_delete=models.CASCADE, related_name='appointment_series')
+    
+    appointment_type = models.CharField(max_length=20, choices=Appointment.APPOINTMENT_TYPES, default='follow_up')
+    reason = models.TextField(blank=True)
+    
+    # Recurrence rule
+    weekdays = models.JSONField(default=list)  # 0=Monday ... 6=Sunday
+    interval_weeks = models.PositiveSmallIntegerField(default=1)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    max_occurrences = models.PositiveIntegerField(null=True, blank=True)
+    
+    # Materialization state
+    materialized_until = models.DateField(null=True, blank=True)
+    skipped_dates = models.JSONField(default=list, blank=True)  # occurrences that clashed with availability
+    
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_appointment_series'
+    )
+    
+    class Meta:
+        db_table = 'appointment_series'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.patient} with {self.doctor} every {self.interval_weeks} week(s) from {self.start_date}"
+
+
+class DailyTokenCounter(BaseModel):
+    """
+    Per-clinic, per-day token sequence.
+    
+    Allocation locks a single counter row, so concurrent bookings are
+    serialized on that row instead of racing on MAX(token_number).
+    """
+    clinic = models.ForeignKey('clinics.Clinic', on_delete=models.CASCADE, related_name='token_counters')
+    date = models.DateField()
+    last_token = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_token_counters'
+        unique_together = ['clinic', 'date']
+    
+    def __str__(self):
+        return f"{self.clinic_id} - {self.date}: {self.last_token}"
+    
+    @classmethod
+    def allocate(cls, clinic_id, date, count=1):
+        """
+        Reserve `count` consecutive tokens and return the first one.
+        
+        The counter row is locked with SELECT ... FOR UPDATE until the
+        surrounding transaction commits. A missing row is seeded once from
+        the highest token already issued, so existing data keeps its numbering.
+        """
+        with transaction.atomic():
+            counter = cls.objects.select_for_update().filter(clinic_id=clinic_id, date=date).first()
+            
+            if counter is None:
+                issued = Appointment.objects.filter(
+                    clinic_id=clinic_id,
+                    appointment_date=date,
+                    token_number__isnull=False
+                ).aggregate(models.Max('token_number'))['token_number__max']
+                try:
+                    with transaction.atomic():
+                        counter = cls.objects.create(clinic_id=clinic_id, date=date, last_token=issued or 0)
+                except IntegrityError:
+                    # Another booking created the row first; wait for its lock
+                    counter = cls.objects.select_for_update().get(clinic_id=clinic_id, date=date)
+            
+            first_token = counter.last_token + 1
+            counter.last_token += count
+            counter.save(update_fields=['last_token', 'updated_at'])
         
-        max_token = today_appointments.aggregate(models.Max('token_number'))['token_number__max']
-        return (max_token or 0) + 1
+        return first_token
 
 
 class AppointmentHistory(BaseModel):
@@ -141,7 +249,7 @@ class AppointmentHistory(BaseModel):
         return f"{self.appointment} - {self.previous_status} -> {self.new_status}"
 
 
-class LiveQueue(BaseModel):
+class LiveQueue(FieldTrackerMixin, BaseModel):
     """
     Real-time queue management for appointments.
     """
@@ -153,22 +261,98 @@ class LiveQueue(BaseModel):
         ('skipped', 'Skipped'),
     ]
     
+    # Lower values are served first
+    PRIORITY_EMERGENCY = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_CHOICES = [
+        (PRIORITY_EMERGENCY, 'Emergency'),
+        (PRIORITY_NORMAL, 'Normal'),
+    ]
+    
     appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE, related_name='queue_entry')
     clinic = models.ForeignKey('clinics.Clinic', on_delete=models.CASCADE, related_name='queue_entries')
     doctor = models.ForeignKey('doctors.Doctor', on_delete=models.CASCADE, related_name='queue_entries')
+    queue_date = models.DateField(default=date_cls.today)
     
-    queue_position = models.PositiveIntegerField()
+    # Order within the doctor's day, after priority; increases with every
+    # (re-)entry and is never renumbered. Positions are computed on read
+    # (see queue.queue_entries).
+    sequence = models.PositiveIntegerField()
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL)
     status = models.CharField(max_length=20, choices=QUEUE_STATUS, default='waiting')
     
     called_at = models.DateTimeField(null=True, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
-    estimated_wait_time = models.PositiveIntegerField(null=True, blank=True)  # minutes
+    tracked_fields = ('status', 'sequence')
     
     class Meta:
         db_table = 'live_queue'
-        ordering = ['queue_position']
+        ordering = ['priority', 'sequence']
+        indexes = [
+            models.Index(fields=['doctor', 'queue_date', 'status', 'priority', 'sequence']),
+        ]
+    
+    def __str__(self):
+        return f"Queue #{self.sequence} - {self.appointment.patient.user.full_name}"
+
+
+class QueueSequence(BaseModel):
+    """
+    Lock row and sequence counter for one doctor's queue on one day.
+    
+    Every queue mutation locks this row first, so concurrent check-ins or
+    calls never collide, and each entry joining the line takes the next
+    sequence number from it.
+    """
+    doctor = models.ForeignKey('doctors.Doctor', on_delete=models.CASCADE, related_name='queue_sequences')
+    date = models.DateField()
+    last_sequence = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'queue_sequences'
+        unique_together = ['doctor', 'date']
+    
+    def __str__(self):
+        return f"{self.doctor_id} - {self.date}: #{self.last_sequence}"
+
+
+class ConsultationStats(BaseModel):
+    """
+    Running consultation length for a doctor and appointment type.
+    
+    Updated incrementally as consultations complete (see estimates.py), so
+    wait estimates never need to scan appointment history.
+    """
+    doctor = models.ForeignKey('doctors.Doctor', on_delete=models.CASCADE, related_name='consultation_stats')
+    appointment_type = models.CharField(max_length=20, choices=Appointment.APPOINTMENT_TYPES)
+    ewma_minutes = models.FloatField()
+    samples = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        db_table = 'consultation_stats'
+        unique_together = ['doctor', 'appointment_type']
+    
+    def __str__(self):
+        return f"{self.doctor_id} - {self.appointment_type}: {self.ewma_minutes:.1f} min"
+
+
+class CalendarFeedToken(BaseModel):
+    """
+    Secret token authenticating a user's ICS calendar subscription.
+    
+    Calendar apps cannot send auth headers, so the token is part of the
+    feed URL. Revoking sets is_active=False.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_feed_tokens')
+    token = models.CharField(max_length=64, unique=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'calendar_feed_tokens'
+        ordering = ['-created_at']
     
     def __str__(self):
-        return f"Queue #{self.queue_position} - {self.appointment.patient.user.full_name}"
+        return f"Calendar feed for {self.user} ({'active' if self.is_active else 'revoked'})"
+
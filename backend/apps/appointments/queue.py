@@ -0,0 +1,261 @@
+"""
+Live queue engine.
+
+Every mutation of a doctor's daily queue goes through QueueEngine. Each
+operation first locks the doctor-day QueueSequence row, so concurrent
+check-ins and calls are serialized instead of colliding.
+
+Entries are ordered by (priority, sequence). Joining the line takes the
+next number from the sequence row, so emergencies go ahead of everyone
+else without renumbering anybody. Leaving the line only changes the
+entry's own status. Every operation therefore writes a constant number of
+rows, and the next patient is one indexed lookup of the lowest
+(priority, sequence).
+
+Positions (1 = next) and wait estimates are not stored; queue_entries()
+computes them when the queue is read.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Max, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from apps.core.exceptions import AppointmentError
+from .estimates import fill_wait_estimates, record_consultation
+from .events import publish_queue_change
+from .models import LiveQueue, QueueSequence
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['waiting', 'called', 'with_doctor']
+
+# A called patient moves to with_doctor once the consultation starts
+CALLED_STATUSES = ['called', 'with_doctor']
+
+SERVING_ORDER = ('priority', 'sequence')
+
+
+def with_positions(queryset):
+    """
+    Annotate queue_position: rank in the doctor's waiting line (1 = next),
+    0 for entries that are not waiting. Ranks count only the rows the
+    queryset selects, so it must include the whole waiting line.
+    """
+    return queryset.annotate(queue_position=Case(
+        When(status='waiting', then=Window(
+            RowNumber(),
+            partition_by=[F('doctor_id'), F('queue_date'), F('status')],
+            order_by=[F(field).asc() for field in SERVING_ORDER]
+        )),
+        default=Value(0)
+    ))
+
+
+def queue_entries(queryset):
+    """
+    Read active entries in serving order, with queue_position and
+    estimated_wait_time filled in. ``queryset`` must select every active
+    entry of the doctors it covers.
+    """
+    entries = list(
+        with_positions(queryset).select_related('appointment__patient__user').order_by(
+            'queue_position', *SERVING_ORDER
+        )
+    )
+    fill_wait_estimates(entries)
+    return entries
+
+
+class QueueEngine:
+    """
+    Ordered, concurrency-safe queue for one doctor on one day.
+    """
+    
+    def __init__(self, doctor_id, day):
+        self.doctor_id = doctor_id
+        self.day = day
+    
+    @classmethod
+    def for_appointment(cls, appointment):
+        return cls(appointment.doctor_id, appointment.appointment_date)
+    
+    # Public operations
+    
+    def enqueue(self, appointment, priority=False) -> LiveQueue:
+        """Add a checked-in appointment to the tail (or behind other emergencies)."""
+        with transaction.atomic():
+            sequence = self._lock()
+            entry = LiveQueue(
+                appointment=appointment,
+                clinic_id=appointment.clinic_id,
+                doctor_id=self.doctor_id,
+                queue_date=self.day,
+                priority=LiveQueue.PRIORITY_EMERGENCY if priority else LiveQueue.PRIORITY_NORMAL
+            )
+            self._insert(sequence, entry)
+            entry.save()
+            self._commit(sequence, entry)
+        return entry
+    
+    def call_next(self):
+        """Move the head of the line to 'called'. Returns None if nobody is waiting."""
+        with transaction.atomic():
+            sequence = self._lock()
+            entry = self._waiting().order_by(*SERVING_ORDER).select_related('appointment').first()
+            if entry is None:
+                return None
+            
+            entry.status = 'called'
+            entry.called_at = timezone.now()
+            entry.save()
+            self._commit(sequence, entry)
+        return entry
+    
+    def skip(self, entry) -> LiveQueue:
+        """
+        Skip a waiting or called patient (e.g. not present when called).
+        A called patient's consultation is undone: the appointment goes
+        back to checked in.
+        """
+        with transaction.atomic():
+            sequence = self._lock()
+            entry = self._reload(entry)
+            
+            if entry.status not in ['waiting', *CALLED_STATUSES]:
+                raise AppointmentError(f"Cannot skip a queue entry that is {entry.status}")
+            
+            self._undo_call(entry)
+            entry.status = 'skipped'
+            entry.save()
+            self._commit(sequence, entry)
+        return entry
+    
+    def reinsert(self, entry) -> LiveQueue:
+        """
+        Put a skipped or called patient back in line at the tail; a called
+        patient's appointment goes back to checked in.
+        """
+        with transaction.atomic():
+            sequence = self._lock()
+            entry = self._reload(entry)
+            
+            if entry.status not in ['skipped', *CALLED_STATUSES]:
+                raise AppointmentError(f"Cannot re-insert a queue entry that is {entry.status}")
+            
+            self._undo_call(entry)
+            self._insert(sequence, entry)
+            entry.save()
+            self._commit(sequence, entry)
+        return entry
+    
+    def start(self, entry) -> LiveQueue:
+        """Record that the consultation has started; a waiting or called entry moves to with_doctor."""
+        with transaction.atomic():
+            sequence = self._lock()
+            entry = self._reload(entry)
+            
+            if entry.status in ['waiting', 'called']:
+                entry.status = 'with_doctor'
+            if not entry.started_at:
+                entry.started_at = timezone.now()
+            entry.save()
+            self._commit(sequence, entry)
+        return entry
+    
+    def finish(self, entry, status='completed') -> LiveQueue:
+        """Take an entry out of the queue as completed or skipped."""
+        with transaction.atomic():
+            sequence = self._lock()
+            entry = self._reload(entry)
+            
+            entry.status = status
+            if status == 'completed':
+                entry.completed_at = timezone.now()
+                record_consultation(
+                    self.doctor_id,
+                    entry.appointment.appointment_type,
+                    entry.started_at,
+                    entry.completed_at
+                )
+            entry.save()
+            self._commit(sequence, entry)
+        return entry
+    
+    def position(self, entry) -> int:
+        """
+        Rank of a waiting entry in the line (1 = next); 0 if it is not
+        waiting. Counts the entries ahead, so callers ask only when needed.
+        """
+        if entry.status != 'waiting':
+            return 0
+        ahead = self._waiting().filter(
+            Q(priority__lt=entry.priority) |
+            Q(priority=entry.priority, sequence__lt=entry.sequence)
+        ).count()
+        return ahead + 1
+    
+    # Internals (callers hold the sequence lock)
+    
+    def _waiting(self):
+        return LiveQueue.objects.filter(
+            doctor_id=self.doctor_id,
+            queue_date=self.day,
+            status='waiting'
+        )
+    
+    def _lock(self) -> QueueSequence:
+        """Lock the doctor-day sequence row, creating it on first use."""
+        sequence = QueueSequence.objects.select_for_update().filter(
+            doctor_id=self.doctor_id,
+            date=self.day
+        ).first()
+        if sequence:
+            return sequence
+        
+        # Continue after entries queued before the sequence row existed
+        last = LiveQueue.objects.filter(
+            doctor_id=self.doctor_id,
+            queue_date=self.day
+        ).aggregate(last=Max('sequence'))['last'] or 0
+        try:
+            with transaction.atomic():
+                return QueueSequence.objects.create(
+                    doctor_id=self.doctor_id,
+                    date=self.day,
+                    last_sequence=last
+                )
+        except IntegrityError:
+            # Another request created the row first; wait for its lock
+            return QueueSequence.objects.select_for_update().get(doctor_id=self.doctor_id, date=self.day)
+    
+    def _reload(self, entry) -> LiveQueue:
+        """Re-read an entry under the lock; its status may have changed since it was loaded."""
+        entry = LiveQueue.objects.select_related('appointment').get(pk=entry.pk)
+        if entry.doctor_id != self.doctor_id or entry.queue_date != self.day:
+            raise AppointmentError('Queue entry does not belong to this queue')
+        return entry
+    
+    def _insert(self, sequence, entry):
+        """Join the tail of the entry's priority class."""
+        sequence.last_sequence += 1
+        entry.sequence = sequence.last_sequence
+        entry.status = 'waiting'
+    
+    def _undo_call(self, entry):
+        """Clear a called entry's call and put its appointment back to checked in."""
+        entry.called_at = None
+        entry.started_at = None
+        appointment = entry.appointment
+        if appointment.status == 'in_progress':
+            appointment.status = 'checked_in'
+            appointment.save(update_fields=['status', 'updated_at'])
+    
+    def _commit(self, sequence, entry):
+        sequence.save(update_fields=['last_sequence', 'updated_at'])
+        publish_queue_change(
+            entry.clinic_id,
+            self.doctor_id,
+            Q(id=entry.id) | Q(status__in=ACTIVE_STATUSES, doctor_id=self.doctor_id, queue_date=self.day)
+        )
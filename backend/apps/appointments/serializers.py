@@ -2,7 +2,9 @@
 Serializers for appointment management.
 """
 from rest_framework import serializers
-from .models import Appointment, AppointmentHistory, LiveQueue
+from .booking import book_appointment
+from .models import Appointment, AppointmentHistory, AppointmentSeries, LiveQueue
+from .series import upcoming_occurrences
 from apps.patients.serializers import PatientListSerializer
 from apps.doctors.serializers import DoctorListSerializer
 
@@ -43,37 +45,27 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
 
 class AppointmentCreateSerializer(serializers.ModelSerializer):
-    """Serializer for creating appointments."""
+    """
+    Serializer for creating appointments.
+    
+    Slot conflicts are not pre-checked here; the booking INSERT is guarded
+    by a unique constraint and raises SlotConflictError (409) instead.
+    """
+    
+    hold_token = serializers.CharField(write_only=True, required=False, allow_blank=True)
     
     class Meta:
         model = Appointment
         fields = [
             'patient', 'doctor', 'clinic', 'appointment_date', 'start_time',
-            'end_time', 'appointment_type', 'reason', 'patient_notes'
+            'end_time', 'appointment_type', 'reason', 'patient_notes', 'hold_token'
         ]
+        # No generated unique-slot pre-check; the INSERT itself is the check
+        validators = []
     
     def validate(self, attrs):
-        # Validate appointment time is available
-        from datetime import datetime, timedelta
-        
         doctor = attrs['doctor']
-        clinic = attrs['clinic']
         date = attrs['appointment_date']
-        start_time = attrs['start_time']
-        
-        # Check for existing appointments
-        existing = Appointment.objects.filter(
-            doctor=doctor,
-            clinic=clinic,
-            appointment_date=date,
-            start_time=start_time,
-            status__in=['scheduled', 'confirmed', 'checked_in']
-        )
-        
-        if existing.exists():
-            raise serializers.ValidationError({
-                'start_time': 'This time slot is already booked.'
-            })
         
         # Check if doctor has leave
         from apps.doctors.models import DoctorLeave
@@ -88,6 +80,19 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             })
         
         return attrs
+    
+    def create(self, validated_data):
+        hold_token = validated_data.pop('hold_token', None)
+        return book_appointment(hold_token=hold_token, **validated_data)
+
+
+class SlotHoldSerializer(serializers.Serializer):
+    """Serializer for placing or releasing a slot hold."""
+    
+    doctor = serializers.UUIDField()
+    appointment_date = serializers.DateField()
+    start_time = serializers.TimeField()
+    hold_token = serializers.CharField(required=False)
 
 
 class AppointmentRescheduleSerializer(serializers.Serializer):
@@ -129,14 +134,25 @@ class LiveQueueSerializer(serializers.ModelSerializer):
     appointment_type = serializers.CharField(source='appointment.appointment_type', read_only=True)
     token_number = serializers.IntegerField(source='appointment.token_number', read_only=True)
     start_time = serializers.TimeField(source='appointment.start_time', read_only=True)
+    # Computed on read (see queue.queue_entries), not stored
+    queue_position = serializers.SerializerMethodField()
+    estimated_wait_time = serializers.SerializerMethodField()
     
     class Meta:
         model = LiveQueue
         fields = [
-            'id', 'queue_position', 'patient_name', 'appointment_type',
+            'id', 'queue_position', 'priority', 'patient_name', 'appointment_type',
             'token_number', 'start_time', 'status', 'estimated_wait_time',
             'called_at', 'started_at', 'completed_at'
         ]
+    
+    def get_queue_position(self, obj):
+        if obj.status != 'waiting':
+            return 0
+        return getattr(obj, 'queue_position', None)
+    
+    def get_estimated_wait_time(self, obj):
+        return getattr(obj, 'estimated_wait_time', None)
 
 
 class DoctorDashboardStatsSerializer(serializers.Serializer):
@@ -150,3 +166,55 @@ class DoctorDashboardStatsSerializer(serializers.Serializer):
     cancelled = serializers.IntegerField()
     no_show = serializers.IntegerField()
     average_consultation_time = serializers.FloatField()
+
+
+class AppointmentSeriesSerializer(serializers.ModelSerializer):
+    """Serializer for recurring appointment series."""
+    
+    patient_name = serializers.CharField(source='patient.user.full_name', read_only=True)
+    doctor_name = serializers.CharField(source='doctor.user.full_name', read_only=True)
+    upcoming = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = AppointmentSeries
+        fields = [
+            'id', 'patient', 'patient_name', 'doctor', 'doctor_name', 'clinic',
+            'appointment_type', 'reason', 'weekdays', 'interval_weeks',
+            'start_time', 'end_time', 'start_date', 'end_date', 'max_occurrences',
+            'materialized_until', 'skipped_dates', 'upcoming', 'is_active', 'created_at'
+        ]
+        read_only_fields = ['materialized_until', 'skipped_dates', 'is_active', 'created_at']
+        extra_kwargs = {'patient': {'required': False}}
+    
+    def get_upcoming(self, obj):
+        if hasattr(obj, 'upcoming_appointments'):
+            appointments = obj.upcoming_appointments[:10]
+        else:
+            appointments = upcoming_occurrences().queryset.filter(series=obj)[:10]
+        return [
+            {'id': str(appointment.id), 'date': appointment.appointment_date, 'status': appointment.status}
+            for appointment in appointments
+        ]
+    
+    def validate_weekdays(self, value):
+        if not value or not all(isinstance(day, int) and 0 <= day <= 6 for day in value):
+            raise serializers.ValidationError('Provide one or more weekdays from 0 (Monday) to 6 (Sunday).')
+        return sorted(set(value))
+    
+    def validate(self, attrs):
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time and end_time <= start_time:
+            raise serializers.ValidationError({'end_time': 'End time must be after start time.'})
+        
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'End date must not be before start date.'})
+        
+        if self.instance:
+            # The parties of a series are fixed; start a new series instead
+            for field in ['patient', 'doctor', 'clinic']:
+                attrs.pop(field, None)
+        return attrs
+
@@ -0,0 +1,293 @@
+"""
+Recurring appointment series.
+
+A series is a rule (weekdays, every N weeks, time, date bounds). Rather
+than pre-creating every occurrence, materialize_series() books only the
+occurrences inside a rolling horizon, and a scheduled task keeps pushing
+that horizon forward. Each run checks its occurrences in bulk against
+compiled availability and existing bookings. Occurrences that clash
+(leave, holiday, slot outside hours, already booked) are skipped and
+recorded on the series. Editing a series cancels the future occurrences
+the new rule drops and books the ones it adds; the rest are kept.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from apps.core.dispatch import dispatch
+from apps.core.exceptions import SlotConflictError
+from apps.doctors.availability import compile_availability, span_mask
+from apps.doctors.models import DoctorClinic
+from .bulk import bulk_create_appointments, invalidate_caches, validate_rows
+from .models import Appointment, AppointmentHistory, LiveQueue
+from .queue import QueueEngine
+
+logger = logging.getLogger(__name__)
+
+# How far ahead occurrences are booked
+SERIES_HORIZON_DAYS = 28
+
+# Most recent skipped occurrences kept on a series
+SKIPPED_DATES_LIMIT = 100
+
+# Occurrences that have not started yet, and can still be cancelled
+OPEN_STATUSES = ['scheduled', 'confirmed', 'rescheduled']
+
+
+def default_horizon():
+    return date.today() + timedelta(days=SERIES_HORIZON_DAYS)
+
+
+def upcoming_occurrences():
+    """Prefetch of each series' upcoming occurrences, as ``upcoming_appointments``."""
+    return Prefetch(
+        'appointments',
+        queryset=Appointment.objects.filter(
+            appointment_date__gte=date.today(),
+            is_active=True
+        ).only('id', 'series_id', 'appointment_date', 'status').order_by('appointment_date'),
+        to_attr='upcoming_appointments'
+    )
+
+
+def occurrence_dates(series, until):
+    """Dates of the rule's occurrences from its start date up to ``until``."""
+    weekdays = set(series.weekdays)
+    if not weekdays:
+        return []
+    
+    last = min(until, series.end_date) if series.end_date else until
+    first_week = series.start_date - timedelta(days=series.start_date.weekday())
+    
+    dates = []
+    day = series.start_date
+    while day <= last:
+        week = (day - first_week).days // 7
+        if day.weekday() in weekdays and week % series.interval_weeks == 0:
+            dates.append(day)
+            if series.max_occurrences and len(dates) >= series.max_occurrences:
+                break
+        day += timedelta(days=1)
+    return dates
+
+
+def materialize_series(series_list, horizon_end=None):
+    """
+    Book the occurrences of each series up to ``horizon_end``.
+    
+    Availability for every doctor-clinic and date involved is compiled in
+    one batch. Rows are then validated together against existing bookings
+    and inserted per series, so a concurrent booking only holds back the
+    series it collides with (it is retried on the next run).
+    
+    Returns the number of appointments created.
+    """
+    series_list = list(series_list)
+    horizon_end = horizon_end or default_horizon()
+    already_past = date.today() - timedelta(days=1)
+    
+    pending = {}
+    for series in series_list:
+        after = max(series.materialized_until or already_past, already_past)
+        pending[series.id] = [day for day in occurrence_dates(series, horizon_end) if day > after]
+    
+    return _book_occurrences(series_list, pending, horizon_end)
+
+
+def _book_occurrences(series_list, pending, horizon_end, notify=False):
+    """
+    Book each series' ``pending`` dates, skipping ones that clash, and move
+    its horizon to ``horizon_end``. Returns the number of appointments
+    created.
+    """
+    all_dates = {day for dates in pending.values() for day in dates}
+    doctor_clinics = {
+        (dc.doctor_id, dc.clinic_id): dc
+        for dc in DoctorClinic.objects.filter(
+            doctor_id__in={series.doctor_id for series in series_list},
+            clinic_id__in={series.clinic_id for series in series_list},
+            is_active=True
+        )
+    }
+    availability = compile_availability(doctor_clinics.values(), all_dates)
+    
+    # Pick occurrences that fit the doctor's hours and don't clash with each other
+    rows = []
+    skipped = defaultdict(list)
+    claimed = defaultdict(int)
+    for series in series_list:
+        dc = doctor_clinics.get((series.doctor_id, series.clinic_id))
+        start = series.start_time.hour * 60 + series.start_time.minute
+        duration = series.end_time.hour * 60 + series.end_time.minute - start
+        mask = span_mask(series.start_time, series.end_time)
+        
+        for day in pending[series.id]:
+            day_availability = availability.get((dc.id, day)) if dc else None
+            if (
+                not day_availability or
+                not day_availability.is_free(start, duration) or
+                claimed[(series.doctor_id, day)] & mask
+            ):
+                skipped[series.id].append(day)
+                continue
+            
+            claimed[(series.doctor_id, day)] |= mask
+            rows.append({
+                'series': series.id,
+                'patient': series.patient_id,
+                'doctor': series.doctor_id,
+                'clinic': series.clinic_id,
+                'appointment_date': day,
+                'start_time': series.start_time,
+                'end_time': series.end_time,
+                'appointment_type': series.appointment_type,
+                'reason': series.reason
+            })
+    
+    valid, errors = validate_rows(rows)
+    for error in errors:
+        row = rows[error['row']]
+        skipped[row['series']].append(row['appointment_date'])
+    
+    by_series = defaultdict(list)
+    for _, data in valid:
+        by_series[data['series']].append(data)
+    
+    created = 0
+    for series in series_list:
+        try:
+            created += len(bulk_create_appointments(
+                by_series[series.id],
+                notify=notify,
+                changed_by=series.created_by,
+                note='Recurring series occurrence'
+            ))
+        except SlotConflictError:
+            logger.warning(f"Series {series.id}: slot booked concurrently, retrying next run")
+            continue
+        
+        series.materialized_until = horizon_end
+        if skipped[series.id]:
+            dates = series.skipped_dates + [day.isoformat() for day in skipped[series.id]]
+            series.skipped_dates = sorted(set(dates))[-SKIPPED_DATES_LIMIT:]
+        series.save(update_fields=['materialized_until', 'skipped_dates', 'updated_at'])
+    
+    return created
+
+
+def cancel_occurrences(series, from_date, changed_by=None, note='Series updated'):
+    """Cancel a series' not-yet-started occurrences on or after ``from_date``."""
+    return _cancel(_open_occurrences(series, from_date), changed_by, note)
+
+
+def _open_occurrences(series, from_date):
+    return Appointment.objects.filter(
+        series=series,
+        appointment_date__gte=from_date,
+        status__in=OPEN_STATUSES,
+        is_active=True
+    )
+
+
+def _cancel(occurrences, changed_by, note):
+    """
+    Cancel ``occurrences`` with one UPDATE.
+    
+    An UPDATE fires no post_save, so everything the cancellation signal
+    does for a single appointment is done here for the whole batch:
+    history, live-queue release, cancellation notices, waitlist offers for
+    the freed slots and cache invalidation.
+    """
+    from apps.notifications.messages import cancellation_messages
+    from apps.notifications.outbox import enqueue
+    from apps.notifications.tasks import notify_waitlist_patients
+    
+    cancelled = list(occurrences.select_related('patient__user', 'doctor__user', 'clinic'))
+    if not cancelled:
+        return 0
+    
+    Appointment.objects.filter(id__in=[appointment.id for appointment in cancelled]).update(
+        status='cancelled',
+        updated_at=timezone.now()
+    )
+    AppointmentHistory.objects.bulk_create([
+        AppointmentHistory(
+            appointment_id=appointment.id,
+            previous_status=appointment.status,
+            new_status='cancelled',
+            changed_by=changed_by,
+            notes=note
+        )
+        for appointment in cancelled
+    ])
+    
+    for entry in LiveQueue.objects.filter(
+        appointment__in=cancelled
+    ).exclude(status__in=['completed', 'skipped']):
+        QueueEngine(entry.doctor_id, entry.queue_date).finish(entry, 'skipped')
+    
+    for appointment in cancelled:
+        appointment.status = 'cancelled'
+    enqueue([message for appointment in cancelled for message in cancellation_messages(appointment)])
+    
+    for appointment in cancelled:
+        dispatch(
+            notify_waitlist_patients,
+            str(appointment.doctor_id),
+            str(appointment.clinic_id),
+            str(appointment.appointment_date),
+            str(appointment.start_time),
+            str(appointment.end_time)
+        )
+    
+    invalidate_caches(cancelled)
+    
+    return len(cancelled)
+
+
+def rebuild_series(series, changed_by=None, effective_from=None):
+    """
+    Re-apply an edited rule from ``effective_from`` on, touching only the
+    occurrences the edit changes.
+    
+    Occurrences on dates the rule still produces, at the same doctor,
+    clinic and time, keep their booking and just pick up the new reason
+    and type; nobody is notified about them. Occurrences the rule no
+    longer produces are cancelled, with notices and waitlist offers, and
+    dates it newly produces are booked and confirmed.
+    """
+    effective_from = max(effective_from or date.today(), date.today())
+    horizon_end = default_horizon()
+    wanted = {day for day in occurrence_dates(series, horizon_end) if day >= effective_from}
+    
+    with transaction.atomic():
+        current = _open_occurrences(series, effective_from)
+        kept = current.filter(
+            appointment_date__in=wanted,
+            doctor_id=series.doctor_id,
+            clinic_id=series.clinic_id,
+            start_time=series.start_time,
+            end_time=series.end_time
+        )
+        kept.exclude(reason=series.reason, appointment_type=series.appointment_type).update(
+            reason=series.reason,
+            appointment_type=series.appointment_type,
+            updated_at=timezone.now()
+        )
+        kept = dict(kept.values_list('id', 'appointment_date'))
+        
+        _cancel(current.exclude(id__in=kept), changed_by, 'Series updated')
+        _book_occurrences([series], {series.id: sorted(wanted - set(kept.values()))}, horizon_end, notify=True)
+
+
+def end_series(series, changed_by=None):
+    """Stop a series and cancel its upcoming occurrences."""
+    with transaction.atomic():
+        cancel_occurrences(series, date.today(), changed_by=changed_by, note='Series ended')
+        series.is_active = False
+        series.end_date = date.today() - timedelta(days=1)
+        series.save(update_fields=['is_active', 'end_date', 'updated_at'])
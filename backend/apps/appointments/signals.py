@@ -1,57 +1,56 @@
 """
 Django signals for appointment status changes.
-Triggers WhatsApp notifications via Celery tasks.
+Notifications are written to the notification outbox in the same
+transaction as the change; other Celery tasks are enqueued, and cached
+availability, dashboard stats and calendar versions updated, on commit.
+
+Changes are diffed against the values Appointment tracks in memory
+(see FieldTrackerMixin), so no pre_save re-fetch is needed.
 """
-from django.db.models.signals import post_save, pre_save
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Appointment, AppointmentHistory
+from apps.core.dispatch import dispatch
+from apps.doctors.availability import invalidate_booked, mark_booked
+from .calendar import bump_calendar_version
+from .models import BOOKED_STATUSES, Appointment, AppointmentHistory, LiveQueue
+from .queue import QueueEngine
+from .stats import invalidate_doctor_dashboard_stats
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-@receiver(pre_save, sender=Appointment)
-def track_status_change(sender, instance, **kwargs):
-    """Track status changes before saving."""
-    if instance.pk:
-        try:
-            old_instance = Appointment.objects.get(pk=instance.pk)
-            instance._previous_status = old_instance.status
-            instance._status_changed = old_instance.status != instance.status
-            instance._previous_date = old_instance.appointment_date
-            instance._previous_time = old_instance.start_time
-        except Appointment.DoesNotExist:
-            instance._status_changed = False
-    else:
-        instance._status_changed = False
-
-
 @receiver(post_save, sender=Appointment)
-def handle_appointment_status_change(sender, instance, created, **kwargs):
+def handle_appointment_status_change(sender, instance, created, update_fields=None, **kwargs):
     """
     Handle appointment status changes:
     - Create history entry
     - Trigger WhatsApp notifications
     - Handle waitlist for cancelled slots
     """
-    from apps.notifications.tasks import (
-        send_appointment_confirmation,
-        send_appointment_reschedule_notification,
-        send_appointment_cancellation_notification,
-        send_appointment_reminder,
-        notify_waitlist_patients
+    from apps.notifications.messages import (
+        cancellation_messages,
+        confirmation_messages,
+        reschedule_messages
     )
+    from apps.notifications.outbox import enqueue
+    from apps.notifications.tasks import notify_waitlist_patients
     
     # New appointment created
     if created:
         logger.info(f"New appointment created: {instance.id}")
         # Send confirmation notification
-        send_appointment_confirmation.delay(str(instance.id))
+        if not getattr(instance, '_skip_notifications', False):
+            enqueue(confirmation_messages(instance))
         return
     
+    changes = instance.get_changed_fields(update_fields)
+    
     # Status changed
-    if hasattr(instance, '_status_changed') and instance._status_changed:
-        previous_status = getattr(instance, '_previous_status', 'unknown')
+    if 'status' in changes:
+        previous_status = changes['status']
         
         # Create history entry
         AppointmentHistory.objects.create(
@@ -65,18 +64,21 @@ def handle_appointment_status_change(sender, instance, created, **kwargs):
         
         # Handle rescheduled appointments
         if instance.status == 'rescheduled':
-            send_appointment_reschedule_notification.delay(str(instance.id))
+            enqueue(reschedule_messages(instance))
         
         # Handle cancelled appointments - trigger waitlist
         elif instance.status == 'cancelled':
-            send_appointment_cancellation_notification.delay(str(instance.id))
+            _finish_queue_entry(instance, 'skipped')
+            enqueue(cancellation_messages(instance))
             
             # Notify waitlist patients about the freed slot
-            notify_waitlist_patients.delay(
+            dispatch(
+                notify_waitlist_patients,
                 str(instance.doctor_id),
                 str(instance.clinic_id),
                 str(instance.appointment_date),
-                str(instance.start_time)
+                str(instance.start_time),
+                str(instance.end_time)
             )
         
         # Handle check-in
@@ -86,34 +88,120 @@ def handle_appointment_status_change(sender, instance, created, **kwargs):
                 instance.checked_in_at = timezone.now()
                 instance.save(update_fields=['checked_in_at'])
         
+        # Handle consultation start - stamp the queue entry
+        elif instance.status == 'in_progress':
+            entry = LiveQueue.objects.filter(appointment=instance).first()
+            if entry:
+                QueueEngine(entry.doctor_id, entry.queue_date).start(entry)
+        
         # Handle completion
         elif instance.status == 'completed':
+            _finish_queue_entry(instance, 'completed')
             logger.info(f"Appointment {instance.id} completed")
+        
+        # Handle no-shows - drop out of the live queue
+        elif instance.status == 'no_show':
+            _finish_queue_entry(instance, 'skipped')
+
+
+def _finish_queue_entry(appointment, status):
+    """Take the appointment's queue entry out of the live queue, if it has one."""
+    entry = LiveQueue.objects.filter(appointment=appointment).exclude(
+        status__in=['completed', 'skipped']
+    ).first()
+    if entry:
+        QueueEngine(entry.doctor_id, entry.queue_date).finish(entry, status)
 
 
 @receiver(post_save, sender=Appointment)
-def handle_appointment_reschedule(sender, instance, created, **kwargs):
+def handle_appointment_reschedule(sender, instance, created, update_fields=None, **kwargs):
     """
     Handle date/time changes (rescheduling).
     """
     if created:
         return
     
-    from apps.notifications.tasks import send_appointment_reschedule_notification
+    from apps.notifications.messages import reschedule_messages
+    from apps.notifications.outbox import enqueue
     
     # Check if date or time changed
-    previous_date = getattr(instance, '_previous_date', None)
-    previous_time = getattr(instance, '_previous_time', None)
+    changes = instance.get_changed_fields(update_fields)
+    if 'appointment_date' not in changes and 'start_time' not in changes:
+        return
     
-    date_changed = previous_date and previous_date != instance.appointment_date
-    time_changed = previous_time and previous_time != instance.start_time
+    previous_date = changes.get('appointment_date', instance.appointment_date)
+    previous_time = changes.get('start_time', instance.start_time)
     
-    if date_changed or time_changed:
-        # Store original date/time if not already stored
-        if not instance.original_date:
-            instance.original_date = previous_date
-            instance.original_time = previous_time
-            instance.save(update_fields=['original_date', 'original_time'])
-        
-        logger.info(f"Appointment {instance.id} rescheduled from {previous_date} {previous_time}")
-        send_appointment_reschedule_notification.delay(str(instance.id))
+    # Store original date/time if not already stored
+    if not instance.original_date:
+        instance.original_date = previous_date
+        instance.original_time = previous_time
+        instance.save(update_fields=['original_date', 'original_time'])
+    
+    logger.info(f"Appointment {instance.id} rescheduled from {previous_date} {previous_time}")
+    enqueue(reschedule_messages(instance))
+
+
+@receiver(post_save, sender=Appointment)
+def invalidate_dashboard_stats(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Drop cached dashboard stats when a doctor's day changes, once the change
+    commits; dropping them earlier lets a dashboard request cache the old
+    aggregates again.
+    """
+    if created:
+        transaction.on_commit(partial(invalidate_doctor_dashboard_stats, instance.doctor_id, instance.appointment_date))
+        return
+    
+    changes = instance.get_changed_fields(update_fields)
+    if 'status' in changes or 'appointment_date' in changes:
+        transaction.on_commit(partial(
+            invalidate_doctor_dashboard_stats,
+            instance.doctor_id,
+            instance.appointment_date,
+            changes.get('appointment_date')
+        ))
+
+
+@receiver(post_save, sender=Appointment)
+def sync_booked_availability(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Set the doctor's cached booked-slot bits as appointments take a slot,
+    and rebuild the day from the database when one frees a slot, since
+    another appointment may still overlap it. The cache is only touched
+    once the change commits, so a rolled-back booking never leaves its
+    slot marked.
+    """
+    slot = (instance.doctor_id, instance.appointment_date, instance.start_time, instance.end_time)
+    if created:
+        if instance.status in BOOKED_STATUSES:
+            transaction.on_commit(partial(mark_booked, *slot))
+        return
+    
+    changes = instance.get_changed_fields(update_fields)
+    
+    # Moved to another date or time - rebuild both days from the database
+    if 'appointment_date' in changes or 'start_time' in changes:
+        transaction.on_commit(partial(
+            invalidate_booked, instance.doctor_id, instance.appointment_date, changes.get('appointment_date')
+        ))
+        return
+    
+    if 'status' in changes:
+        was_booked = changes['status'] in BOOKED_STATUSES
+        is_booked = instance.status in BOOKED_STATUSES
+        if is_booked and not was_booked:
+            transaction.on_commit(partial(mark_booked, *slot))
+        elif was_booked and not is_booked:
+            transaction.on_commit(partial(invalidate_booked, instance.doctor_id, instance.appointment_date))
+
+
+@receiver(post_save, sender=Appointment)
+def bump_calendar_feeds(sender, instance, **kwargs):
+    """
+    Mark the doctor's and patient's calendar feeds as changed once the
+    change commits; bumping earlier lets a feed request cache the old rows
+    under the new version.
+    """
+    transaction.on_commit(partial(bump_calendar_version, 'doctor', instance.doctor_id))
+    transaction.on_commit(partial(bump_calendar_version, 'patient', instance.patient_id))
@@ -0,0 +1,70 @@
+"""
+Doctor dashboard statistics.
+
+All counters come from one conditional-aggregate query and are cached for a
+short TTL. The cache entry is dropped whenever an appointment for that
+doctor and day is created, rescheduled or changes status.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+
+from .models import Appointment
+
+DASHBOARD_STATS_TTL = 30  # seconds
+
+
+def dashboard_stats_cache_key(doctor_id, day):
+    return f"doctor_dashboard_stats:{doctor_id}:{day.isoformat()}"
+
+
+def compute_doctor_dashboard_stats(doctor_id, day) -> dict:
+    """Compute dashboard counters for a doctor's day in a single query."""
+    consultation_time = ExpressionWrapper(
+        F('queue_entry__completed_at') - F('queue_entry__started_at'),
+        output_field=DurationField()
+    )
+    
+    stats = Appointment.objects.filter(
+        doctor_id=doctor_id,
+        appointment_date=day,
+        is_active=True
+    ).aggregate(
+        total_today=Count('id'),
+        checked_in=Count('id', filter=Q(status='checked_in')),
+        in_progress=Count('id', filter=Q(status='in_progress')),
+        completed=Count('id', filter=Q(status='completed')),
+        pending=Count('id', filter=Q(status__in=['scheduled', 'confirmed'])),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+        no_show=Count('id', filter=Q(status='no_show')),
+        average_consultation=Avg(consultation_time, filter=Q(
+            status='completed',
+            queue_entry__started_at__isnull=False,
+            queue_entry__completed_at__isnull=False
+        ))
+    )
+    
+    average = stats.pop('average_consultation')
+    if isinstance(average, timedelta):
+        average = average.total_seconds()
+    elif average is not None:
+        average = average / 1_000_000  # backends without interval support return microseconds
+    stats['average_consultation_time'] = round(average / 60, 1) if average else 0.0
+    
+    return stats
+
+
+def get_doctor_dashboard_stats(doctor_id, day) -> dict:
+    """Return cached dashboard statistics, computing them on a miss."""
+    key = dashboard_stats_cache_key(doctor_id, day)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_doctor_dashboard_stats(doctor_id, day)
+        cache.set(key, stats, DASHBOARD_STATS_TTL)
+    return stats
+
+
+def invalidate_doctor_dashboard_stats(doctor_id, *days):
+    """Drop cached statistics for the given doctor and days."""
+    cache.delete_many([dashboard_stats_cache_key(doctor_id, day) for day in days if day])
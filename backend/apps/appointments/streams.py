@@ -0,0 +1,192 @@
+"""
+Server-sent event streams for the live queue.
+
+Served only by the ASGI event process (hms.asgi): each open stream is an
+idle coroutine waiting on the process-local event hub, not a worker
+polling LiveQueue. The REST API stays on WSGI.
+
+EventSource cannot send an Authorization header, and a JWT in the query
+string would end up in proxy and access logs. Browsers instead POST to the
+API for a stream ticket: a random, single-use token that expires after
+STREAM_TICKET_TTL seconds, and open the stream with ?ticket=. A reconnect
+needs a fresh ticket.
+
+Doctors always stream their own queue. Anyone else selects a queue and
+must be allowed to watch it (see can_watch_queue): staff, the clinic's
+admin or one of its doctors, or the doctor's own clinic admins.
+"""
+import asyncio
+import json
+import logging
+import secrets
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .events import clinic_channel, doctor_channel, hub
+from .models import LiveQueue
+from .queue import ACTIVE_STATUSES, queue_entries
+from .serializers import LiveQueueSerializer
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+
+# Seconds a stream ticket can be redeemed for
+STREAM_TICKET_TTL = 30
+
+
+def _ticket_key(ticket):
+    return f"queue_stream_ticket:{ticket}"
+
+
+def issue_stream_ticket(user) -> str:
+    """Create a single-use ticket that opens one stream as ``user``."""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), str(user.id), STREAM_TICKET_TTL)
+    return ticket
+
+
+def _redeem_ticket(ticket):
+    key = _ticket_key(ticket)
+    user_id = cache.get(key)
+    # Only the request whose delete removed the key gets to use it
+    if user_id is None or not cache.delete(key):
+        return None
+    return get_user_model().objects.filter(id=user_id, is_active=True).first()
+
+
+def _authenticate(request):
+    """
+    Authenticate with the usual Bearer header, or a `ticket` query
+    parameter for EventSource clients that cannot set headers.
+    """
+    ticket = request.GET.get('ticket')
+    if ticket:
+        return _redeem_ticket(ticket)
+    
+    auth = JWTAuthentication()
+    try:
+        result = auth.authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def can_watch_queue(user, clinic_id=None, doctor_id=None) -> bool:
+    """
+    Whether a non-doctor user may watch a clinic's or a doctor's live queue:
+    staff may watch any; a clinic's admin and its doctors may watch the
+    clinic; a clinic admin may watch the doctors practising at their clinics.
+    """
+    from apps.clinics.models import Clinic
+    from apps.doctors.models import DoctorClinic
+    
+    if user.is_staff or user.user_type == 'admin':
+        return True
+    
+    try:
+        if clinic_id:
+            return (
+                Clinic.objects.filter(id=clinic_id, admin_user=user).exists() or
+                DoctorClinic.objects.filter(clinic_id=clinic_id, doctor__user=user, is_active=True).exists()
+            )
+        if doctor_id:
+            return DoctorClinic.objects.filter(doctor_id=doctor_id, clinic__admin_user=user, is_active=True).exists()
+    except (ValidationError, ValueError):
+        return False  # not a valid id
+    return False
+
+
+def _resolve_scope(request):
+    """Return (channel, queryset filters) for the requested queue, or None."""
+    from apps.doctors.models import Doctor
+    
+    user = _authenticate(request)
+    if user is None:
+        return None, 401
+    
+    if user.user_type == 'doctor':
+        doctor_id = Doctor.objects.filter(user=user).values_list('id', flat=True).first()
+        if doctor_id is None:
+            return None, 404
+        return (doctor_channel(doctor_id), {'doctor_id': doctor_id}), 200
+    
+    clinic_id = request.GET.get('clinic')
+    doctor_id = request.GET.get('doctor')
+    if not clinic_id and not doctor_id:
+        return None, 400
+    if not can_watch_queue(user, clinic_id=clinic_id, doctor_id=doctor_id):
+        return None, 403
+    
+    if clinic_id:
+        return (clinic_channel(clinic_id), {'clinic_id': clinic_id}), 200
+    return (doctor_channel(doctor_id), {'doctor_id': doctor_id}), 200
+
+
+def _snapshot(filters):
+    """Current queue state, matching LiveQueueView."""
+    entries = queue_entries(LiveQueue.objects.filter(
+        queue_date=date.today(),
+        status__in=ACTIVE_STATUSES,
+        **filters
+    ))
+    return LiveQueueSerializer(entries, many=True).data
+
+
+def _format_event(data: str) -> str:
+    event = json.loads(data).get('event', 'message')
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def live_queue_stream(request):
+    """
+    Stream live queue changes for a doctor (own queue) or a clinic/doctor
+    selected with ?clinic= / ?doctor=.
+    
+    Sends a `snapshot` event on connect followed by `queue.updated` deltas.
+    A `queue.resync` event means events were dropped and the client should
+    reconnect or refetch the snapshot.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would be buffered forever by one worker
+        return JsonResponse({'error': 'The live queue stream is served by the event service.'}, status=404)
+    
+    scope, status_code = await sync_to_async(_resolve_scope)(request)
+    if scope is None:
+        messages = {
+            401: 'Authentication credentials were not provided or are invalid.',
+            403: 'You do not have access to this queue.',
+            404: 'Doctor profile not found.',
+            400: 'clinic or doctor parameter is required.',
+        }
+        return JsonResponse({'error': messages[status_code]}, status=status_code)
+    
+    channel, filters = scope
+    
+    async def events():
+        async with hub.subscribe(channel) as queue:
+            snapshot = await sync_to_async(_snapshot)(filters)
+            yield 'retry: 3000\n\n'
+            yield _format_event(json.dumps({'event': 'snapshot', 'entries': snapshot}, cls=DjangoJSONEncoder))
+            
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield _format_event(data)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,45 @@
+"""
+Celery tasks for appointment maintenance.
+"""
+from celery import shared_task
+from django.db.models import Q
+from datetime import date
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Series handled per materialization batch
+SERIES_BATCH_SIZE = 200
+
+
+@shared_task
+def materialize_appointment_series():
+    """
+    Extend every active recurring series up to the rolling horizon.
+    Run daily via Celery Beat.
+    """
+    from .models import AppointmentSeries
+    from .series import default_horizon, materialize_series
+    
+    horizon_end = default_horizon()
+    due = AppointmentSeries.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=date.today()),
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon_end),
+        is_active=True
+    ).select_related('created_by').order_by('id')
+    
+    created = 0
+    series_count = 0
+    batch = []
+    for series in due.iterator(chunk_size=SERIES_BATCH_SIZE):
+        batch.append(series)
+        if len(batch) >= SERIES_BATCH_SIZE:
+            created += materialize_series(batch, horizon_end)
+            series_count += len(batch)
+            batch = []
+    if batch:
+        created += materialize_series(batch, horizon_end)
+        series_count += len(batch)
+    
+    logger.info(f"Materialized {created} occurrences for {series_count} series up to {horizon_end}")
+    return created
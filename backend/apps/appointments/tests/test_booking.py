@@ -0,0 +1,78 @@
+"""
+Double-booking protection in book_appointment(): concurrent bookings of
+one slot produce exactly one appointment and SlotConflictError for the
+rest, while unrelated integrity errors are not reported as conflicts.
+"""
+import threading
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import IntegrityError, connection
+
+from apps.appointments.booking import book_appointment
+from apps.appointments.models import Appointment
+from apps.core.exceptions import SlotConflictError
+from apps.doctors.factories import DoctorClinicFactory
+from apps.patients.factories import PatientFactory
+
+CONTENDERS = 6
+
+
+def _fields(doctor_clinic, patient, **overrides):
+    return {
+        'patient': patient,
+        'doctor_id': doctor_clinic.doctor_id,
+        'clinic_id': doctor_clinic.clinic_id,
+        'appointment_date': date.today() + timedelta(days=1),
+        'start_time': time(10, 0),
+        'end_time': time(10, 15),
+        'consultation_fee': Decimal('500.00'),
+        **overrides
+    }
+
+
+@pytest.mark.django_db
+def test_second_booking_of_a_slot_conflicts():
+    doctor_clinic = DoctorClinicFactory()
+    book_appointment(notify=False, **_fields(doctor_clinic, PatientFactory()))
+    
+    with pytest.raises(SlotConflictError):
+        book_appointment(notify=False, **_fields(doctor_clinic, PatientFactory()))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_bookings_of_one_slot():
+    if connection.vendor == 'sqlite':
+        pytest.skip('SQLite fails concurrent writers with "database is locked" instead of arbitrating')
+    doctor_clinic = DoctorClinicFactory()
+    patients = [PatientFactory() for _ in range(CONTENDERS)]
+    barrier = threading.Barrier(CONTENDERS)
+    outcomes = []
+    
+    def book(patient):
+        try:
+            barrier.wait()
+            book_appointment(notify=False, **_fields(doctor_clinic, patient))
+            outcomes.append('booked')
+        except SlotConflictError:
+            outcomes.append('conflict')
+        finally:
+            connection.close()
+    
+    threads = [threading.Thread(target=book, args=(patient,)) for patient in patients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(outcomes) == ['booked'] + ['conflict'] * (CONTENDERS - 1)
+    assert Appointment.objects.filter(doctor_id=doctor_clinic.doctor_id).count() == 1
+
+
+@pytest.mark.django_db
+def test_other_integrity_errors_are_not_conflicts():
+    doctor_clinic = DoctorClinicFactory()
+    
+    with pytest.raises(IntegrityError):
+        book_appointment(notify=False, **_fields(doctor_clinic, PatientFactory(), appointment_type=None))
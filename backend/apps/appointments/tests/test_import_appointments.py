@@ -0,0 +1,76 @@
+"""
+import_appointments reporting when a batch loses a slot mid-import, and
+series references checked before anything is written.
+"""
+import csv
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from apps.appointments import bulk
+from apps.appointments.factories import AppointmentSeriesFactory
+from apps.appointments.models import Appointment
+from apps.core.exceptions import SlotConflictError
+from apps.doctors.factories import DoctorClinicFactory
+from apps.patients.factories import PatientFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    doctor_clinic = DoctorClinicFactory()
+    patient = PatientFactory()
+    day = date.today() + timedelta(days=1)
+    path = tmp_path / 'appointments.csv'
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['patient', 'doctor', 'clinic', 'appointment_date', 'start_time', 'end_time'])
+        for hour in range(9, 13):
+            writer.writerow([
+                patient.id, doctor_clinic.doctor_id, doctor_clinic.clinic_id,
+                day.isoformat(), f"{hour:02d}:00", f"{hour:02d}:30"
+            ])
+    return path
+
+
+def test_slot_conflict_reports_batch_and_imported_count(csv_path, monkeypatch):
+    calls = []
+    
+    def create(rows, notify=True):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise SlotConflictError('One or more time slots were booked while importing')
+        return bulk.bulk_create_appointments(rows, notify=notify)
+    
+    monkeypatch.setattr(
+        'apps.appointments.management.commands.import_appointments.bulk_create_appointments', create
+    )
+    
+    with pytest.raises(CommandError) as excinfo:
+        call_command('import_appointments', str(csv_path), '--batch-size=2', '--no-notify')
+    
+    message = str(excinfo.value)
+    assert 'lines 4-5' in message
+    assert '2 appointments from earlier batches were imported' in message
+    assert Appointment.objects.count() == 2
+
+
+def test_unknown_series_is_a_row_error(csv_path):
+    with open(csv_path, newline='') as handle:
+        rows = list(csv.DictReader(handle))
+    series = AppointmentSeriesFactory(
+        patient_id=rows[0]['patient'],
+        doctor_id=rows[0]['doctor'],
+        clinic_id=rows[0]['clinic']
+    )
+    rows[0]['series'] = str(series.id)
+    rows[1]['series'] = str(uuid.uuid4())
+    rows[2]['series'] = str(AppointmentSeriesFactory().id)
+    
+    valid, errors = bulk.validate_rows([{key: value for key, value in row.items() if value} for row in rows])
+    
+    assert [index for index, _ in valid] == [0, 3]
+    assert [(error['row'], list(error['errors'])) for error in errors] == [(1, ['series']), (2, ['series'])]
@@ -0,0 +1,111 @@
+"""
+QueueEngine ordering, and the cost of queue operations as the line grows.
+"""
+from datetime import date, time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.appointments.factories import AppointmentFactory
+from apps.appointments.models import LiveQueue
+from apps.appointments.queue import QueueEngine, queue_entries
+from apps.clinics.factories import ClinicFactory
+from apps.doctors.factories import DoctorFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def _fill(size, emergencies=()):
+    doctor = DoctorFactory()
+    clinic = ClinicFactory()
+    engine = QueueEngine(doctor.id, date.today())
+    for index in range(size):
+        appointment = AppointmentFactory(
+            doctor=doctor,
+            clinic=clinic,
+            appointment_date=date.today(),
+            start_time=time(8 + index // 4, (index % 4) * 15),
+            status='checked_in'
+        )
+        engine.enqueue(appointment, priority=index in emergencies)
+    return engine
+
+
+def _line(engine):
+    entries = queue_entries(LiveQueue.objects.filter(
+        doctor_id=engine.doctor_id,
+        queue_date=engine.day,
+        status__in=['waiting', 'called', 'with_doctor']
+    ))
+    return [(entry.appointment.start_time.strftime('%H%M'), entry.queue_position) for entry in entries]
+
+
+def test_emergencies_go_ahead_without_renumbering():
+    engine = _fill(4, emergencies={2})
+    
+    assert _line(engine) == [('0830', 1), ('0800', 2), ('0815', 3), ('0845', 4)]
+    assert list(LiveQueue.objects.order_by('sequence').values_list('sequence', flat=True)) == [1, 2, 3, 4]
+
+
+def test_call_next_skip_and_reinsert():
+    engine = _fill(3)
+    called = engine.call_next()
+    assert called.appointment.start_time == time(8, 0)
+    
+    skipped = engine.skip(LiveQueue.objects.get(appointment__start_time=time(8, 15)))
+    engine.reinsert(skipped)
+    
+    assert _line(engine) == [('0800', 0), ('0830', 1), ('0815', 2)]
+
+
+@pytest.mark.parametrize('operation', ['call_next', 'enqueue'])
+def test_operations_write_constant_rows(operation):
+    writes = []
+    for size in (3, 30):
+        engine = _fill(size)
+        extra = AppointmentFactory(
+            doctor_id=engine.doctor_id,
+            appointment_date=engine.day,
+            start_time=time(20, 0),
+            status='checked_in'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            if operation == 'call_next':
+                engine.call_next()
+            else:
+                engine.enqueue(extra)
+        writes.append(sum(1 for query in queries if query['sql'].startswith(('UPDATE', 'INSERT'))))
+    
+    assert writes[0] == writes[1]
+
+
+def _call(engine):
+    """Call the next patient the way CallNextPatientView does."""
+    entry = engine.call_next()
+    entry.appointment.status = 'in_progress'
+    entry.appointment.save()
+    entry.refresh_from_db()
+    return entry
+
+
+def test_called_patient_moves_to_with_doctor():
+    engine = _fill(2)
+    
+    entry = _call(engine)
+    
+    assert entry.status == 'with_doctor'
+    assert entry.started_at is not None
+
+
+def test_skipping_a_called_patient_resets_the_appointment():
+    engine = _fill(2)
+    entry = _call(engine)
+    
+    entry = engine.skip(entry)
+    entry.appointment.refresh_from_db()
+    assert (entry.status, entry.appointment.status, entry.started_at) == ('skipped', 'checked_in', None)
+    
+    entry = engine.reinsert(entry)
+    assert entry.status == 'waiting'
+    assert _line(engine) == [('0815', 1), ('0800', 2)]
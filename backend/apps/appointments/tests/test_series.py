@@ -0,0 +1,106 @@
+"""
+Cancelling series occurrences runs the same side effects as a single
+cancellation, and editing a series only touches the occurrences it changes.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from apps.appointments.factories import AppointmentFactory, AppointmentSeriesFactory
+from apps.appointments.models import Appointment, AppointmentHistory
+from apps.appointments.series import cancel_occurrences, materialize_series, rebuild_series
+from apps.doctors.factories import DoctorClinicFactory, DoctorScheduleFactory
+from apps.notifications.models import Notification
+from apps.patients.factories import PatientFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    calls = []
+    monkeypatch.setattr('apps.appointments.series.dispatch', lambda task, *args: calls.append((task.name, args)))
+    return calls
+
+
+@pytest.fixture
+def series(settings):
+    """A Monday series, materialized, at a clinic whose doctor works Mondays and Wednesdays."""
+    settings.NOTIFICATION_CHANNELS = ['sms']
+    doctor_clinic = DoctorClinicFactory()
+    for weekday in (0, 2):
+        DoctorScheduleFactory(doctor_clinic=doctor_clinic, day_of_week=weekday)
+    series = AppointmentSeriesFactory(
+        patient=PatientFactory(),
+        doctor=doctor_clinic.doctor,
+        clinic=doctor_clinic.clinic,
+        weekdays=[0]
+    )
+    assert materialize_series([series])
+    Notification.objects.all().delete()
+    return series
+
+
+def test_cancel_occurrences_notifies_and_frees_slots(settings, monkeypatch):
+    settings.NOTIFICATION_CHANNELS = ['sms']
+    dispatched = []
+    monkeypatch.setattr(
+        'apps.appointments.series.dispatch',
+        lambda task, *args: dispatched.append((task.name, args))
+    )
+    
+    series = AppointmentSeriesFactory()
+    occurrences = [
+        AppointmentFactory(
+            series=series,
+            patient=series.patient,
+            doctor=series.doctor,
+            clinic=series.clinic,
+            appointment_date=date.today() + timedelta(days=7 * week),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+            status='scheduled'
+        )
+        for week in (1, 2)
+    ]
+    
+    assert cancel_occurrences(series, date.today()) == 2
+    
+    assert set(Appointment.objects.values_list('status', flat=True)) == {'cancelled'}
+    assert AppointmentHistory.objects.filter(new_status='cancelled').count() == 2
+    assert set(Notification.objects.filter(
+        idempotency_key__startswith='appointment_cancellation:'
+    ).values_list('appointment_id', flat=True)) == {occurrence.id for occurrence in occurrences}
+    assert sorted(args[2] for name, args in dispatched if name.endswith('notify_waitlist_patients')) == [
+        str(occurrence.appointment_date) for occurrence in occurrences
+    ]
+
+
+def test_editing_reason_keeps_occurrences_quietly(series, dispatched):
+    booked = set(Appointment.objects.filter(series=series).values_list('id', flat=True))
+    series.reason = 'Physiotherapy follow-up'
+    series.save()
+    
+    rebuild_series(series)
+    
+    occurrences = Appointment.objects.filter(series=series)
+    assert set(occurrences.values_list('id', flat=True)) == booked
+    assert set(occurrences.values_list('status', 'reason')) == {('scheduled', 'Physiotherapy follow-up')}
+    assert not Notification.objects.exists()
+    assert not dispatched
+
+
+def test_changing_weekdays_cancels_and_books_only_the_difference(series, dispatched):
+    mondays = Appointment.objects.filter(series=series).count()
+    series.weekdays = [2]
+    series.save()
+    
+    rebuild_series(series)
+    
+    occurrences = Appointment.objects.filter(series=series)
+    assert {day.weekday() for day in occurrences.filter(status='cancelled').values_list('appointment_date', flat=True)} == {0}
+    assert {day.weekday() for day in occurrences.filter(status='scheduled').values_list('appointment_date', flat=True)} == {2}
+    keys = list(Notification.objects.values_list('idempotency_key', flat=True))
+    assert sum(key.startswith('appointment_cancellation:') for key in keys) == mondays
+    assert sum(key.startswith('appointment_confirmation:') for key in keys) == occurrences.filter(status='scheduled').count()
+    assert len(dispatched) == mondays
@@ -0,0 +1,25 @@
+"""
+Cached dashboard stats are dropped when an appointment change commits, not before.
+"""
+import pytest
+from django.core.cache import cache
+
+from apps.appointments.factories import AppointmentFactory
+from apps.appointments.stats import dashboard_stats_cache_key, get_doctor_dashboard_stats
+
+pytestmark = pytest.mark.django_db
+
+
+def test_stats_invalidated_on_commit(django_capture_on_commit_callbacks):
+    appointment = AppointmentFactory(status='scheduled')
+    key = dashboard_stats_cache_key(appointment.doctor_id, appointment.appointment_date)
+    get_doctor_dashboard_stats(appointment.doctor_id, appointment.appointment_date)
+    
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        appointment.status = 'cancelled'
+        appointment.save()
+    assert cache.get(key) is not None
+    
+    for callback in callbacks:
+        callback()
+    assert cache.get(key) is None
@@ -0,0 +1,68 @@
+"""
+Live queue streams only open for users allowed to watch the queue.
+"""
+from urllib.parse import urlencode
+
+import pytest
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.appointments.streams import _resolve_scope, can_watch_queue, issue_stream_ticket
+from apps.clinics.factories import ClinicFactory
+from apps.doctors.factories import DoctorClinicFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def clinic_admin():
+    return UserFactory(user_type='clinic_admin')
+
+
+@pytest.fixture
+def doctor_clinic(clinic_admin):
+    return DoctorClinicFactory(clinic=ClinicFactory(admin_user=clinic_admin))
+
+
+def _ticket(user, **params):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.post(f"{reverse('appointments:queue_stream_ticket')}?{urlencode(params)}", secure=True)
+
+
+def _stream_scope(user, **params):
+    request = RequestFactory().get('/', {'ticket': issue_stream_ticket(user), **params})
+    return _resolve_scope(request)
+
+
+def test_clinic_admin_gets_ticket_for_own_clinic_and_its_doctors(clinic_admin, doctor_clinic):
+    assert _ticket(clinic_admin, clinic=doctor_clinic.clinic_id).status_code == 201
+    assert _ticket(clinic_admin, doctor=doctor_clinic.doctor_id).status_code == 201
+
+
+def test_other_users_get_no_ticket(doctor_clinic):
+    patient = UserFactory()
+    other_admin = UserFactory(user_type='clinic_admin')
+    
+    assert _ticket(patient, clinic=doctor_clinic.clinic_id).status_code == 403
+    assert _ticket(other_admin, doctor=doctor_clinic.doctor_id).status_code == 403
+    assert _ticket(patient).status_code == 400
+    assert _ticket(UserFactory(is_staff=True), clinic=doctor_clinic.clinic_id).status_code == 201
+
+
+def test_stream_refuses_queue_the_ticket_holder_cannot_watch(clinic_admin, doctor_clinic):
+    scope, status_code = _stream_scope(UserFactory(), clinic=doctor_clinic.clinic_id)
+    assert (scope, status_code) == (None, 403)
+    
+    scope, status_code = _stream_scope(UserFactory(), clinic='not-a-uuid')
+    assert (scope, status_code) == (None, 403)
+    
+    scope, status_code = _stream_scope(clinic_admin, clinic=doctor_clinic.clinic_id)
+    assert status_code == 200
+    assert scope[1] == {'clinic_id': str(doctor_clinic.clinic_id)}
+
+
+def test_doctor_of_clinic_may_watch_it(doctor_clinic):
+    assert can_watch_queue(doctor_clinic.doctor.user, clinic_id=doctor_clinic.clinic_id)
@@ -3,21 +3,36 @@ URL patterns for appointment management.
 """
 from django.urls import path
 from .views import (
-    AppointmentListCreateView, AppointmentDetailView,
+    AppointmentListCreateView, AppointmentDetailView, SlotHoldView,
+    AppointmentBulkCreateView, AppointmentSeriesListCreateView, AppointmentSeriesDetailView,
+    CalendarFeedTokenListCreateView, CalendarFeedTokenRevokeView,
     AppointmentRescheduleView, AppointmentStatusUpdateView,
     AppointmentCheckInView, TodayAppointmentsView,
-    UpcomingAppointmentsView, LiveQueueView, CallNextPatientView,
-    DoctorDashboardStatsView
+    UpcomingAppointmentsView, LiveQueueView, QueueStreamTicketView, CallNextPatientView,
+    QueueEntrySkipView, QueueEntryReinsertView, DoctorDashboardStatsView
 )
+from .feeds import calendar_feed
+from .streams import live_queue_stream
 
 app_name = 'appointments'
 
 urlpatterns = [
     path('', AppointmentListCreateView.as_view(), name='list_create'),
+    path('bulk/', AppointmentBulkCreateView.as_view(), name='bulk_create'),
+    path('series/', AppointmentSeriesListCreateView.as_view(), name='series_list_create'),
+    path('series/<uuid:pk>/', AppointmentSeriesDetailView.as_view(), name='series_detail'),
+    path('calendar/tokens/', CalendarFeedTokenListCreateView.as_view(), name='calendar_tokens'),
+    path('calendar/tokens/<uuid:pk>/', CalendarFeedTokenRevokeView.as_view(), name='calendar_token_revoke'),
+    path('calendar/<str:token>.ics', calendar_feed, name='calendar_feed'),
+    path('holds/', SlotHoldView.as_view(), name='slot_hold'),
     path('today/', TodayAppointmentsView.as_view(), name='today'),
     path('upcoming/', UpcomingAppointmentsView.as_view(), name='upcoming'),
     path('queue/', LiveQueueView.as_view(), name='queue'),
+    path('queue/stream/', live_queue_stream, name='queue_stream'),
+    path('queue/stream/ticket/', QueueStreamTicketView.as_view(), name='queue_stream_ticket'),
     path('queue/call-next/', CallNextPatientView.as_view(), name='call_next'),
+    path('queue/<uuid:pk>/skip/', QueueEntrySkipView.as_view(), name='queue_skip'),
+    path('queue/<uuid:pk>/reinsert/', QueueEntryReinsertView.as_view(), name='queue_reinsert'),
     path('dashboard/stats/', DoctorDashboardStatsView.as_view(), name='dashboard_stats'),
     path('<uuid:pk>/', AppointmentDetailView.as_view(), name='detail'),
     path('<uuid:pk>/reschedule/', AppointmentRescheduleView.as_view(), name='reschedule'),
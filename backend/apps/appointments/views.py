@@ -4,22 +4,40 @@ Views for appointment management.
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.db import transaction
 from django.db.models import Count, Avg, Q
 from django.utils import timezone
 from datetime import date, datetime, timedelta
 
-from .models import Appointment, AppointmentHistory, LiveQueue
+from .models import (
+    BOOKED_STATUSES, Appointment, AppointmentHistory, AppointmentSeries, CalendarFeedToken, LiveQueue
+)
 from .serializers import (
     AppointmentSerializer, AppointmentCreateSerializer, AppointmentListSerializer,
     AppointmentRescheduleSerializer, AppointmentStatusSerializer,
-    LiveQueueSerializer, DoctorDashboardStatsSerializer
+    LiveQueueSerializer, DoctorDashboardStatsSerializer, SlotHoldSerializer,
+    AppointmentSeriesSerializer
 )
-from apps.core.permissions import IsDoctor, IsPatient
+from .booking import HOLD_TTL, move_appointment, place_hold, release_hold
+from .bulk import MAX_BATCH_SIZE, bulk_create_appointments, validate_rows
+from .calendar import create_feed_token, revoke_feed_token
+from .queue import ACTIVE_STATUSES, QueueEngine, queue_entries
+from .series import end_series, materialize_series, rebuild_series, upcoming_occurrences
+from .stats import get_doctor_dashboard_stats
+from .streams import STREAM_TICKET_TTL, can_watch_queue, issue_stream_ticket
+from apps.core.exceptions import SlotConflictError
+from apps.core.permissions import IsClinicAdmin, IsDoctor, IsPatient
 from apps.patients.models import Patient
 from apps.doctors.models import Doctor
 
 
+# Relations read by AppointmentListSerializer / AppointmentSerializer
+LIST_RELATED = ('patient__user', 'doctor__user', 'clinic')
+
+
 class AppointmentListCreateView(generics.ListCreateAPIView):
     """List and create appointments."""
     permission_classes = [permissions.IsAuthenticated]
@@ -53,7 +71,7 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        return queryset.order_by('appointment_date', 'start_time')
+        return queryset.select_related(*LIST_RELATED).order_by('appointment_date', 'start_time')
     
     def perform_create(self, serializer):
         user = self.request.user
@@ -73,6 +91,65 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         user = self.request.user
         queryset = Appointment.objects.filter(is_active=True)
         
+        if user.user_type == 'patient':
+            patient = get_object_or_404(Patient, user=user)
+            queryset = queryset.filter(patient=patient)
+        elif user.user_type == 'doctor':
+            doctor = get_object_or_404(Doctor, user=user)
+            queryset = queryset.filter(doctor=doctor)
+        
+        return queryset.select_related(*LIST_RELATED).prefetch_related('history__changed_by')
+
+
+class AppointmentBulkCreateView(APIView):
+    """Import a batch of appointments for the clinics the admin manages."""
+    permission_classes = [permissions.IsAuthenticated, IsClinicAdmin]
+    
+    def post(self, request):
+        rows = request.data.get('appointments')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'appointments must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {MAX_BATCH_SIZE} appointments per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        clinic_ids = set(request.user.administered_clinics.values_list('id', flat=True))
+        valid, errors = validate_rows(rows, clinic_ids=clinic_ids)
+        if errors:
+            return Response({'created': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        notify = str(request.data.get('notify', 'true')).lower() not in ['0', 'false', 'no']
+        appointments = bulk_create_appointments(
+            [data for _, data in valid],
+            notify=notify,
+            changed_by=request.user
+        )
+        
+        return Response({
+            'created': len(appointments),
+            'appointments': [
+                {'id': str(appointment.id), 'token_number': appointment.token_number}
+                for appointment in appointments
+            ]
+        }, status=status.HTTP_201_CREATED)
+
+
+class AppointmentSeriesListCreateView(generics.ListCreateAPIView):
+    """List and create recurring appointment series."""
+    serializer_class = AppointmentSeriesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        queryset = AppointmentSeries.objects.filter(is_active=True).select_related(
+            'patient__user', 'doctor__user'
+        ).prefetch_related(upcoming_occurrences())
+        
         if user.user_type == 'patient':
             patient = get_object_or_404(Patient, user=user)
             queryset = queryset.filter(patient=patient)
@@ -81,6 +158,124 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
             queryset = queryset.filter(doctor=doctor)
         
         return queryset
+    
+    def perform_create(self, serializer):
+        user = self.request.user
+        extra = {'created_by': user}
+        if user.user_type == 'patient':
+            extra['patient'] = get_object_or_404(Patient, user=user)
+        elif not serializer.validated_data.get('patient'):
+            raise ValidationError({'patient': 'This field is required.'})
+        
+        with transaction.atomic():
+            series = serializer.save(**extra)
+            materialize_series([series])
+
+
+class AppointmentSeriesDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Retrieve, edit or end a recurring series."""
+    serializer_class = AppointmentSeriesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        queryset = AppointmentSeries.objects.filter(is_active=True).select_related(
+            'patient__user', 'doctor__user'
+        ).prefetch_related(upcoming_occurrences())
+        
+        if user.user_type == 'patient':
+            patient = get_object_or_404(Patient, user=user)
+            queryset = queryset.filter(patient=patient)
+        elif user.user_type == 'doctor':
+            doctor = get_object_or_404(Doctor, user=user)
+            queryset = queryset.filter(doctor=doctor)
+        
+        return queryset
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            series = serializer.save()
+            rebuild_series(series, changed_by=self.request.user)
+    
+    def perform_destroy(self, instance):
+        end_series(instance, changed_by=self.request.user)
+
+
+class CalendarFeedTokenListCreateView(APIView):
+    """List or create calendar subscription URLs for the current user."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        tokens = CalendarFeedToken.objects.filter(user=request.user, is_active=True)
+        return Response([self._serialize(request, feed_token) for feed_token in tokens])
+    
+    def post(self, request):
+        if request.user.user_type not in ['doctor', 'patient']:
+            return Response(
+                {'error': 'Calendar feeds are available to doctors and patients'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        feed_token = create_feed_token(request.user)
+        return Response(self._serialize(request, feed_token), status=status.HTTP_201_CREATED)
+    
+    def _serialize(self, request, feed_token):
+        return {
+            'id': str(feed_token.id),
+            'url': request.build_absolute_uri(
+                reverse('appointments:calendar_feed', args=[feed_token.token])
+            ),
+            'created_at': feed_token.created_at,
+            'last_used_at': feed_token.last_used_at
+        }
+
+
+class CalendarFeedTokenRevokeView(APIView):
+    """Revoke a calendar subscription URL."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def delete(self, request, pk):
+        feed_token = get_object_or_404(CalendarFeedToken, pk=pk, user=request.user, is_active=True)
+        revoke_feed_token(feed_token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SlotHoldView(APIView):
+    """Place or release a short-lived hold on a slot before booking it."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = SlotHoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        taken = Appointment.objects.filter(
+            doctor_id=data['doctor'],
+            appointment_date=data['appointment_date'],
+            start_time=data['start_time'],
+            status__in=BOOKED_STATUSES,
+            is_active=True
+        ).exists()
+        token = None if taken else place_hold(
+            data['doctor'], data['appointment_date'], data['start_time'], request.user.id
+        )
+        
+        if not token:
+            raise SlotConflictError()
+        
+        return Response(
+            {'hold_token': token, 'expires_in': HOLD_TTL},
+            status=status.HTTP_201_CREATED
+        )
+    
+    def delete(self, request):
+        serializer = SlotHoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        released = release_hold(
+            data['doctor'], data['appointment_date'], data['start_time'], data.get('hold_token')
+        )
+        return Response({'success': released})
 
 
 class AppointmentRescheduleView(APIView):
@@ -98,14 +293,16 @@ class AppointmentRescheduleView(APIView):
             appointment.original_time = appointment.start_time
         
         # Update appointment
-        appointment.appointment_date = serializer.validated_data['new_date']
-        appointment.start_time = serializer.validated_data['new_start_time']
-        appointment.end_time = serializer.validated_data['new_end_time']
-        appointment.reschedule_reason = serializer.validated_data.get('reason', '')
-        appointment.rescheduled_by = request.user
-        appointment.status = 'rescheduled'
         appointment._changed_by = request.user
-        appointment.save()
+        move_appointment(
+            appointment,
+            appointment_date=serializer.validated_data['new_date'],
+            start_time=serializer.validated_data['new_start_time'],
+            end_time=serializer.validated_data['new_end_time'],
+            reschedule_reason=serializer.validated_data.get('reason', ''),
+            rescheduled_by=request.user,
+            status='rescheduled'
+        )
         
         return Response(AppointmentSerializer(appointment).data)
 
@@ -143,30 +340,26 @@ class AppointmentCheckInView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        appointment.status = 'checked_in'
-        appointment.checked_in_at = timezone.now()
-        appointment._changed_by = request.user
-        appointment.save()
-        
-        # Add to live queue
-        queue_position = LiveQueue.objects.filter(
-            clinic=appointment.clinic,
-            doctor=appointment.doctor,
-            status__in=['waiting', 'called']
-        ).count() + 1
-        
-        LiveQueue.objects.create(
-            appointment=appointment,
-            clinic=appointment.clinic,
-            doctor=appointment.doctor,
-            queue_position=queue_position,
-            status='waiting'
+        priority = (
+            appointment.appointment_type == 'emergency' or
+            str(request.data.get('priority', '')).lower() in ['1', 'true', 'emergency']
         )
         
+        with transaction.atomic():
+            appointment.status = 'checked_in'
+            appointment.checked_in_at = timezone.now()
+            appointment._changed_by = request.user
+            appointment.save()
+            
+            # Add to live queue
+            engine = QueueEngine.for_appointment(appointment)
+            entry = engine.enqueue(appointment, priority=priority)
+            position = engine.position(entry)
+        
         return Response({
             'success': True,
             'message': 'Check-in successful',
-            'queue_position': queue_position,
+            'queue_position': position,
             'token_number': appointment.token_number
         })
 
@@ -182,7 +375,7 @@ class TodayAppointmentsView(generics.ListAPIView):
             doctor=doctor,
             appointment_date=date.today(),
             is_active=True
-        ).order_by('start_time')
+        ).select_related(*LIST_RELATED).order_by('start_time')
 
 
 class UpcomingAppointmentsView(generics.ListAPIView):
@@ -205,7 +398,7 @@ class UpcomingAppointmentsView(generics.ListAPIView):
             doctor = get_object_or_404(Doctor, user=user)
             queryset = queryset.filter(doctor=doctor)
         
-        return queryset.order_by('appointment_date', 'start_time')[:10]
+        return queryset.select_related(*LIST_RELATED).order_by('appointment_date', 'start_time')[:10]
 
 
 class LiveQueueView(generics.ListAPIView):
@@ -218,8 +411,8 @@ class LiveQueueView(generics.ListAPIView):
         today = date.today()
         
         queryset = LiveQueue.objects.filter(
-            appointment__appointment_date=today,
-            status__in=['waiting', 'called', 'with_doctor']
+            queue_date=today,
+            status__in=ACTIVE_STATUSES
         )
         
         if user.user_type == 'doctor':
@@ -230,7 +423,47 @@ class LiveQueueView(generics.ListAPIView):
         if clinic_id:
             queryset = queryset.filter(clinic_id=clinic_id)
         
-        return queryset.order_by('queue_position')
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # Positions and estimates need the whole line, so page after computing them
+        entries = queue_entries(self.get_queryset())
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(entries, many=True).data)
+
+
+class QueueStreamTicketView(APIView):
+    """
+    Issue a short-lived, single-use ticket for opening the live queue stream.
+    
+    Users other than doctors pass the queue they will open (?clinic= or
+    ?doctor=), and get no ticket for a queue they may not watch. The stream
+    checks again when the ticket is redeemed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        user = request.user
+        if user.user_type != 'doctor':
+            clinic_id = request.query_params.get('clinic')
+            doctor_id = request.query_params.get('doctor')
+            if not clinic_id and not doctor_id:
+                return Response(
+                    {'error': 'clinic or doctor parameter is required.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not can_watch_queue(user, clinic_id=clinic_id, doctor_id=doctor_id):
+                return Response(
+                    {'error': 'You do not have access to this queue.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        return Response(
+            {'ticket': issue_stream_ticket(request.user), 'expires_in': STREAM_TICKET_TTL},
+            status=status.HTTP_201_CREATED
+        )
 
 
 class CallNextPatientView(APIView):
@@ -241,30 +474,49 @@ class CallNextPatientView(APIView):
         doctor = get_object_or_404(Doctor, user=request.user)
         today = date.today()
         
-        # Get next waiting patient
-        next_patient = LiveQueue.objects.filter(
-            doctor=doctor,
-            appointment__appointment_date=today,
-            status='waiting'
-        ).order_by('queue_position').first()
-        
-        if not next_patient:
-            return Response(
-                {'message': 'No patients in queue'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Update queue status
-        next_patient.status = 'called'
-        next_patient.called_at = timezone.now()
-        next_patient.save()
+        with transaction.atomic():
+            # Take the head of the queue
+            next_patient = QueueEngine(doctor.id, today).call_next()
+            
+            if not next_patient:
+                return Response(
+                    {'message': 'No patients in queue'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            # Update appointment status
+            next_patient.appointment.status = 'in_progress'
+            next_patient.appointment._changed_by = request.user
+            next_patient.appointment.save()
+        
+        next_patient.refresh_from_db()
+        return Response(LiveQueueSerializer(next_patient).data)
+
+
+class QueueEntrySkipView(APIView):
+    """Skip a patient who did not answer their call."""
+    permission_classes = [permissions.IsAuthenticated, IsDoctor]
+    
+    def post(self, request, pk):
+        doctor = get_object_or_404(Doctor, user=request.user)
+        entry = get_object_or_404(LiveQueue, pk=pk, doctor=doctor)
         
-        # Update appointment status
-        next_patient.appointment.status = 'in_progress'
-        next_patient.appointment._changed_by = request.user
-        next_patient.appointment.save()
+        entry = QueueEngine(doctor.id, entry.queue_date).skip(entry)
+        return Response(LiveQueueSerializer(entry).data)
+
+
+class QueueEntryReinsertView(APIView):
+    """Put a skipped patient back at the end of the queue."""
+    permission_classes = [permissions.IsAuthenticated, IsDoctor]
+    
+    def post(self, request, pk):
+        doctor = get_object_or_404(Doctor, user=request.user)
+        entry = get_object_or_404(LiveQueue, pk=pk, doctor=doctor)
         
-        return Response(LiveQueueSerializer(next_patient).data)
+        engine = QueueEngine(doctor.id, entry.queue_date)
+        entry = engine.reinsert(entry)
+        entry.queue_position = engine.position(entry)
+        return Response(LiveQueueSerializer(entry).data)
 
 
 class DoctorDashboardStatsView(APIView):
@@ -273,29 +525,5 @@ class DoctorDashboardStatsView(APIView):
     
     def get(self, request):
         doctor = get_object_or_404(Doctor, user=request.user)
-        today = date.today()
-        
-        today_appointments = Appointment.objects.filter(
-            doctor=doctor,
-            appointment_date=today,
-            is_active=True
-        )
-        
-        stats = {
-            'total_today': today_appointments.count(),
-            'checked_in': today_appointments.filter(status='checked_in').count(),
-            'in_progress': today_appointments.filter(status='in_progress').count(),
-            'completed': today_appointments.filter(status='completed').count(),
-            'pending': today_appointments.filter(status__in=['scheduled', 'confirmed']).count(),
-            'cancelled': today_appointments.filter(status='cancelled').count(),
-            'no_show': today_appointments.filter(status='no_show').count(),
-            'average_consultation_time': 0
-        }
-        
-        # Calculate average consultation time
-        completed = today_appointments.filter(status='completed')
-        if completed.exists():
-            # This would need actual start/end tracking
-            stats['average_consultation_time'] = 15.0  # Placeholder
-        
+        stats = get_doctor_dashboard_stats(doctor.id, date.today())
         return Response(DoctorDashboardStatsSerializer(stats).data)
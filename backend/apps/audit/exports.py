@@ -0,0 +1,110 @@
+"""
+Streaming export helpers for audit data.
+
+Rows are read through a server-side cursor and encoded incrementally, so
+memory use stays flat regardless of how many records are exported.
+"""
+import csv
+import io
+import json
+import logging
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger('apps.audit')
+
+EXPORT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Rows fetched per round trip from the server-side cursor
+CURSOR_CHUNK_SIZE = 2000
+
+# Encoded bytes buffered before a chunk is handed to the response
+FLUSH_THRESHOLD = 64 * 1024
+
+
+def _encode_csv(fields, rows):
+    """Yield CSV-encoded text for a header and row iterator."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([
+            json.dumps(value, cls=DjangoJSONEncoder) if isinstance(value, (dict, list)) else value
+            for value in row
+        ])
+        if buffer.tell() >= FLUSH_THRESHOLD:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _encode_jsonl(fields, rows):
+    """Yield JSON Lines text, one object per row."""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder)
+        lines.append(line)
+        size += len(line)
+        if size >= FLUSH_THRESHOLD:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            size = 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+ENCODERS = {
+    'csv': _encode_csv,
+    'jsonl': _encode_jsonl,
+}
+
+
+def stream_export(queryset, fields, export_type, compress=False, on_complete=None):
+    """
+    Stream a values_list queryset as encoded bytes.
+    
+    Args:
+        queryset: Queryset yielding tuples in the order of ``fields``.
+        fields: Column names written as the CSV header / JSON keys.
+        export_type: One of EXPORT_TYPES.
+        compress: Gzip the output stream.
+        on_complete: Callback receiving (record_count, byte_size). Called
+            even if the client disconnects part way through, so partial
+            exports are still accounted for.
+    """
+    stats = {'records': 0, 'bytes': 0}
+    
+    def counted_rows():
+        for row in queryset.iterator(chunk_size=CURSOR_CHUNK_SIZE):
+            stats['records'] += 1
+            yield row
+    
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    try:
+        for text in ENCODERS[export_type](fields, counted_rows()):
+            chunk = text.encode('utf-8')
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                stats['bytes'] += len(chunk)
+                yield chunk
+        if compressor:
+            chunk = compressor.flush()
+            stats['bytes'] += len(chunk)
+            yield chunk
+    finally:
+        if on_complete:
+            try:
+                on_complete(stats['records'], stats['bytes'])
+            except Exception as e:
+                logger.exception(
+                    f"Failed to record data export of {stats['records']} records "
+                    f"({stats['bytes']} bytes): {e}"
+                )
@@ -168,7 +168,7 @@ class DataExportLog(UUIDModel):
     
     # File details
     file_name = models.CharField(max_length=255)
-    file_size = models.PositiveIntegerField(null=True, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
     
     # Request details
     ip_address = models.GenericIPAddressField(null=True, blank=True)
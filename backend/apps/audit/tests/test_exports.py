@@ -0,0 +1,108 @@
+"""
+Streaming audit exports: encoded output and the DataExportLog row written for
+every export.
+"""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.audit import exports
+from apps.audit.exports import stream_export
+from apps.audit.models import AuditLog, DataExportLog
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+FIELDS = ['id', 'action', 'description', 'changes']
+
+
+@pytest.fixture
+def logs():
+    user = UserFactory()
+    return [
+        AuditLog.objects.create(
+            user=user,
+            user_email=user.email,
+            user_type=user.user_type,
+            action='read',
+            resource_type='patient',
+            resource_id=str(index),
+            description=f'Viewed record {index}, "quoted"',
+            changes={'index': index}
+        )
+        for index in range(30)
+    ]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(exports, 'FLUSH_THRESHOLD', 256)
+
+
+def _export(export_type, compress=False):
+    completed = []
+    queryset = AuditLog.objects.order_by('resource_id').values_list(*FIELDS)
+    chunks = list(stream_export(
+        queryset, FIELDS, export_type, compress=compress,
+        on_complete=lambda *counts: completed.append(counts)
+    ))
+    return chunks, completed
+
+
+def test_csv_streams_in_chunks(logs, small_chunks):
+    chunks, completed = _export('csv')
+    body = b''.join(chunks)
+    
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert len(chunks) > 1
+    assert rows[0] == FIELDS
+    assert len(rows) == 31
+    assert rows[1][2] == 'Viewed record 0, "quoted"'
+    assert json.loads(rows[1][3]) == {'index': 0}
+    assert completed == [(30, len(body))]
+
+
+def test_jsonl_streams_one_object_per_line(logs, small_chunks):
+    chunks, completed = _export('jsonl')
+    body = b''.join(chunks)
+    
+    records = [json.loads(line) for line in body.decode().splitlines()]
+    assert len(chunks) > 1
+    assert len(records) == 30
+    assert set(records[0]) == set(FIELDS)
+    assert records[0]['changes'] == {'index': 0}
+    assert completed == [(30, len(body))]
+
+
+def test_gzip_counts_compressed_bytes(logs, small_chunks):
+    plain, _ = _export('jsonl')
+    chunks, completed = _export('jsonl', compress=True)
+    body = b''.join(chunks)
+    
+    assert gzip.decompress(body) == b''.join(plain)
+    assert completed == [(30, len(body))]
+
+
+def test_export_view_writes_audit_row(logs):
+    admin = UserFactory(is_staff=True)
+    client = APIClient()
+    client.force_authenticate(admin)
+    
+    response = client.get(
+        reverse('audit:log_export'), {'export_type': 'csv', 'gzip': '1', 'action': 'read'}, secure=True
+    )
+    assert response.status_code == 200
+    assert DataExportLog.objects.get().record_count == 0
+    
+    body = b''.join(response.streaming_content)
+    export_log = DataExportLog.objects.get()
+    assert export_log.user == admin
+    assert export_log.record_count == 30
+    assert export_log.file_size == len(body)
+    assert export_log.filters_applied == {'action': 'read'}
+    assert export_log.file_name.endswith('.csv.gz')
@@ -1,50 +1,122 @@
 """
 Views for audit logs.
 """
-from rest_framework import generics, permissions
+from rest_framework import generics, status, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
+from .exports import EXPORT_TYPES, stream_export
 from .models import AuditLog, DataExportLog
 from .serializers import AuditLogSerializer, DataExportLogSerializer
 
 
+# Query parameter -> ORM lookup, shared by the list and export endpoints
+AUDIT_LOG_FILTERS = {
+    'user': 'user_id',
+    'patient': 'patient_id',
+    'action': 'action',
+    'resource_type': 'resource_type',
+    'start_date': 'timestamp__gte',
+    'end_date': 'timestamp__lte',
+}
+
+
+def get_audit_log_filters(params):
+    """Return the audit log filters present in the query parameters."""
+    return {
+        param: params.get(param)
+        for param in AUDIT_LOG_FILTERS
+        if params.get(param)
+    }
+
+
+def filter_audit_logs(queryset, params):
+    """Apply user, patient, action, resource type and date range filters."""
+    for param, value in get_audit_log_filters(params).items():
+        queryset = queryset.filter(**{AUDIT_LOG_FILTERS[param]: value})
+    return queryset
+
+
 class AuditLogListView(generics.ListAPIView):
     """List audit logs (admin only)."""
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAdminUser]
     
     def get_queryset(self):
-        queryset = AuditLog.objects.all()
+        queryset = filter_audit_logs(AuditLog.objects.all(), self.request.query_params)
+        return queryset.order_by('-timestamp')
+
+
+class AuditLogExportView(APIView):
+    """
+    Stream audit logs as CSV or JSON Lines (admin only).
+    
+    Accepts the same filters as AuditLogListView plus:
+        export_type: csv (default) or jsonl
+        gzip: 1/true to gzip the stream
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    EXPORT_FIELDS = [
+        'id', 'timestamp', 'user_id', 'user_email', 'user_type',
+        'action', 'resource_type', 'resource_id', 'patient_id',
+        'description', 'changes', 'ip_address', 'user_agent',
+        'request_path', 'request_method', 'reason'
+    ]
+    
+    def get(self, request):
+        export_type = request.query_params.get('export_type', 'csv')
+        if export_type not in EXPORT_TYPES:
+            return Response(
+                {'error': f"export_type must be one of: {', '.join(EXPORT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Filter by user
-        user_id = self.request.query_params.get('user')
-        if user_id:
-            queryset = queryset.filter(user_id=user_id)
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true')
+        filters = get_audit_log_filters(request.query_params)
         
-        # Filter by patient
-        patient_id = self.request.query_params.get('patient')
-        if patient_id:
-            queryset = queryset.filter(patient_id=patient_id)
+        queryset = filter_audit_logs(
+            AuditLog.objects.all(), request.query_params
+        ).order_by('-timestamp').values_list(*self.EXPORT_FIELDS)
         
-        # Filter by action
-        action = self.request.query_params.get('action')
-        if action:
-            queryset = queryset.filter(action=action)
+        file_name = f"audit_logs_{timezone.now():%Y%m%d_%H%M%S}.{export_type}"
+        if compress:
+            file_name += '.gz'
         
-        # Filter by resource type
-        resource_type = self.request.query_params.get('resource_type')
-        if resource_type:
-            queryset = queryset.filter(resource_type=resource_type)
+        # Written before any data leaves, so an export that cannot be
+        # audited is refused; the counts are filled in when the stream ends
+        export_log = DataExportLog.objects.create(
+            user=request.user,
+            export_type=export_type,
+            resource_type='audit_log',
+            record_count=0,
+            filters_applied=filters,
+            file_name=file_name,
+            ip_address=AuditLog._get_client_ip(request)
+        )
         
-        # Date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        if start_date:
-            queryset = queryset.filter(timestamp__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(timestamp__lte=end_date)
+        def record_export(record_count, byte_size):
+            DataExportLog.objects.filter(pk=export_log.pk).update(
+                record_count=record_count,
+                file_size=byte_size
+            )
         
-        return queryset.order_by('-timestamp')
+        response = StreamingHttpResponse(
+            stream_export(
+                queryset,
+                self.EXPORT_FIELDS,
+                export_type,
+                compress=compress,
+                on_complete=record_export
+            ),
+            content_type='application/gzip' if compress else EXPORT_TYPES[export_type]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        response['Cache-Control'] = 'no-store'
+        return response
 
 
 class PatientAuditLogView(generics.ListAPIView):
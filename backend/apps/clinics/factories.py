@@ -0,0 +1,20 @@
+"""
+factory-boy factories for clinics.
+"""
+import factory
+
+from .models import Clinic
+
+
+class ClinicFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Clinic
+    
+    name = factory.Sequence(lambda n: f"Clinic {n}")
+    registration_number = factory.Sequence(lambda n: f"CLN{n:06d}")
+    phone = '+910000000000'
+    email = factory.Sequence(lambda n: f"clinic{n}@example.com")
+    address = factory.Faker('street_address')
+    city = 'Pune'
+    state = 'Maharashtra'
+    postal_code = '411001'
@@ -52,6 +52,9 @@ class ClinicListSerializer(serializers.ModelSerializer):
         ]
     
     def get_doctor_count(self, obj):
+        # Annotated by ClinicListView; fall back to a query elsewhere
+        if hasattr(obj, 'doctor_total'):
+            return obj.doctor_total
         return obj.doctors.count()
 
 
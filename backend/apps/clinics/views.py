@@ -2,6 +2,8 @@
 Views for clinic management.
 """
 from rest_framework import generics, permissions
+from rest_framework.response import Response
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 
 from .models import Clinic, ClinicFacility, ClinicHoliday
@@ -16,7 +18,9 @@ class ClinicListView(generics.ListAPIView):
     """List all clinics."""
     serializer_class = ClinicListSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Clinic.objects.filter(is_active=True)
+    queryset = Clinic.objects.filter(is_active=True).annotate(
+        doctor_total=Count('doctors', distinct=True)
+    ).order_by('name')
     filterset_fields = ['clinic_type', 'city', 'has_emergency', 'has_pharmacy', 'has_lab']
     search_fields = ['name', 'city', 'address']
 
@@ -25,7 +29,7 @@ class ClinicDetailView(generics.RetrieveAPIView):
     """Get clinic details."""
     serializer_class = ClinicSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Clinic.objects.filter(is_active=True)
+    queryset = Clinic.objects.filter(is_active=True).prefetch_related('facilities')
 
 
 class ClinicCreateView(generics.CreateAPIView):
@@ -51,7 +55,7 @@ class ClinicDoctorsView(generics.ListAPIView):
     def get(self, request, pk):
         from apps.doctors.serializers import DoctorListSerializer
         clinic = get_object_or_404(Clinic, pk=pk)
-        doctors = clinic.doctors.filter(is_active=True)
+        doctors = clinic.doctors.filter(is_active=True).select_related('user').prefetch_related('specializations')
         serializer = DoctorListSerializer(doctors, many=True)
         return Response(serializer.data)
 
@@ -0,0 +1,16 @@
+"""
+Retry delays.
+"""
+import random
+
+
+def backoff_delay(attempt: int, base: float = 60, cap: float = 900) -> float:
+    """
+    Seconds to wait before retry number ``attempt`` (0 for the first).
+    
+    The delay doubles with each attempt up to ``cap``, and a random half
+    of it is jittered, so callers that failed together don't all retry
+    at the same moment.
+    """
+    ceiling = min(cap, base * 2 ** attempt)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
@@ -0,0 +1,160 @@
+"""
+Circuit breaker shared across processes.
+
+Calls and failures are counted in Redis per time window, so every worker
+sees the same error rate. When enough calls in a window fail, the circuit
+opens and callers stop making calls until it is due to close. After that a
+single probe call is let through (half-open): if it succeeds the circuit
+closes, and if it fails the circuit reopens for twice as long, up to
+max_open_seconds.
+
+Like the rate limiter, the breaker fails open: if Redis is unreachable,
+every call is allowed.
+"""
+import logging
+import time as clock
+
+import redis
+
+from .redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Returns 1 to allow a call, 2 to allow it as the half-open probe, or
+# -N when calls are refused for another N milliseconds
+ALLOW_SCRIPT = """
+local open_ttl = redis.call('PTTL', KEYS[1] .. ':open')
+if open_ttl > 0 then
+    return -open_ttl
+end
+if redis.call('EXISTS', KEYS[1] .. ':tripped') == 1 then
+    if redis.call('SET', KEYS[1] .. ':probe', '1', 'NX', 'PX', ARGV[1]) then
+        return 2
+    end
+    return -math.max(redis.call('PTTL', KEYS[1] .. ':probe'), 1)
+end
+return 1
+"""
+
+# Records a call's outcome; returns the open period in ms if this call
+# opened the circuit, otherwise 0
+RECORD_SCRIPT = """
+local success = ARGV[1] == '1'
+local probe = ARGV[2] == '1'
+local window = tonumber(ARGV[3])
+local min_calls = tonumber(ARGV[4])
+local error_rate = tonumber(ARGV[5])
+local open_ms = tonumber(ARGV[6])
+local max_open_ms = tonumber(ARGV[7])
+
+local tripped = redis.call('GET', KEYS[1] .. ':tripped')
+if tripped then
+    -- Only the probe decides; calls that were in flight when it opened don't count
+    if not probe then
+        return 0
+    end
+    redis.call('DEL', KEYS[1] .. ':probe')
+    if success then
+        redis.call('DEL', KEYS[1] .. ':tripped')
+        return 0
+    end
+    local period = math.min(tonumber(tripped) * 2, max_open_ms)
+    redis.call('SET', KEYS[1] .. ':tripped', period)
+    redis.call('SET', KEYS[1] .. ':open', '1', 'PX', period)
+    return period
+end
+
+local now = redis.call('TIME')
+local bucket = math.floor(tonumber(now[1]) / window)
+local calls_key = KEYS[1] .. ':calls:' .. bucket
+local failures_key = KEYS[1] .. ':failures:' .. bucket
+local calls = redis.call('INCR', calls_key)
+redis.call('EXPIRE', calls_key, window * 2)
+if success then
+    return 0
+end
+local failures = redis.call('INCR', failures_key)
+redis.call('EXPIRE', failures_key, window * 2)
+
+if calls >= min_calls and failures / calls >= error_rate then
+    redis.call('DEL', calls_key, failures_key)
+    redis.call('SET', KEYS[1] .. ':tripped', open_ms)
+    redis.call('SET', KEYS[1] .. ':open', '1', 'PX', open_ms)
+    return open_ms
+end
+return 0
+"""
+
+
+class CircuitBreaker:
+    """
+    Trips when at least ``min_calls`` calls in a ``window``-second window
+    fail at ``error_rate`` or more, then refuses calls for ``open_seconds``.
+    """
+    
+    def __init__(self, name, error_rate=0.5, min_calls=20, window=60, open_seconds=30, max_open_seconds=600):
+        self.key = f"circuit:{name}"
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_ms = int(open_seconds * 1000)
+        self.max_open_ms = int(max_open_seconds * 1000)
+        # How long a half-open probe may take before another is allowed
+        self.probe_ms = 30 * 1000
+        self._allow_script = None
+        self._record_script = None
+        self._warned_at = float('-inf')
+    
+    def _unavailable(self, e):
+        # Warn once a minute, not once per call
+        if clock.monotonic() - self._warned_at > 60:
+            self._warned_at = clock.monotonic()
+            logger.warning(f"Circuit breaker {self.key} unavailable, allowing calls: {e}")
+    
+    def allow(self):
+        """
+        Ask to make a call. Returns (allowed, probe, retry_after): ``probe``
+        is True for the one trial call let through while half-open, and
+        ``retry_after`` is the seconds to wait when the call is refused.
+        """
+        try:
+            if self._allow_script is None:
+                self._allow_script = get_redis_client().register_script(ALLOW_SCRIPT)
+            verdict = self._allow_script(keys=[self.key], args=[self.probe_ms])
+        except redis.RedisError as e:
+            self._unavailable(e)
+            return True, False, 0
+        if verdict < 0:
+            return False, False, -verdict / 1000
+        return True, verdict == 2, 0
+    
+    def record(self, success, probe=False):
+        """Record the outcome of an allowed call."""
+        try:
+            if self._record_script is None:
+                self._record_script = get_redis_client().register_script(RECORD_SCRIPT)
+            opened = self._record_script(keys=[self.key], args=[
+                int(success), int(probe), self.window, self.min_calls,
+                self.error_rate, self.open_ms, self.max_open_ms
+            ])
+        except redis.RedisError as e:
+            self._unavailable(e)
+            return
+        if opened:
+            logger.warning(f"Circuit {self.key} opened for {opened / 1000:.0f}s")
+        elif probe and success:
+            logger.info(f"Circuit {self.key} closed")
+    
+    def state(self):
+        """'closed', 'open' or 'half_open' (the next call may probe)."""
+        try:
+            with get_redis_client().pipeline() as pipe:
+                pipe.exists(f"{self.key}:open")
+                pipe.exists(f"{self.key}:tripped")
+                is_open, tripped = pipe.execute()
+        except redis.RedisError as e:
+            self._unavailable(e)
+            return 'closed'
+        if is_open:
+            return 'open'
+        return 'half_open' if tripped else 'closed'
@@ -0,0 +1,86 @@
+"""
+Transaction-aware Celery task dispatch.
+
+Tasks are only enqueued once the surrounding transaction commits, so workers
+never read uncommitted rows and rolled-back changes never notify anyone.
+Within a batched_dispatch() scope (every HTTP request, via
+TaskDispatchMiddleware) identical calls are coalesced and published together
+over a single broker connection when the scope exits.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery import current_app
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_pending = ContextVar('pending_task_dispatch', default=None)
+
+
+def dispatch(task, *args, **kwargs):
+    """
+    Enqueue a Celery task after the current transaction commits.
+    
+    Args:
+        task: The Celery task to run.
+        *args, **kwargs: Task arguments. They must be hashable so duplicate
+            calls can be coalesced.
+    """
+    transaction.on_commit(lambda: _collect(task, args, kwargs))
+
+
+def _collect(task, args, kwargs):
+    """Queue a committed task on the active batch, or publish it right away."""
+    pending = _pending.get()
+    if pending is None:
+        _publish([(task, args, kwargs)])
+        return
+    
+    key = (task.name, args, tuple(sorted(kwargs.items())))
+    pending.setdefault(key, (task, args, kwargs))
+
+
+def _publish(entries):
+    """
+    Publish tasks to the broker, reusing one producer connection.
+    
+    Never raises: every task that could not be enqueued is logged on its own,
+    including when no broker connection could be acquired at all.
+    """
+    attempted = 0
+    try:
+        with current_app.producer_or_acquire() as producer:
+            for task, args, kwargs in entries:
+                attempted += 1
+                try:
+                    task.apply_async(args=args, kwargs=kwargs, producer=producer)
+                except Exception as e:
+                    logger.exception(f"Failed to enqueue {task.name}{args}: {e}")
+    except Exception as e:
+        for task, args, kwargs in entries[attempted:]:
+            logger.error(f"Failed to enqueue {task.name}{args}: {e}")
+
+
+@contextmanager
+def batched_dispatch():
+    """
+    Coalesce and batch-publish tasks dispatched inside the block.
+    
+    Nested scopes join the outermost one. Tasks whose transaction committed
+    are published even if the block raises afterwards; a broker failure is
+    logged, never raised over the block's own result or exception.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    
+    token = _pending.set({})
+    try:
+        yield
+    finally:
+        pending = _pending.get()
+        _pending.reset(token)
+        if pending:
+            _publish(list(pending.values()))
@@ -42,6 +42,12 @@ class AppointmentError(HMSAPIException):
         super().__init__(message, code='appointment_error', status_code=status.HTTP_400_BAD_REQUEST)
 
 
+class SlotConflictError(HMSAPIException):
+    """Raised when an appointment slot is already booked or held."""
+    def __init__(self, message="This time slot is no longer available"):
+        super().__init__(message, code='slot_conflict', status_code=status.HTTP_409_CONFLICT)
+
+
 def custom_exception_handler(exc, context):
     """
     Custom exception handler for DRF that provides consistent error responses.
@@ -0,0 +1,61 @@
+"""
+Report Celery queue wait times against their SLOs.
+
+Reads the recent wait samples recorded by apps.core.task_metrics and
+prints p50/p95/p99 per queue. A queue fails when its p95 wait is over its
+SLO in settings.TASK_QUEUE_SLOS. The exit status is non-zero on failure,
+so the command can back an alert.
+
+Usage:
+    python manage.py queue_latency
+    python manage.py queue_latency --queue realtime
+"""
+import math
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.task_metrics import queue_wait_samples
+
+
+def _percentile(values, percent):
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Show recent Celery queue wait percentiles and fail if a queue misses its SLO.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', help='Only report this queue')
+    
+    def handle(self, *args, **options):
+        queues = [options['queue']] if options['queue'] else list(settings.TASK_QUEUE_SLOS)
+        
+        self.stdout.write(f"{'queue':<14}{'samples':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'slo':>8}  status")
+        failures = 0
+        for queue in queues:
+            try:
+                samples = sorted(queue_wait_samples(queue))
+            except redis.RedisError as e:
+                raise CommandError(f"Cannot read queue metrics: {e}")
+            
+            slo = settings.TASK_QUEUE_SLOS.get(queue)
+            slo_label = f"{slo}s" if slo else '-'
+            if not samples:
+                self.stdout.write(f"{queue:<14}{0:>8}{'-':>9}{'-':>9}{'-':>9}{slo_label:>8}  no data")
+                continue
+            
+            p50, p95, p99 = (_percentile(samples, percent) / 1000 for percent in (50, 95, 99))
+            if slo and p95 > slo:
+                failures += 1
+                status = self.style.ERROR('over SLO')
+            else:
+                status = self.style.SUCCESS('ok')
+            
+            self.stdout.write(
+                f"{queue:<14}{len(samples):>8}{p50:>8.2f}s{p95:>8.2f}s{p99:>8.2f}s{slo_label:>8}  {status}"
+            )
+        
+        if failures:
+            raise CommandError(f"{failures} queue(s) over their wait-time SLO")
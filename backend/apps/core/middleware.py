@@ -0,0 +1,31 @@
+"""
+Core middleware for HMS.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .dispatch import batched_dispatch
+
+
+class TaskDispatchMiddleware:
+    """
+    Publish Celery tasks dispatched during a request as one coalesced batch
+    after the response is built.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with batched_dispatch():
+            return self.get_response(request)
+    
+    async def __acall__(self, request):
+        with batched_dispatch():
+            return await self.get_response(request)
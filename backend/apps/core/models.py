@@ -47,6 +47,66 @@ class BaseModel(UUIDModel, TimeStampedModel):
         self.save(update_fields=['is_active', 'updated_at'])
 
 
+class FieldTrackerMixin(models.Model):
+    """
+    Abstract model that remembers the database values of `tracked_fields`.
+    
+    Values are snapshotted in from_db() and after every save, so signal
+    handlers can diff the in-memory instance without re-fetching the row.
+    """
+    tracked_fields = ()
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_tracked_fields(fields)
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(kwargs.get('update_fields'))
+    
+    def _snapshot_tracked_fields(self, fields=None):
+        """Record the current values of tracked fields (deferred fields are skipped)."""
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        
+        for name in self.tracked_fields:
+            if fields is not None and name not in fields:
+                continue
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                self._loaded_values[name] = self.__dict__[attname]
+    
+    def get_changed_fields(self, update_fields=None) -> dict:
+        """
+        Return {field_name: previous_value} for tracked fields that differ
+        from their loaded values.
+        
+        Args:
+            update_fields: Restrict the diff to fields being saved, as passed
+                to save()/post_save. None compares every tracked field.
+        """
+        changed = {}
+        for name, previous in getattr(self, '_loaded_values', {}).items():
+            if update_fields is not None and name not in update_fields:
+                continue
+            if getattr(self, self._meta.get_field(name).attname) != previous:
+                changed[name] = previous
+        return changed
+    
+    def has_changed(self, field_name, update_fields=None) -> bool:
+        """Check whether a tracked field differs from its loaded value."""
+        return field_name in self.get_changed_fields(update_fields)
+
+
 class ActiveManager(models.Manager):
     """
     Manager that returns only active records.
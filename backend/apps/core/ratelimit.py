@@ -0,0 +1,85 @@
+"""
+Token-bucket rate limiting shared across processes.
+
+The bucket lives in Redis and is updated by a Lua script, so every Celery
+worker and web process draws from the same budget atomically. The script
+uses the Redis server clock, so workers with skewed clocks still agree on
+the refill rate.
+"""
+import logging
+import time as clock
+
+import redis
+
+from .redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Returns 0 if a token was taken, otherwise milliseconds until one is due
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimitTimeout(Exception):
+    """No token became available within the caller's timeout."""
+
+
+class TokenBucket:
+    """
+    A rate limit of ``rate`` operations per second with bursts up to
+    ``capacity``, shared by every process using the same name.
+    
+    If Redis is unreachable the bucket fails open: sends go through
+    unthrottled rather than stopping altogether.
+    """
+    
+    def __init__(self, name, rate, capacity=None):
+        self.key = f"ratelimit:{name}"
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._script = None
+        self._warned_at = float('-inf')
+    
+    def _take(self):
+        """Try to take a token; return seconds to wait (0 if taken)."""
+        if self._script is None:
+            self._script = get_redis_client().register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script(keys=[self.key], args=[self.rate, self.capacity]) / 1000
+    
+    def acquire(self, timeout=30):
+        """Block until a token is available; raise RateLimitTimeout after ``timeout`` seconds."""
+        deadline = clock.monotonic() + timeout
+        while True:
+            try:
+                wait = self._take()
+            except redis.RedisError as e:
+                # Warn once a minute, not once per message
+                if clock.monotonic() - self._warned_at > 60:
+                    self._warned_at = clock.monotonic()
+                    logger.warning(f"Rate limiter {self.key} unavailable, not throttling: {e}")
+                return
+            if not wait:
+                return
+            if clock.monotonic() + wait > deadline:
+                raise RateLimitTimeout(f"No {self.key} token within {timeout}s")
+            clock.sleep(wait)
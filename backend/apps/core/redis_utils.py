@@ -0,0 +1,13 @@
+"""
+Shared Redis connections.
+"""
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis_client() -> redis.Redis:
+    """Get the process-wide Redis client (backed by a connection pool)."""
+    return redis.Redis.from_url(settings.REDIS_URL)
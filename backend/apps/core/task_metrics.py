@@ -0,0 +1,65 @@
+"""
+Celery queue wait-time metrics.
+
+Each task message is stamped with its publish time. When a worker starts
+the task, the time it spent waiting in its queue is pushed onto a capped
+Redis list for that queue. All workers share these lists, so percentiles
+cover the whole fleet. Waits over the queue's SLO (settings.TASK_QUEUE_SLOS,
+in seconds) are logged as they happen. `manage.py queue_latency` reports
+percentiles against the SLOs.
+
+Metrics are best effort: if Redis is down, samples are dropped.
+"""
+import logging
+import time as clock
+
+import redis
+from celery.signals import before_task_publish, task_prerun
+from django.conf import settings
+
+from .redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_AT_HEADER = 'published_at'
+SAMPLES_KEPT = 1000
+
+
+def samples_key(queue):
+    return f"celery:queue_wait:{queue}"
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    """Record when the task was published, in the message headers."""
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = clock.time()
+
+
+@task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    """Record how long the task waited in its queue before a worker took it."""
+    request = task.request
+    published_at = request.get(PUBLISHED_AT_HEADER)
+    if request.is_eager or not published_at:
+        return
+    
+    queue = (request.delivery_info or {}).get('routing_key') or 'unknown'
+    wait = max(0.0, clock.time() - published_at)
+    
+    slo = settings.TASK_QUEUE_SLOS.get(queue)
+    if slo and wait > slo:
+        logger.warning(f"{task.name} waited {wait:.1f}s in queue {queue} (SLO {slo}s)")
+    
+    try:
+        with get_redis_client().pipeline() as pipe:
+            pipe.lpush(samples_key(queue), round(wait * 1000))
+            pipe.ltrim(samples_key(queue), 0, SAMPLES_KEPT - 1)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.debug(f"Dropped queue wait sample for {queue}: {e}")
+
+
+def queue_wait_samples(queue):
+    """The most recent wait times for ``queue``, in milliseconds."""
+    return [int(sample) for sample in get_redis_client().lrange(samples_key(queue), 0, -1)]
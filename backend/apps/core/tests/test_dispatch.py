@@ -0,0 +1,72 @@
+"""
+batched_dispatch() must never let a broker failure escape its scope.
+"""
+import logging
+from contextlib import contextmanager
+
+import pytest
+from celery import current_app
+
+from apps.core.dispatch import _collect, batched_dispatch
+
+
+class FakeTask:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = []
+    
+    def apply_async(self, args, kwargs, producer):
+        if self.fail:
+            raise ConnectionError('broker went away')
+        self.calls.append(args)
+
+
+def test_broker_unavailable_is_logged_per_task(monkeypatch, caplog):
+    @contextmanager
+    def unavailable():
+        raise ConnectionError('connection refused')
+        yield
+    
+    monkeypatch.setattr(current_app, 'producer_or_acquire', unavailable)
+    first, second = FakeTask('first'), FakeTask('second')
+    
+    with caplog.at_level(logging.ERROR, logger='apps.core.dispatch'):
+        with batched_dispatch():
+            _collect(first, (1,), {})
+            _collect(second, (2,), {})
+    
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('Failed to enqueue first(1,)') for message in messages)
+    assert any(message.startswith('Failed to enqueue second(2,)') for message in messages)
+
+
+def test_failing_task_does_not_stop_the_batch(monkeypatch, caplog):
+    @contextmanager
+    def producer():
+        yield object()
+    
+    monkeypatch.setattr(current_app, 'producer_or_acquire', producer)
+    broken, ok = FakeTask('broken', fail=True), FakeTask('ok')
+    
+    with caplog.at_level(logging.ERROR, logger='apps.core.dispatch'):
+        with batched_dispatch():
+            _collect(broken, (1,), {})
+            _collect(ok, (2,), {})
+    
+    assert ok.calls == [(2,)]
+    assert any('Failed to enqueue broken(1,)' in record.getMessage() for record in caplog.records)
+
+
+def test_block_exception_is_not_masked(monkeypatch):
+    @contextmanager
+    def unavailable():
+        raise ConnectionError('connection refused')
+        yield
+    
+    monkeypatch.setattr(current_app, 'producer_or_acquire', unavailable)
+    
+    with pytest.raises(ValueError):
+        with batched_dispatch():
+            _collect(FakeTask('task'), (), {})
+            raise ValueError('view failed')
@@ -0,0 +1,103 @@
+"""
+Query-count tests for FieldTrackerMixin: a status change is diffed against
+the values loaded with the instance, so saving never re-fetches the row.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.appointments.factories import AppointmentFactory, LiveQueueFactory
+from apps.appointments.models import Appointment, AppointmentHistory, LiveQueue
+from apps.doctors.factories import DoctorFactory
+from apps.patients.factories import PatientFactory, WaitlistFactory
+from apps.patients.models import Waitlist
+from apps.transfers.models import PatientAccess
+
+pytestmark = pytest.mark.django_db
+
+
+def _selects_from(queries, table):
+    return [
+        query['sql'] for query in queries
+        if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+    ]
+
+
+def test_loaded_instance_reports_previous_values():
+    appointment = Appointment.objects.get(pk=AppointmentFactory(status='scheduled').pk)
+    appointment.status = 'confirmed'
+    
+    assert appointment.get_changed_fields() == {'status': 'scheduled'}
+    assert appointment.has_changed('status')
+    assert not appointment.has_changed('status', update_fields=['notes'])
+
+
+def test_save_resets_the_snapshot():
+    appointment = Appointment.objects.get(pk=AppointmentFactory(status='scheduled').pk)
+    appointment.status = 'confirmed'
+    appointment.save()
+    
+    assert appointment.get_changed_fields() == {}
+
+
+def test_appointment_status_change_does_not_refetch():
+    appointment = Appointment.objects.get(pk=AppointmentFactory(status='scheduled').pk)
+    appointment.status = 'confirmed'
+    
+    with CaptureQueriesContext(connection) as queries:
+        appointment.save()
+    
+    assert _selects_from(queries, 'appointments') == []
+    assert AppointmentHistory.objects.filter(
+        appointment=appointment,
+        previous_status='scheduled',
+        new_status='confirmed'
+    ).exists()
+
+
+def test_appointment_check_in_round_trips():
+    appointment = Appointment.objects.get(pk=AppointmentFactory(status='confirmed').pk)
+    appointment.status = 'checked_in'
+    
+    # UPDATE, history INSERT, checked_in_at UPDATE (was 5 with the pre_save fetches)
+    with CaptureQueriesContext(connection) as queries:
+        appointment.save()
+    
+    assert len(queries) == 3
+    assert _selects_from(queries, 'appointments') == []
+
+
+def test_live_queue_status_change_does_not_refetch():
+    entry = LiveQueue.objects.get(pk=LiveQueueFactory().pk)
+    entry.status = 'called'
+    
+    with CaptureQueriesContext(connection) as queries:
+        entry.save(update_fields=['status'])
+    
+    assert _selects_from(queries, 'live_queue') == []
+    assert entry.get_changed_fields() == {}
+
+
+def test_waitlist_status_change_is_one_update():
+    entry = Waitlist.objects.get(pk=WaitlistFactory().pk)
+    entry.status = 'notified'
+    assert entry.get_changed_fields() == {'status': 'waiting'}
+    
+    with CaptureQueriesContext(connection) as queries:
+        entry.save(update_fields=['status'])
+    
+    assert len(queries) == 1
+    assert queries[0]['sql'].startswith('UPDATE')
+
+
+def test_patient_access_status_change_is_one_update():
+    access = PatientAccess.objects.create(doctor=DoctorFactory(), patient=PatientFactory())
+    access = PatientAccess.objects.get(pk=access.pk)
+    access.status = 'approved'
+    assert access.get_changed_fields() == {'status': 'pending'}
+    
+    with CaptureQueriesContext(connection) as queries:
+        access.save(update_fields=['status'])
+    
+    assert len(queries) == 1
+    assert queries[0]['sql'].startswith('UPDATE')
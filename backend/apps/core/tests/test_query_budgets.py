@@ -0,0 +1,128 @@
+"""
+Per-endpoint SQL query budgets.
+
+Each list/detail endpoint is called with fixtures seeded by factory-boy,
+first with one row per endpoint and then with a full page. An endpoint
+fails if its query count grows with the rows it returns (an N+1) or goes
+over its budget.
+
+Every case records its query counts and elapsed milliseconds per size as
+the ``query_budget`` user property; conftest.py prints them as a table at
+the end of the run (and --junitxml keeps them), so the per-endpoint
+baseline is visible on every CI run.
+"""
+import time as clock
+from datetime import date, time, timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.appointments.factories import AppointmentFactory, AppointmentSeriesFactory, LiveQueueFactory
+from apps.clinics.factories import ClinicFactory
+from apps.doctors.factories import DoctorClinicFactory, DoctorFactory, SpecializationFactory
+from apps.notifications.factories import NotificationFactory
+from apps.patients.factories import PatientFactory, WaitlistFactory
+
+pytestmark = pytest.mark.django_db
+
+# Row counts measured at, kept within one page
+SIZES = (1, 15)
+
+# (name, role, url name, detail object, query budget). The detail object
+# names an attribute of the fixtures whose id is passed to the URL.
+ENDPOINTS = [
+    ('appointments.list', 'patient', 'appointments:list_create', None, 5),
+    ('appointments.list.doctor', 'doctor', 'appointments:list_create', None, 5),
+    ('appointments.detail', 'patient', 'appointments:detail', 'appointment', 5),
+    ('appointments.today', 'doctor', 'appointments:today', None, 5),
+    ('appointments.upcoming', 'patient', 'appointments:upcoming', None, 5),
+    ('appointments.queue', 'doctor', 'appointments:queue', None, 5),
+    ('appointments.series', 'patient', 'appointments:series_list_create', None, 6),
+    ('appointments.series.detail', 'patient', 'appointments:series_detail', 'series', 5),
+    ('patients.list', 'doctor', 'patients:list', None, 4),
+    ('patients.waitlist', 'patient', 'patients:waitlist_list', None, 5),
+    ('patients.waitlist.detail', 'patient', 'patients:waitlist_detail', 'waitlist', 3),
+    ('doctors.list', 'patient', 'doctors:list', None, 4),
+    ('doctors.detail', 'patient', 'doctors:detail', 'doctor', 6),
+    ('clinics.list', 'patient', 'clinics:list', None, 3),
+    ('clinics.detail', 'patient', 'clinics:detail', 'clinic', 3),
+    ('notifications.list', 'patient', 'notifications:list', None, 3),
+]
+
+
+def _slot(index):
+    minutes = index * 15
+    return time(minutes // 60, minutes % 60), time((minutes + 15) // 60, (minutes + 15) % 60)
+
+
+class Fixtures:
+    """A patient and a doctor at one clinic, topped up to N rows per endpoint."""
+    
+    def __init__(self):
+        self.clinic = ClinicFactory()
+        self.specialization = SpecializationFactory(name='General Medicine')
+        self.doctor = DoctorFactory(specializations=[self.specialization])
+        DoctorClinicFactory(doctor=self.doctor, clinic=self.clinic)
+        self.patient = PatientFactory()
+        self.rows = 0
+    
+    def _appointment(self, day, index, **kwargs):
+        start_time, end_time = _slot(index)
+        return AppointmentFactory(
+            patient=self.patient,
+            doctor=self.doctor,
+            clinic=self.clinic,
+            appointment_date=day,
+            start_time=start_time,
+            end_time=end_time,
+            **kwargs
+        )
+    
+    def grow(self, rows):
+        """Add rows until every list endpoint has ``rows`` results."""
+        today = date.today()
+        for index in range(self.rows, rows):
+            self.appointment = self._appointment(today, index)
+            LiveQueueFactory(
+                appointment=self._appointment(today + timedelta(days=1), index, status='checked_in'),
+                queue_date=today,
+                sequence=index + 1
+            )
+            self.series = AppointmentSeriesFactory(patient=self.patient, doctor=self.doctor, clinic=self.clinic)
+            self._appointment(today + timedelta(days=2), index, series=self.series)
+            self.waitlist = WaitlistFactory(patient=self.patient, doctor=self.doctor, clinic=self.clinic)
+            PatientFactory()
+            DoctorClinicFactory(doctor__specializations=[self.specialization], clinic=ClinicFactory())
+            NotificationFactory(recipient=self.patient.user)
+        self.rows = rows
+
+
+@pytest.mark.parametrize(
+    'role, url_name, detail, budget',
+    [endpoint[1:] for endpoint in ENDPOINTS],
+    ids=[endpoint[0] for endpoint in ENDPOINTS]
+)
+def test_query_budget(role, url_name, detail, budget, record_property):
+    fixtures = Fixtures()
+    client = APIClient()
+    client.force_authenticate(fixtures.patient.user if role == 'patient' else fixtures.doctor.user)
+    
+    counts = []
+    timings = []
+    for size in SIZES:
+        fixtures.grow(size)
+        url = reverse(url_name, args=[getattr(fixtures, detail).pk] if detail else [])
+        with CaptureQueriesContext(connection) as queries:
+            started = clock.perf_counter()
+            response = client.get(url, secure=True)
+            elapsed = (clock.perf_counter() - started) * 1000
+        assert response.status_code == 200, f"GET {url} returned {response.status_code}"
+        counts.append(len(queries))
+        timings.append(elapsed)
+    
+    record_property('query_budget', {'sizes': SIZES, 'counts': counts, 'ms': timings, 'budget': budget})
+    assert counts[-1] == counts[0], f"query count grows with rows: {counts}"
+    assert counts[0] <= budget, f"{counts[0]} queries, budget {budget}"
@@ -0,0 +1,374 @@
+"""
+Precomputed slot availability.
+
+A doctor's day at a clinic is compiled into bitmaps at 1-minute
+resolution (bit n covers minute n of the day), so slots of any length
+line up with the bits exactly and never block their neighbours:
+- the open mask: scheduled hours, minus breaks, leave and clinic holidays;
+- the booked mask: the doctor's active appointments, across all clinics.
+
+The open mask and slot layout are cached per doctor-clinic and day.
+Their keys embed doctor and clinic version tokens, which the doctors
+signals bump whenever schedules, leave or holidays change. The booked
+mask is cached per doctor and day; appointment signals set its bits in
+place when appointments are booked, and drop the day when one is
+released or moved so it is recompiled from the database. Checking a slot
+is then two AND operations.
+"""
+import heapq
+import time as clock
+import uuid
+from collections import defaultdict
+from datetime import time
+
+from django.core.cache import cache
+
+from apps.appointments.models import BOOKED_STATUSES, Appointment
+from .models import DoctorLeave, DoctorSchedule
+
+MINUTES_PER_DAY = 24 * 60
+FULL_DAY = (1 << MINUTES_PER_DAY) - 1
+
+# Compiled schedules are invalidated through version tokens; the TTL only
+# bounds how long unused entries linger.
+PLAN_TTL = 24 * 60 * 60
+# Booked masks are patched in place. A short TTL bounds drift from
+# concurrent read-modify-write updates.
+BOOKED_TTL = 5 * 60
+
+
+def _minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def span_mask(start: time, end: time = None) -> int:
+    """Bits covering [start, end); a missing end runs to midnight."""
+    first = _minutes(start)
+    last = _minutes(end) if end else MINUTES_PER_DAY
+    if last <= first:
+        return 0
+    return _slot_mask(first, last - first)
+
+
+def _slot_mask(start_minute, duration):
+    return ((1 << duration) - 1) << start_minute
+
+
+# Cache keys and versions
+#
+# Plan and booked keys carry the mask format, so masks cached at another
+# resolution are never read back.
+
+def _version_key(kind, object_id):
+    return f"availability:version:{kind}:{object_id}"
+
+
+def _plan_key(doctor_clinic_id, day, doctor_version, clinic_version):
+    return f"availability:m1:plan:{doctor_clinic_id}:{day.isoformat()}:{doctor_version}:{clinic_version}"
+
+
+def _booked_key(doctor_id, day):
+    return f"availability:m1:booked:{doctor_id}:{day.isoformat()}"
+
+
+def _get_versions(kinds_and_ids):
+    """Return {(kind, id): token}, creating tokens that are missing."""
+    keys = {_version_key(kind, object_id): (kind, object_id) for kind, object_id in kinds_and_ids}
+    found = cache.get_many(list(keys))
+    for key in keys:
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+    return {keys[key]: token for key, token in found.items()}
+
+
+def bump_doctor_version(doctor_id):
+    """Invalidate compiled plans for every clinic of a doctor."""
+    cache.set(_version_key('doctor', doctor_id), uuid.uuid4().hex, None)
+
+
+def bump_clinic_version(clinic_id):
+    """Invalidate compiled plans for every doctor at a clinic."""
+    cache.set(_version_key('clinic', clinic_id), uuid.uuid4().hex, None)
+
+
+# Compilation
+
+def _schedule_slots(schedule):
+    """(start_minute, duration) slots for a schedule; a slot that would start in the break jumps to its end."""
+    slots = []
+    current = _minutes(schedule.start_time)
+    end = _minutes(schedule.end_time)
+    duration = schedule.slot_duration
+    
+    break_start = break_end = None
+    if schedule.break_start and schedule.break_end:
+        break_start = _minutes(schedule.break_start)
+        break_end = _minutes(schedule.break_end)
+    
+    while current + duration <= end:
+        if break_start is not None and break_start <= current < break_end:
+            current = break_end
+            continue
+        slots.append((current, duration))
+        current += duration
+    
+    return slots
+
+
+def _leave_mask(leave, day):
+    """Bits blocked by a leave on one day of its range."""
+    start = leave.start_time if leave.start_date == day else None
+    end = leave.end_time if leave.end_date == day else None
+    if not start and not end:
+        return FULL_DAY
+    return span_mask(start or time(0), end)
+
+
+def _compile_plans(doctor_clinics, dates):
+    """Build {(doctor_clinic_id, date): (open_mask, slots, reason)} from the database."""
+    doctor_ids = {dc.doctor_id for dc in doctor_clinics}
+    clinic_ids = {dc.clinic_id for dc in doctor_clinics}
+    first, last = min(dates), max(dates)
+    
+    schedules = defaultdict(list)
+    for schedule in DoctorSchedule.objects.filter(
+        doctor_clinic__in=[dc.id for dc in doctor_clinics],
+        day_of_week__in={day.weekday() for day in dates},
+        is_active=True
+    ):
+        schedules[(schedule.doctor_clinic_id, schedule.day_of_week)].append(schedule)
+    
+    leaves = defaultdict(list)
+    for leave in DoctorLeave.objects.filter(
+        doctor_id__in=doctor_ids,
+        start_date__lte=last,
+        end_date__gte=first,
+        is_active=True
+    ):
+        leaves[leave.doctor_id].append(leave)
+    
+    from apps.clinics.models import ClinicHoliday
+    holidays = set(ClinicHoliday.objects.filter(
+        clinic_id__in=clinic_ids,
+        date__range=(first, last),
+        is_active=True
+    ).values_list('clinic_id', 'date'))
+    
+    plans = {}
+    for dc in doctor_clinics:
+        for day in dates:
+            slots = []
+            open_mask = 0
+            for schedule in schedules[(dc.id, day.weekday())]:
+                for start, duration in _schedule_slots(schedule):
+                    slots.append((start, duration))
+                    open_mask |= _slot_mask(start, duration)
+            slots.sort()
+            
+            reason = ''
+            if open_mask and (dc.clinic_id, day) in holidays:
+                open_mask = 0
+                reason = 'Clinic is closed'
+            
+            for leave in leaves[dc.doctor_id]:
+                if not open_mask:
+                    break
+                if leave.start_date <= day <= leave.end_date and leave.clinic_id in (None, dc.clinic_id):
+                    open_mask &= ~_leave_mask(leave, day)
+                    if not open_mask:
+                        reason = 'Doctor is on leave'
+            
+            plans[(dc.id, day)] = (open_mask, slots, reason)
+    
+    return plans
+
+
+def _compile_booked(doctor_ids, dates):
+    """Build {(doctor_id, date): booked_mask} from the database."""
+    booked = {(doctor_id, day): 0 for doctor_id in doctor_ids for day in dates}
+    for doctor_id, day, start, end in Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        appointment_date__in=dates,
+        status__in=BOOKED_STATUSES,
+        is_active=True
+    ).values_list('doctor_id', 'appointment_date', 'start_time', 'end_time'):
+        booked[(doctor_id, day)] |= span_mask(start, end)
+    return booked
+
+
+class DayAvailability:
+    """Compiled availability for one doctor-clinic on one day."""
+    
+    def __init__(self, doctor_clinic, day, open_mask, slots, booked_mask, reason=''):
+        self.doctor_clinic = doctor_clinic
+        self.day = day
+        self.open_mask = open_mask
+        self.slots = slots
+        self.booked_mask = booked_mask
+        self.reason = reason
+    
+    def is_free(self, start_minute, duration) -> bool:
+        mask = _slot_mask(start_minute, duration)
+        return self.open_mask & mask == mask and not self.booked_mask & mask
+    
+    def iter_slots(self):
+        """Yield (start_time, duration, available) for slots inside open hours."""
+        for start, duration in self.slots:
+            mask = _slot_mask(start, duration)
+            if self.open_mask & mask != mask:
+                continue
+            yield time(start // 60, start % 60), duration, not self.booked_mask & mask
+    
+    def free_slots(self, window_mask=FULL_DAY, after_minute=0):
+        """Yield (start_minute, duration) for free slots wholly inside a window."""
+        free = self.open_mask & ~self.booked_mask & window_mask
+        if not free:
+            return
+        for start, duration in self.slots:
+            if start < after_minute:
+                continue
+            mask = _slot_mask(start, duration)
+            if free & mask == mask:
+                yield start, duration
+    
+    def free_count(self) -> int:
+        return sum(1 for _, _, available in self.iter_slots() if available)
+    
+    def as_slots(self):
+        """Slot dicts in the shape the availability endpoint returns."""
+        return [
+            {
+                'time': start.strftime('%H:%M'),
+                'clinic_id': str(self.doctor_clinic.clinic_id),
+                'clinic_name': self.doctor_clinic.clinic.name,
+                'duration': duration,
+                'available': available
+            }
+            for start, duration, available in self.iter_slots()
+        ]
+
+
+def compile_availability(doctor_clinics, dates):
+    """
+    Availability for every doctor-clinic and date combination.
+    
+    Cached plans and booked masks are fetched in two get_many calls; only
+    misses touch the database, with one query per model for the whole
+    batch. Pass doctor_clinics with select_related('clinic') if the
+    results will be rendered.
+    
+    Returns {(doctor_clinic_id, date): DayAvailability}.
+    """
+    doctor_clinics = list(doctor_clinics)
+    dates = sorted(set(dates))
+    if not doctor_clinics or not dates:
+        return {}
+    
+    versions = _get_versions(
+        [('doctor', dc.doctor_id) for dc in doctor_clinics] +
+        [('clinic', dc.clinic_id) for dc in doctor_clinics]
+    )
+    plan_keys = {
+        (dc.id, day): _plan_key(dc.id, day, versions[('doctor', dc.doctor_id)], versions[('clinic', dc.clinic_id)])
+        for dc in doctor_clinics for day in dates
+    }
+    doctor_ids = {dc.doctor_id for dc in doctor_clinics}
+    booked_keys = {(doctor_id, day): _booked_key(doctor_id, day) for doctor_id in doctor_ids for day in dates}
+    
+    cached = cache.get_many(list(plan_keys.values()) + list(booked_keys.values()))
+    plans = {key: cached[cache_key] for key, cache_key in plan_keys.items() if cache_key in cached}
+    booked = {key: cached[cache_key] for key, cache_key in booked_keys.items() if cache_key in cached}
+    
+    missing_plans = [key for key in plan_keys if key not in plans]
+    if missing_plans:
+        dc_ids = {dc_id for dc_id, _ in missing_plans}
+        compiled = _compile_plans(
+            [dc for dc in doctor_clinics if dc.id in dc_ids],
+            {day for _, day in missing_plans}
+        )
+        cache.set_many({plan_keys[key]: plan for key, plan in compiled.items()}, PLAN_TTL)
+        plans.update(compiled)
+    
+    missing_booked = [key for key in booked_keys if key not in booked]
+    if missing_booked:
+        compiled = _compile_booked(
+            {doctor_id for doctor_id, _ in missing_booked},
+            {day for _, day in missing_booked}
+        )
+        cache.set_many({booked_keys[key]: mask for key, mask in compiled.items()}, BOOKED_TTL)
+        booked.update(compiled)
+    
+    results = {}
+    for dc in doctor_clinics:
+        for day in dates:
+            open_mask, slots, reason = plans[(dc.id, day)]
+            results[(dc.id, day)] = DayAvailability(
+                dc, day, open_mask, slots, booked[(dc.doctor_id, day)], reason
+            )
+    return results
+
+
+def find_earliest_slots(doctor_clinics, dates, window_mask=FULL_DAY, limit=10, budget=None, now=None):
+    """
+    The ``limit`` earliest free slots across doctor-clinics and dates.
+    
+    Days are scanned in order, each as one compile_availability batch, and
+    the scan stops as soon as ``limit`` slots are found, since later days
+    cannot beat them. If ``budget`` seconds run out first, the slots found
+    so far are returned with partial=True.
+    
+    Returns (slots, searched_until, partial), where slots are
+    (date, start_minute, duration, doctor_clinic) tuples.
+    """
+    doctor_clinics = list(doctor_clinics)
+    deadline = clock.monotonic() + budget if budget else None
+    found = []
+    searched_until = None
+    
+    dates = sorted(set(dates))
+    for day in dates:
+        after_minute = 0
+        if now and day == now.date():
+            after_minute = now.hour * 60 + now.minute + 1
+        
+        availability = compile_availability(doctor_clinics, [day])
+        candidates = (
+            (day, start, duration, index)
+            for index, dc in enumerate(doctor_clinics)
+            for start, duration in availability[(dc.id, day)].free_slots(window_mask, after_minute)
+        )
+        found.extend(heapq.nsmallest(limit - len(found), candidates))
+        searched_until = day
+        
+        if len(found) >= limit:
+            break
+        if deadline and day != dates[-1] and clock.monotonic() > deadline:
+            return _with_clinics(found, doctor_clinics), searched_until, True
+    
+    return _with_clinics(found, doctor_clinics), searched_until, False
+
+
+def _with_clinics(found, doctor_clinics):
+    return [(day, start, duration, doctor_clinics[index]) for day, start, duration, index in found]
+
+
+# Incremental booked-mask updates
+
+def mark_booked(doctor_id, day, start, end):
+    """
+    Set a new booking's bits in the cached booked mask.
+    
+    Releases have no counterpart: clearing a span could free minutes that
+    another active appointment still overlaps, so a release drops the day
+    with invalidate_booked and the next read recompiles it.
+    """
+    key = _booked_key(doctor_id, day)
+    current = cache.get(key)
+    if current is None:
+        return  # compiled from the database on next read
+    cache.set(key, current | span_mask(start, end), BOOKED_TTL)
+
+
+def invalidate_booked(doctor_id, *days):
+    cache.delete_many([_booked_key(doctor_id, day) for day in days if day])
@@ -0,0 +1,53 @@
+"""
+factory-boy factories for doctors, their clinics and schedules.
+"""
+from datetime import time
+from decimal import Decimal
+
+import factory
+
+from apps.clinics.factories import ClinicFactory
+from apps.users.factories import UserFactory
+from .models import Doctor, DoctorClinic, DoctorSchedule, Specialization
+
+
+class SpecializationFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Specialization
+        django_get_or_create = ('name',)
+    
+    name = factory.Sequence(lambda n: f"Specialization {n}")
+
+
+class DoctorFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Doctor
+    
+    user = factory.SubFactory(UserFactory, user_type='doctor')
+    registration_number = factory.Sequence(lambda n: f"MED{n:06d}")
+    qualification = 'MBBS'
+    consultation_fee = Decimal('500.00')
+    
+    @factory.post_generation
+    def specializations(self, create, extracted, **kwargs):
+        if create and extracted:
+            self.specializations.add(*extracted)
+
+
+class DoctorClinicFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = DoctorClinic
+    
+    doctor = factory.SubFactory(DoctorFactory)
+    clinic = factory.SubFactory(ClinicFactory)
+
+
+class DoctorScheduleFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = DoctorSchedule
+    
+    doctor_clinic = factory.SubFactory(DoctorClinicFactory)
+    day_of_week = 0
+    start_time = time(9, 0)
+    end_time = time(17, 0)
+    slot_duration = 15
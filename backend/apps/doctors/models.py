@@ -63,7 +63,8 @@ class Doctor(BaseModel):
     
     @property
     def specialization_list(self):
-        return list(self.specializations.values_list('name', flat=True))
+        # Iterates .all() so a prefetch_related('specializations') is reused
+        return [specialization.name for specialization in self.specializations.all()]
 
 
 class DoctorClinic(BaseModel):
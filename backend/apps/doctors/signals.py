@@ -0,0 +1,27 @@
+"""
+Django signals that keep compiled availability in step with schedules,
+leave and clinic holidays.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.clinics.models import ClinicHoliday
+from .availability import bump_clinic_version, bump_doctor_version
+from .models import DoctorClinic, DoctorLeave, DoctorSchedule
+
+
+@receiver([post_save, post_delete], sender=DoctorSchedule)
+def invalidate_schedule_availability(sender, instance, **kwargs):
+    doctor_id = DoctorClinic.objects.filter(pk=instance.doctor_clinic_id).values_list('doctor_id', flat=True).first()
+    if doctor_id:
+        bump_doctor_version(doctor_id)
+
+
+@receiver([post_save, post_delete], sender=DoctorClinic)
+@receiver([post_save, post_delete], sender=DoctorLeave)
+def invalidate_doctor_availability(sender, instance, **kwargs):
+    bump_doctor_version(instance.doctor_id)
+
+
+@receiver([post_save, post_delete], sender=ClinicHoliday)
+def invalidate_clinic_availability(sender, instance, **kwargs):
+    bump_clinic_version(instance.clinic_id)
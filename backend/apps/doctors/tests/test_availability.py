@@ -0,0 +1,107 @@
+"""
+Compiled availability: slot lengths that don't divide an hour evenly,
+keeping cached booked masks in step with committed bookings, and the slot
+search time window.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.appointments.factories import AppointmentFactory
+from apps.doctors.availability import compile_availability, find_earliest_slots
+from apps.doctors.factories import DoctorScheduleFactory
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+MONDAY = date.today() + timedelta(days=7 - date.today().weekday())
+
+
+@pytest.fixture
+def schedule():
+    return DoctorScheduleFactory(
+        day_of_week=0,
+        start_time=time(9, 0),
+        end_time=time(10, 0),
+        slot_duration=12
+    )
+
+
+def _book(schedule, start, end):
+    return AppointmentFactory(
+        doctor=schedule.doctor_clinic.doctor,
+        clinic=schedule.doctor_clinic.clinic,
+        appointment_date=MONDAY,
+        start_time=start,
+        end_time=end,
+        status='scheduled'
+    )
+
+
+def test_booking_blocks_only_its_own_slot(schedule):
+    _book(schedule, time(9, 12), time(9, 24))
+    
+    availability = compile_availability([schedule.doctor_clinic], [MONDAY])[(schedule.doctor_clinic_id, MONDAY)]
+    
+    assert [(start.strftime('%H:%M'), available) for start, _, available in availability.iter_slots()] == [
+        ('09:00', True),
+        ('09:12', False),
+        ('09:24', True),
+        ('09:36', True),
+        ('09:48', True)
+    ]
+
+
+def test_earliest_slots_skip_only_booked_slot(schedule):
+    _book(schedule, time(9, 0), time(9, 12))
+    
+    slots, _, partial = find_earliest_slots([schedule.doctor_clinic], [MONDAY], limit=2)
+    
+    assert not partial
+    assert [(start, duration) for _, start, duration, _ in slots] == [(9 * 60 + 12, 12), (9 * 60 + 24, 12)]
+
+
+def test_booked_mask_changes_only_on_commit(schedule, django_capture_on_commit_callbacks):
+    key = (schedule.doctor_clinic_id, MONDAY)
+    compile_availability([schedule.doctor_clinic], [MONDAY])
+    
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        _book(schedule, time(9, 0), time(9, 12))
+    assert compile_availability([schedule.doctor_clinic], [MONDAY])[key].is_free(9 * 60, 12)
+    
+    for callback in callbacks:
+        callback()
+    assert not compile_availability([schedule.doctor_clinic], [MONDAY])[key].is_free(9 * 60, 12)
+
+
+def test_release_keeps_minutes_another_booking_overlaps(schedule, django_capture_on_commit_callbacks):
+    key = (schedule.doctor_clinic_id, MONDAY)
+    first = _book(schedule, time(9, 0), time(9, 12))
+    _book(schedule, time(9, 6), time(9, 18))
+    compile_availability([schedule.doctor_clinic], [MONDAY])
+    
+    with django_capture_on_commit_callbacks(execute=True):
+        first.status = 'cancelled'
+        first.save()
+    
+    availability = compile_availability([schedule.doctor_clinic], [MONDAY])[key]
+    assert not availability.is_free(9 * 60, 12)
+    assert not availability.is_free(9 * 60 + 12, 12)
+    assert availability.is_free(9 * 60 + 24, 12)
+
+
+@pytest.mark.parametrize('window', [
+    {'time_from': '10:00', 'time_to': '09:00'},
+    {'time_from': '10:00', 'time_to': '10:00'},
+    {'time_to': '00:00'},
+])
+def test_slot_search_rejects_empty_time_window(window):
+    client = APIClient()
+    client.force_authenticate(UserFactory())
+    
+    response = client.get(reverse('doctors:slot_search'), window, secure=True)
+    
+    assert response.status_code == 400
+    assert response.data == {'error': 'time_to must be after time_from'}
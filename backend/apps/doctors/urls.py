@@ -4,7 +4,7 @@ URL patterns for doctor management.
 from django.urls import path
 from .views import (
     DoctorProfileView, DoctorDetailView, DoctorListView,
-    SpecializationListView, DoctorAvailabilityView,
+    SpecializationListView, DoctorAvailabilityView, SlotSearchView,
     DoctorScheduleListCreateView, DoctorScheduleDetailView,
     DoctorLeaveListCreateView, DoctorLeaveDetailView
 )
@@ -17,6 +17,7 @@ urlpatterns = [
     path('list/', DoctorListView.as_view(), name='list'),
     path('<uuid:pk>/', DoctorDetailView.as_view(), name='detail'),
     path('<uuid:doctor_id>/availability/', DoctorAvailabilityView.as_view(), name='availability'),
+    path('slots/search/', SlotSearchView.as_view(), name='slot_search'),
     
     # Specializations
     path('specializations/', SpecializationListView.as_view(), name='specialization_list'),
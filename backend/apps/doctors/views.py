@@ -4,10 +4,12 @@ Views for doctor management.
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from datetime import date, datetime, timedelta
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
 
+from .availability import FULL_DAY, compile_availability, find_earliest_slots, span_mask
 from .models import Doctor, Specialization, DoctorClinic, DoctorSchedule, DoctorLeave
 from .serializers import (
     DoctorSerializer, DoctorCreateSerializer, DoctorListSerializer,
@@ -40,7 +42,9 @@ class DoctorDetailView(generics.RetrieveAPIView):
     """Get doctor details by ID."""
     serializer_class = DoctorSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Doctor.objects.filter(is_active=True)
+    queryset = Doctor.objects.filter(is_active=True).select_related('user').prefetch_related(
+        'specializations', 'doctor_clinics__clinic', 'doctor_clinics__schedules'
+    )
 
 
 class DoctorListView(generics.ListAPIView):
@@ -63,7 +67,7 @@ class DoctorListView(generics.ListAPIView):
         if clinic:
             queryset = queryset.filter(clinics__id=clinic)
         
-        return queryset.distinct()
+        return queryset.distinct().select_related('user').prefetch_related('specializations')
 
 
 class SpecializationListView(generics.ListAPIView):
@@ -96,50 +100,31 @@ class DoctorAvailabilityView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get day of week (0=Monday, 6=Sunday)
-        day_of_week = check_date.weekday()
-        
-        # Build schedule query
-        schedule_query = Q(doctor_clinic__doctor=doctor, day_of_week=day_of_week)
+        doctor_clinics = DoctorClinic.objects.filter(
+            doctor=doctor,
+            is_active=True
+        ).select_related('clinic')
         if clinic_id:
-            schedule_query &= Q(doctor_clinic__clinic_id=clinic_id)
+            doctor_clinics = doctor_clinics.filter(clinic_id=clinic_id)
         
-        schedules = DoctorSchedule.objects.filter(schedule_query)
+        availability = compile_availability(doctor_clinics, [check_date])
         
-        # Check for leaves
-        leaves = DoctorLeave.objects.filter(
-            doctor=doctor,
-            start_date__lte=check_date,
-            end_date__gte=check_date
-        )
+        all_slots = []
+        reasons = set()
+        for day in availability.values():
+            all_slots.extend(day.as_slots())
+            if day.reason:
+                reasons.add(day.reason)
         
-        if leaves.exists():
+        if not all_slots and reasons:
             return Response({
                 'date': date_str,
                 'available': False,
-                'reason': 'Doctor is on leave',
+                'reason': ', '.join(sorted(reasons)),
                 'slots': []
             })
         
-        # Generate time slots
-        all_slots = []
-        for schedule in schedules:
-            slots = self._generate_slots(schedule, check_date)
-            all_slots.extend(slots)
-        
-        # Get booked appointments
-        from apps.appointments.models import Appointment
-        booked = Appointment.objects.filter(
-            doctor=doctor,
-            appointment_date=check_date,
-            status__in=['scheduled', 'confirmed', 'checked_in', 'in_progress']
-        ).values_list('start_time', flat=True)
-        
-        booked_times = set(str(t)[:5] for t in booked)
-        
-        # Mark booked slots
-        for slot in all_slots:
-            slot['available'] = slot['time'] not in booked_times
+        all_slots.sort(key=lambda slot: slot['time'])
         
         return Response({
             'date': date_str,
@@ -147,37 +132,103 @@ class DoctorAvailabilityView(APIView):
             'doctor': DoctorListSerializer(doctor).data,
             'slots': all_slots
         })
+
+
+class SlotSearchView(APIView):
+    """Find the earliest free slots across all matching doctors."""
+    permission_classes = [permissions.IsAuthenticated]
     
-    def _generate_slots(self, schedule, check_date):
-        """Generate time slots from schedule."""
-        slots = []
-        current = datetime.combine(check_date, schedule.start_time)
-        end = datetime.combine(check_date, schedule.end_time)
-        duration = timedelta(minutes=schedule.slot_duration)
-        
-        break_start = None
-        break_end = None
-        if schedule.break_start and schedule.break_end:
-            break_start = datetime.combine(check_date, schedule.break_start)
-            break_end = datetime.combine(check_date, schedule.break_end)
-        
-        while current + duration <= end:
-            # Skip break time
-            if break_start and break_end:
-                if break_start <= current < break_end:
-                    current = break_end
-                    continue
-            
-            slots.append({
-                'time': current.strftime('%H:%M'),
-                'clinic_id': str(schedule.doctor_clinic.clinic_id),
-                'clinic_name': schedule.doctor_clinic.clinic.name,
-                'duration': schedule.slot_duration,
-                'available': True
-            })
-            current += duration
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+    
+    def get(self, request):
+        params = request.query_params
         
-        return slots
+        try:
+            date_from = self._parse_date(params.get('date_from')) or date.today()
+            date_to = self._parse_date(params.get('date_to')) or date_from + timedelta(days=6)
+            time_from = self._parse_time(params.get('time_from'))
+            time_to = self._parse_time(params.get('time_to'))
+            limit = min(int(params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid parameters. Use YYYY-MM-DD dates, HH:MM times and a numeric limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if date_to < date_from or limit < 1:
+            return Response(
+                {'error': 'date_to must not be before date_from and limit must be positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if time_to and time_to <= (time_from or time(0)):
+            return Response(
+                {'error': 'time_to must be after time_from'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        date_from = max(date_from, date.today())
+        date_to = min(date_to, date_from + timedelta(days=settings.SLOT_SEARCH_MAX_DAYS - 1))
+        dates = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+        
+        window_mask = FULL_DAY
+        if time_from or time_to:
+            window_mask = span_mask(time_from or time(0), time_to)
+        
+        doctor_clinics = DoctorClinic.objects.filter(
+            is_active=True,
+            doctor__is_active=True,
+            doctor__is_accepting_patients=True,
+            clinic__is_active=True
+        ).select_related('clinic', 'doctor__user')
+        
+        specialization = params.get('specialization')
+        if specialization:
+            doctor_clinics = doctor_clinics.filter(doctor__specializations__name__icontains=specialization)
+        
+        city = params.get('city')
+        if city:
+            doctor_clinics = doctor_clinics.filter(clinic__city__iexact=city)
+        
+        clinic_id = params.get('clinic')
+        if clinic_id:
+            doctor_clinics = doctor_clinics.filter(clinic_id=clinic_id)
+        
+        slots, searched_until, partial = find_earliest_slots(
+            doctor_clinics.distinct(),
+            dates,
+            window_mask=window_mask,
+            limit=limit,
+            budget=settings.SLOT_SEARCH_BUDGET_MS / 1000,
+            now=timezone.localtime()
+        )
+        
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'searched_until': searched_until,
+            'partial': partial,
+            'results': [
+                {
+                    'date': day,
+                    'time': f"{start // 60:02d}:{start % 60:02d}",
+                    'duration': duration,
+                    'doctor_id': str(doctor_clinic.doctor_id),
+                    'doctor_name': f"Dr. {doctor_clinic.doctor.user.full_name}",
+                    'clinic_id': str(doctor_clinic.clinic_id),
+                    'clinic_name': doctor_clinic.clinic.name,
+                    'consultation_fee': doctor_clinic.consultation_fee or doctor_clinic.doctor.consultation_fee
+                }
+                for day, start, duration, doctor_clinic in slots
+            ]
+        })
+    
+    def _parse_date(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    
+    def _parse_time(self, value):
+        return datetime.strptime(value, '%H:%M').time() if value else None
 
 
 # Schedule management views
@@ -54,7 +54,7 @@ class MedicalRecordListCreateView(generics.ListCreateAPIView):
         if record_type:
             queryset = queryset.filter(record_type=record_type)
         
-        return queryset.order_by('-record_date', '-created_at')
+        return queryset.select_related('doctor__user', 'clinic').order_by('-record_date', '-created_at')
     
     def perform_create(self, serializer):
         doctor = get_object_or_404(Doctor, user=self.request.user)
@@ -78,7 +78,7 @@ class PatientMedicalHistoryView(generics.ListAPIView):
         return MedicalRecord.objects.filter(
             patient_id=patient_id,
             is_active=True
-        ).order_by('-record_date')
+        ).select_related('doctor__user', 'clinic').order_by('-record_date')
 
 
 class FileUploadURLView(APIView):
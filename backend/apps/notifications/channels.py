@@ -0,0 +1,177 @@
+"""
+Delivery channels for the notification outbox.
+
+A channel adapter sends a batch of outbox rows for one channel in one go
+and returns a result per row, in the same shape WhatsAppService returns
+('success', 'message_id', 'error', and 'deferred'/'retry_after' or
+'permanent' when relevant). The outbox groups each claimed batch by
+channel and hands every group to its adapter, so a burst going to a mix
+of WhatsApp, SMS and email costs one batch send per channel, not one call
+per message.
+
+- WhatsApp and SMS send concurrently through their pooled provider
+  clients, behind their own rate limits and circuit breakers.
+- Email opens one SMTP connection per batch and sends every message over
+  it, reconnecting only after an error, instead of a connection (and TLS
+  handshake and login) per message.
+
+choose_channel() picks the channel for a recipient: the template's own
+channel when the user can be reached on it, otherwise the first enabled
+channel in settings.NOTIFICATION_CHANNELS they can be reached on.
+WhatsApp counts only for users who opted in, once another channel is
+enabled; while WhatsApp is the only channel it reaches everyone with a
+number.
+
+Push notifications have no adapter: no device tokens are stored, so there
+is nothing to address them to. choose_channel() never picks push, and any
+push row in the outbox fails outright.
+"""
+from abc import ABC, abstractmethod
+import logging
+import smtplib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.message import make_msgid
+
+logger = logging.getLogger(__name__)
+
+
+def whatsapp_opt_in_required() -> bool:
+    """
+    WhatsApp opt-in is only enforced once another channel is enabled to
+    reach users who haven't opted in. With WhatsApp as the only channel,
+    everyone with a number gets WhatsApp, as before opt-in existed.
+    """
+    return any(channel != 'whatsapp' for channel in settings.NOTIFICATION_CHANNELS)
+
+
+def contact_for(user, channel):
+    """The address ``user`` is reached at on ``channel``, or '' if none."""
+    if channel == 'whatsapp':
+        if not user.whatsapp_opted_in and whatsapp_opt_in_required():
+            return ''
+        return user.whatsapp_number or user.phone_number
+    if channel == 'sms':
+        return user.phone_number or user.whatsapp_number
+    if channel == 'email':
+        return user.email
+    return ''
+
+
+def choose_channel(user, preferred=None):
+    """
+    Return (channel, contact) for a message to ``user``, or (None, '') when
+    no enabled channel reaches them. ``preferred`` (the template's channel)
+    wins when it is enabled and reaches the user.
+    """
+    enabled = settings.NOTIFICATION_CHANNELS
+    candidates = ([preferred] if preferred in enabled else []) + list(enabled)
+    for channel in candidates:
+        contact = contact_for(user, channel)
+        if contact:
+            return channel, contact
+    return None, ''
+
+
+class Channel(ABC):
+    """Interface for a channel adapter."""
+    name = None
+    circuit = None
+    
+    @abstractmethod
+    def send_batch(self, notifications) -> list:
+        """Send ``notifications``; returns one result dict per notification, in order."""
+    
+    def state(self):
+        """Circuit state: 'closed', 'open' or 'half_open'."""
+        return self.circuit.state() if self.circuit else 'closed'
+
+
+class MessagingChannel(Channel):
+    """WhatsApp or SMS, sent with the service's concurrent send_bulk()."""
+    
+    def __init__(self, service):
+        self.service = service
+        self.name = service.channel
+        self.circuit = service.circuit
+    
+    def send_batch(self, notifications):
+        return self.service.send_bulk(
+            [(notification.recipient_contact, notification.body) for notification in notifications]
+        )
+
+
+class EmailChannel(Channel):
+    """Email over one SMTP connection per batch."""
+    name = 'email'
+    
+    def _message(self, notification):
+        message_id = make_msgid(domain='hms.local')
+        return message_id, EmailMessage(
+            subject=notification.subject or 'HMS Notification',
+            body=notification.body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.recipient_contact],
+            headers={'Message-ID': message_id}
+        )
+    
+    def send_batch(self, notifications):
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            logger.error(f"Cannot connect to the mail server: {str(e)}")
+            return [{'success': False, 'error': str(e)} for _ in notifications]
+        
+        results = []
+        reconnect = False
+        try:
+            for notification in notifications:
+                message_id, message = self._message(notification)
+                try:
+                    if reconnect:
+                        connection.close()
+                        connection.open()
+                        reconnect = False
+                    connection.send_messages([message])
+                except smtplib.SMTPRecipientsRefused as e:
+                    # The server is fine, it just won't take this address
+                    logger.warning(f"Email to {notification.recipient_contact} refused: {str(e)}")
+                    results.append({'success': False, 'error': str(e), 'permanent': True})
+                except Exception as e:
+                    logger.error(f"Failed to send email: {str(e)}")
+                    results.append({'success': False, 'error': str(e)})
+                    # The session may be broken; reconnect before the next send
+                    reconnect = True
+                else:
+                    results.append({'success': True, 'message_id': message_id, 'status': 'sent'})
+        finally:
+            connection.close()
+        return results
+
+
+def _build(name):
+    if name == 'whatsapp':
+        from .whatsapp import get_whatsapp_service
+        return MessagingChannel(get_whatsapp_service())
+    if name == 'sms':
+        from .sms import get_sms_service
+        return MessagingChannel(get_sms_service())
+    if name == 'email':
+        return EmailChannel()
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_channels() -> dict:
+    """Adapters for the enabled channels, by name, created on first use."""
+    channels = {}
+    for name in settings.NOTIFICATION_CHANNELS:
+        channel = _build(name)
+        if channel is None:
+            logger.warning(f"No adapter for notification channel {name}; it is ignored")
+            continue
+        channels[name] = channel
+    return channels
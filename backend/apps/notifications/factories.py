@@ -0,0 +1,17 @@
+"""
+factory-boy factories for notifications.
+"""
+import factory
+
+from apps.users.factories import UserFactory
+from .models import Notification
+
+
+class NotificationFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Notification
+    
+    recipient = factory.SubFactory(UserFactory)
+    channel = 'whatsapp'
+    recipient_contact = factory.SelfAttribute('recipient.phone_number')
+    body = factory.Faker('sentence')
@@ -0,0 +1,212 @@
+"""
+Benchmark the notification pipeline against the fake provider.
+
+Seeds N appointments for tomorrow inside a transaction that is rolled
+back, queues their reminders with the daily reminder task, then runs the
+outbox dispatcher task until every message is sent or has failed for
+good. Sends go through the real channel adapters, with WhatsApp and SMS
+both on the in-process FakeProvider (seeded patients haven't opted in to
+WhatsApp, so their reminders go out as SMS), so channel grouping, rate
+limiting, bulk concurrency and 429 handling behave as they do in
+production. Retry backoff is capped at --retry-delay so
+retries happen within the run. Status callbacks from the fake are
+collected and applied in batches at the end.
+
+Reports throughput, queued-to-sent latency and retry amplification
+(provider calls per message).
+
+Usage:
+    python manage.py benchmark_notifications
+    python manage.py benchmark_notifications --count 5000 --error-rate 0.05 --throttle-rate 0.02
+"""
+import math
+import time as clock
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.appointments.factories import SLOT_MINUTES, SLOTS_PER_DAY, AppointmentFactory
+from apps.appointments.models import Appointment
+from apps.clinics.factories import ClinicFactory
+from apps.doctors.factories import DoctorFactory
+from apps.notifications.channels import get_channels
+from apps.notifications.models import Notification
+from apps.notifications.sms import get_sms_service
+from apps.notifications.tasks import dispatch_notification_outbox, send_daily_appointment_reminders
+from apps.notifications.webhooks import STATUS_BATCH_SIZE, apply_status_events
+from apps.notifications.whatsapp import get_whatsapp_service
+from apps.patients.factories import PatientFactory
+
+# Patients are reused across appointments; seeding one per message is slow
+MAX_PATIENTS = 500
+
+# Dispatcher runs before the benchmark gives up on draining the outbox
+MAX_DISPATCH_RUNS = 1000
+
+
+def _percentile(values, percent):
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Push reminders through the outbox to the fake provider and report throughput and latency.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000, help='Reminders to send')
+        parser.add_argument('--latency-ms', type=float, default=50, help='Median fake provider latency')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of sends that fail')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of sends answered with 429')
+        parser.add_argument('--read-rate', type=float, default=0.5, help='Share of messages that get read')
+        parser.add_argument('--concurrency', type=int, default=settings.WHATSAPP_SEND_CONCURRENCY)
+        parser.add_argument('--rate', type=int, default=1000, help='Provider rate limit, messages per second')
+        parser.add_argument('--retry-delay', type=float, default=0, help='Longest wait between send retries')
+        parser.add_argument('--seed', type=int, help='Seed for the fake provider, for repeatable runs')
+    
+    def handle(self, *args, **options):
+        if options['count'] < 1:
+            raise CommandError('--count must be positive')
+        
+        status_events = []
+        fake = {
+            'latency_ms': options['latency_ms'],
+            'error_rate': options['error_rate'],
+            'throttle_rate': options['throttle_rate'],
+            'read_rate': options['read_rate'],
+            'on_status': status_events.append,
+            'seed': options['seed'],
+        }
+        overrides = override_settings(
+            WHATSAPP_PROVIDER='fake',
+            FAKE_WHATSAPP=fake,
+            WHATSAPP_RATE_LIMITS={**settings.WHATSAPP_RATE_LIMITS, 'fake': options['rate']},
+            SMS_PROVIDER='fake',
+            SMS_RATE_LIMITS={**settings.SMS_RATE_LIMITS, 'fake': options['rate']},
+            NOTIFICATION_CHANNELS=['whatsapp', 'sms'],
+            WHATSAPP_SEND_CONCURRENCY=options['concurrency'],
+            NOTIFICATION_RETRY_BASE=options['retry_delay'],
+            NOTIFICATION_RETRY_MAX=options['retry_delay']
+        )
+        
+        self._clear_services()
+        try:
+            with overrides, transaction.atomic():
+                results = self._run(options['count'], status_events)
+                transaction.set_rollback(True)
+        finally:
+            self._clear_services()
+        
+        self._report(results)
+    
+    def _clear_services(self):
+        # Services are cached per process; rebuild them under the overrides
+        for cached in (get_channels, get_whatsapp_service, get_sms_service):
+            cached.cache_clear()
+    
+    def _seed(self, count):
+        """Appointments for tomorrow, one quarter-hour slot each, spread over doctors."""
+        day = date.today() + timedelta(days=1)
+        clinic = ClinicFactory()
+        doctors = DoctorFactory.create_batch(math.ceil(count / SLOTS_PER_DAY))
+        patients = PatientFactory.create_batch(min(count, MAX_PATIENTS))
+        
+        appointments = []
+        for index in range(count):
+            minutes = (index % SLOTS_PER_DAY) * SLOT_MINUTES
+            appointments.append(AppointmentFactory.build(
+                patient=patients[index % len(patients)],
+                doctor=doctors[index // SLOTS_PER_DAY],
+                clinic=clinic,
+                appointment_date=day,
+                start_time=time(minutes // 60, minutes % 60),
+                status='confirmed'
+            ))
+        # bulk_create skips post_save, so no confirmations are queued
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+    
+    def _run(self, count, status_events):
+        self.stdout.write(f"Seeding {count} appointments...")
+        self._seed(count)
+        providers = [get_whatsapp_service().backend, get_sms_service().backend]
+        
+        run = Notification.objects.filter(created_at__gte=timezone.now())
+        started = clock.perf_counter()
+        send_daily_appointment_reminders()
+        queue_seconds = clock.perf_counter() - started
+        
+        started = clock.perf_counter()
+        runs = 0
+        while run.filter(status__in=['pending', 'sending']).exists():
+            if runs == MAX_DISPATCH_RUNS:
+                raise CommandError(f"Outbox not drained after {runs} dispatcher runs")
+            runs += 1
+            dispatch_notification_outbox()
+            
+            # Wait out the retry delay rather than spinning on rows not yet due
+            due = run.filter(status='pending').order_by('next_attempt_at').first()
+            if due and due.next_attempt_at > timezone.now():
+                clock.sleep((due.next_attempt_at - timezone.now()).total_seconds())
+        dispatch_seconds = clock.perf_counter() - started
+        
+        started = clock.perf_counter()
+        updated = 0
+        for offset in range(0, len(status_events), STATUS_BATCH_SIZE):
+            updated += apply_status_events(status_events[offset:offset + STATUS_BATCH_SIZE])[0]
+        status_seconds = clock.perf_counter() - started
+        
+        rows = list(run.values_list('status', 'created_at', 'sent_at', 'retry_count'))
+        latencies = sorted(
+            (sent_at - created_at).total_seconds() * 1000
+            for _, created_at, sent_at, _ in rows if sent_at
+        )
+        return {
+            'queued': len(rows),
+            'queue_seconds': queue_seconds,
+            'dispatch_seconds': dispatch_seconds,
+            'runs': runs,
+            'sent': len(latencies),
+            'failed': sum(1 for status, *_ in rows if status == 'failed'),
+            'latencies': latencies,
+            'retries': sum(retry_count for *_, retry_count in rows),
+            'calls': sum(provider.calls for provider in providers),
+            'channels': dict(run.values_list('channel').annotate(count=Count('id')).order_by()),
+            'status_events': len(status_events),
+            'status_updated': updated,
+            'status_seconds': status_seconds,
+        }
+    
+    def _report(self, results):
+        queued = results['queued']
+        if not queued:
+            raise CommandError('No reminders were queued')
+        
+        seconds = results['dispatch_seconds']
+        self.stdout.write(f"{'queued':<20}{queued} reminders in {results['queue_seconds']:.2f}s")
+        self.stdout.write(f"{'sent / failed':<20}{results['sent']} / {results['failed']}")
+        self.stdout.write(f"{'by channel':<20}" + ', '.join(
+            f"{channel} {count}" for channel, count in sorted(results['channels'].items())
+        ))
+        self.stdout.write(
+            f"{'throughput':<20}{results['sent'] / seconds:.1f} msg/s "
+            f"({seconds:.2f}s, {results['runs']} dispatcher runs)"
+        )
+        
+        latencies = results['latencies']
+        if latencies:
+            self.stdout.write(
+                f"{'queued -> sent':<20}p50 {_percentile(latencies, 50):.0f}ms  "
+                f"p95 {_percentile(latencies, 95):.0f}ms  p99 {_percentile(latencies, 99):.0f}ms"
+            )
+        
+        self.stdout.write(
+            f"{'retry amplification':<20}{results['calls'] / queued:.2f} provider calls per message "
+            f"({results['retries']} outbox retries)"
+        )
+        self.stdout.write(
+            f"{'status callbacks':<20}{results['status_events']} applied to "
+            f"{results['status_updated']} notifications in {results['status_seconds']:.2f}s"
+        )
@@ -0,0 +1,153 @@
+"""
+Messages sent for appointment and waitlist events.
+
+Each builder renders an event's messages into unsaved pending
+Notification rows for the outbox. Each row goes out on the channel
+apps.notifications.channels picks for its recipient; recipients no
+enabled channel reaches are skipped with a warning.
+Each row's idempotency key names the event it announces, so enqueueing
+the same event twice (a retried task, two signals for one reschedule)
+creates one message. Reminders are bulk priority; everything else is
+realtime.
+"""
+import logging
+
+from .channels import choose_channel
+from .models import Notification
+from .templates import get_template
+
+logger = logging.getLogger(__name__)
+
+
+def _message(template_type, key, user, context, appointment=None, priority=Notification.PRIORITY_REALTIME):
+    template = get_template(template_type)
+    channel, contact = choose_channel(user, template.channel)
+    if not channel:
+        logger.warning(f"No enabled notification channel reaches user {user.id}; {template_type} not sent")
+        return None
+    return Notification(
+        template=template,
+        recipient=user,
+        channel=channel,
+        recipient_contact=contact,
+        subject=template.subject or template.name,
+        body=template.render(context),
+        appointment=appointment,
+        status='pending',
+        priority=priority,
+        idempotency_key=f"{template_type}:{key}"
+    )
+
+
+def _collect(*messages):
+    return [message for message in messages if message is not None]
+
+
+def confirmation_messages(appointment):
+    return _collect(_message(
+        'appointment_confirmation',
+        appointment.id,
+        appointment.patient.user,
+        {
+            'patient_name': appointment.patient.user.full_name,
+            'doctor_name': appointment.doctor.user.full_name,
+            'date': appointment.appointment_date.strftime('%A, %B %d, %Y'),
+            'time': appointment.start_time.strftime('%I:%M %p'),
+            'clinic_name': appointment.clinic.name,
+            'clinic_address': appointment.clinic.address,
+            'token_number': appointment.token_number or 'TBD'
+        },
+        appointment
+    ))
+
+
+def reminder_context(appointment):
+    return {
+        'patient_name': appointment.patient.user.full_name,
+        'doctor_name': appointment.doctor.user.full_name,
+        'date': appointment.appointment_date.strftime('%A, %B %d, %Y'),
+        'time': appointment.start_time.strftime('%I:%M %p'),
+        'clinic_name': appointment.clinic.name,
+        'token_number': appointment.token_number or 'TBD'
+    }
+
+
+def reminder_messages(appointment):
+    return _collect(_message(
+        'appointment_reminder',
+        f"{appointment.id}:{appointment.appointment_date}",
+        appointment.patient.user,
+        reminder_context(appointment),
+        appointment,
+        Notification.PRIORITY_BULK
+    ))
+
+
+def reschedule_messages(appointment):
+    """Messages to both the patient and the doctor about the new time."""
+    patient_user = appointment.patient.user
+    doctor_user = appointment.doctor.user
+    slot = f"{appointment.id}:{appointment.appointment_date}:{appointment.start_time}"
+    context = {
+        'original_date': appointment.original_date.strftime('%B %d, %Y') if appointment.original_date else 'N/A',
+        'original_time': appointment.original_time.strftime('%I:%M %p') if appointment.original_time else 'N/A',
+        'new_date': appointment.appointment_date.strftime('%B %d, %Y'),
+        'new_time': appointment.start_time.strftime('%I:%M %p'),
+        'doctor_name': doctor_user.full_name,
+        'clinic_name': appointment.clinic.name,
+    }
+    return _collect(
+        _message(
+            'appointment_reschedule',
+            f"{slot}:patient",
+            patient_user,
+            {
+                **context,
+                'recipient_name': patient_user.full_name,
+                'reason': appointment.reschedule_reason or 'Schedule adjustment'
+            },
+            appointment
+        ),
+        _message(
+            'appointment_reschedule',
+            f"{slot}:doctor",
+            doctor_user,
+            {
+                **context,
+                'recipient_name': f"Dr. {doctor_user.full_name}",
+                'reason': f"Patient: {patient_user.full_name}"
+            },
+            appointment
+        )
+    )
+
+
+def cancellation_messages(appointment):
+    return _collect(_message(
+        'appointment_cancellation',
+        appointment.id,
+        appointment.patient.user,
+        {
+            'patient_name': appointment.patient.user.full_name,
+            'doctor_name': appointment.doctor.user.full_name,
+            'date': appointment.appointment_date.strftime('%B %d, %Y'),
+            'time': appointment.start_time.strftime('%I:%M %p')
+        },
+        appointment
+    ))
+
+
+def waitlist_messages(entry, available_date, time_str):
+    """Offer a freed slot to one waitlist entry."""
+    return _collect(_message(
+        'waitlist_notification',
+        f"{entry.id}:{available_date}:{time_str}",
+        entry.patient.user,
+        {
+            'patient_name': entry.patient.user.full_name,
+            'doctor_name': entry.doctor.user.full_name,
+            'date': available_date.strftime('%A, %B %d, %Y'),
+            'time': time_str,
+            'clinic_name': entry.clinic.name
+        }
+    ))
@@ -3,6 +3,7 @@ Notification models for HMS.
 """
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from apps.core.models import BaseModel
 
 
@@ -53,24 +54,32 @@ class NotificationTemplate(BaseModel):
     
     def render(self, context: dict) -> str:
         """Render template with provided context."""
-        body = self.body
-        for key, value in context.items():
-            body = body.replace(f'{{{{{key}}}}}', str(value))
-        return body
+        from .templates import render_template
+        return render_template(self, context)
 
 
 class Notification(BaseModel):
     """
-    Notification log for all sent messages.
+    Notification log for all sent messages, and the outbox for unsent ones
+    (see apps.notifications.outbox).
     """
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('delivered', 'Delivered'),
         ('read', 'Read'),
         ('failed', 'Failed'),
     ]
     
+    # Realtime messages are sent ahead of bulk ones (see outbox)
+    PRIORITY_REALTIME = 0
+    PRIORITY_BULK = 1
+    PRIORITY_CHOICES = [
+        (PRIORITY_REALTIME, 'Realtime'),
+        (PRIORITY_BULK, 'Bulk'),
+    ]
+    
     template = models.ForeignKey(
         NotificationTemplate,
         on_delete=models.SET_NULL,
@@ -113,12 +122,19 @@ class Notification(BaseModel):
     error_message = models.TextField(blank=True)
     retry_count = models.PositiveIntegerField(default=0)
     
+    # Outbox: the event a message announces, and when it is next due
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_REALTIME)
+    
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', 'status']),
             models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'priority', 'next_attempt_at']),
+            models.Index(fields=['external_id']),
         ]
     
     def __str__(self):
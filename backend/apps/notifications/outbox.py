@@ -0,0 +1,186 @@
+"""
+Transactional notification outbox.
+
+Events don't call a provider. They write pending Notification rows in the
+same transaction as the change that caused them. Duplicate idempotency
+keys are dropped on insert. Once the transaction commits, a dispatcher
+run is nudged. Dispatchers claim batches of due rows with SELECT ... FOR
+UPDATE SKIP LOCKED, so several can run side by side without sending a row
+twice. Each batch is marked 'sending', split by channel, and each channel's
+rows are handed to its adapter in one batch send (see channels). Results
+are written back with one bulk update. Failed sends are retried with
+jittered exponential backoff until MAX_ATTEMPTS. Messages the provider
+rejected outright fail at once.
+
+While a channel's circuit breaker is open, dispatchers stop claiming its
+rows; other channels keep going. Messages refused by an open circuit are
+parked: they go back to pending, due when the circuit may close, without
+using up an attempt. While half-open, dispatchers claim one row of that
+channel at a time, so only the probe reaches the provider.
+
+Rows are claimed realtime priority first. Queueing a realtime message
+nudges a dispatcher on the realtime Celery queue that claims only
+realtime rows, so confirmations and waitlist offers go out while a
+reminder burst is still draining on the bulk queue.
+
+A row stays 'sending' only if its dispatcher died mid-batch. After
+SENDING_TIMEOUT it is put back to pending. That short window is the only
+way a message can go out twice.
+"""
+import logging
+import time as clock
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.backoff import backoff_delay
+from apps.core.dispatch import dispatch
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+SEND_BATCH_SIZE = 100
+MAX_ATTEMPTS = 4
+
+SENDING_TIMEOUT = timedelta(minutes=10)
+
+# A dispatcher run stops claiming new batches after this many seconds
+DISPATCH_TIME_BUDGET = 50
+
+
+def enqueue(notifications):
+    """
+    Write pending notifications and nudge a dispatcher once the current
+    transaction commits. Rows whose idempotency key already exists are
+    skipped.
+    """
+    if not notifications:
+        return
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+    
+    from .tasks import dispatch_notification_outbox, dispatch_realtime_notifications
+    if any(notification.priority == Notification.PRIORITY_REALTIME for notification in notifications):
+        dispatch(dispatch_realtime_notifications)
+    else:
+        dispatch(dispatch_notification_outbox)
+
+
+def _claim(size, realtime_only=False, channel=None, exclude=()):
+    now = timezone.now()
+    due = Notification.objects.filter(status='pending', next_attempt_at__lte=now)
+    if realtime_only:
+        due = due.filter(priority=Notification.PRIORITY_REALTIME)
+    if channel:
+        due = due.filter(channel=channel)
+    if exclude:
+        due = due.exclude(channel__in=exclude)
+    with transaction.atomic():
+        batch = list(
+            due.select_for_update(skip_locked=True).order_by('priority', 'next_attempt_at')[:size]
+        )
+        if batch:
+            Notification.objects.filter(id__in=[notification.id for notification in batch]).update(
+                status='sending',
+                updated_at=now
+            )
+    return batch
+
+
+def _send(channels, batch):
+    """Send a claimed batch, one batch send per channel. Returns (notification, result) pairs."""
+    by_channel = defaultdict(list)
+    for notification in batch:
+        by_channel[notification.channel].append(notification)
+    
+    outcomes = []
+    for name, notifications in by_channel.items():
+        channel = channels.get(name)
+        if channel is None:
+            error = {'success': False, 'error': f"No sender for {name} notifications", 'permanent': True}
+            results = [error] * len(notifications)
+        else:
+            results = channel.send_batch(notifications)
+        outcomes.extend(zip(notifications, results))
+    return outcomes
+
+
+def _deliver(channels, batch):
+    """Send a claimed batch and write back the results. Returns (sent, deferred)."""
+    now = timezone.now()
+    sent = deferred = 0
+    for notification, result in _send(channels, batch):
+        notification.updated_at = now
+        notification.external_id = result.get('message_id', '')
+        notification.error_message = result.get('error', '')
+        if result['success']:
+            sent += 1
+            notification.status = 'sent'
+            notification.sent_at = now
+            continue
+        
+        if result.get('deferred'):
+            # Refused by an open circuit: park until it may close, attempt not spent
+            deferred += 1
+            notification.status = 'pending'
+            notification.next_attempt_at = now + timedelta(seconds=result['retry_after'])
+            continue
+        
+        notification.retry_count += 1
+        if notification.retry_count < MAX_ATTEMPTS and not result.get('permanent'):
+            backoff = backoff_delay(
+                notification.retry_count - 1,
+                settings.NOTIFICATION_RETRY_BASE,
+                settings.NOTIFICATION_RETRY_MAX
+            )
+            notification.status = 'pending'
+            notification.next_attempt_at = now + timedelta(seconds=backoff)
+        else:
+            notification.status = 'failed'
+    
+    Notification.objects.bulk_update(batch, [
+        'status', 'external_id', 'error_message', 'sent_at',
+        'retry_count', 'next_attempt_at', 'updated_at'
+    ])
+    return sent, deferred
+
+
+def release_stale():
+    """Put rows abandoned mid-send by a dead dispatcher back in the queue."""
+    released = Notification.objects.filter(
+        status='sending',
+        updated_at__lt=timezone.now() - SENDING_TIMEOUT
+    ).update(status='pending', updated_at=timezone.now())
+    if released:
+        logger.warning(f"Released {released} notifications left sending by a dead dispatcher")
+    return released
+
+
+def dispatch_pending(batch_size=SEND_BATCH_SIZE, time_budget=DISPATCH_TIME_BUDGET, realtime_only=False):
+    """
+    Send due notifications batch by batch. Returns counts sent, failed
+    (this attempt) and deferred (parked by an open circuit).
+    """
+    from .channels import get_channels
+    
+    channels = get_channels()
+    if not realtime_only:
+        release_stale()
+    deadline = clock.monotonic() + time_budget
+    stats = {'sent': 0, 'failed': 0, 'deferred': 0}
+    while clock.monotonic() < deadline:
+        states = {name: channel.state() for name, channel in channels.items()}
+        held = [name for name, state in states.items() if state != 'closed']
+        batch = _claim(batch_size, realtime_only, exclude=held)
+        for name in held:
+            if states[name] == 'half_open':
+                batch += _claim(1, realtime_only, channel=name)
+        if not batch:
+            break
+        sent, deferred = _deliver(channels, batch)
+        stats['sent'] += sent
+        stats['deferred'] += deferred
+        stats['failed'] += len(batch) - sent - deferred
+    return stats
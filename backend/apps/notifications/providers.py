@@ -0,0 +1,266 @@
+"""
+WhatsApp and SMS messaging providers.
+
+A provider only knows how to hand one message to its API. Rate limiting,
+number normalisation, 429 retries and bulk concurrency live in
+WhatsAppService (and SmsService, which shares its code), so every
+provider, including the fake, goes through the same code path.
+
+Twilio messages carry a status_callback URL built from
+settings.PUBLIC_API_URL, so delivery and read receipts come back to the
+status webhook.
+
+Providers return {'success': True, 'message_id': ..., 'status': ...}. They
+raise ProviderThrottled on a 429 and ProviderRejected when the provider
+refused this particular message (any other 4xx); any other exception
+means the provider itself is failing.
+"""
+from abc import ABC, abstractmethod
+import logging
+import math
+import random
+import threading
+import time as clock
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderThrottled(Exception):
+    """The provider answered 429; retry after ``retry_after`` seconds."""
+    
+    def __init__(self, retry_after=1.0):
+        super().__init__(f"Rate limited by provider, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ProviderRejected(Exception):
+    """The provider refused the message (bad number, opted out...); retrying won't help."""
+
+
+class MessagingProvider(ABC):
+    """Interface for a WhatsApp or SMS provider."""
+    name = None
+    
+    @abstractmethod
+    def send(self, to_number: str, message: str, template_id: str = None) -> dict:
+        """Send a text message."""
+    
+    @abstractmethod
+    def send_template(self, to_number: str, template_name: str, template_params: list = None) -> dict:
+        """Send a template approved with the provider, filled with ``template_params``."""
+
+
+class TwilioProvider(MessagingProvider):
+    """Twilio WhatsApp API over a pooled keep-alive connection."""
+    name = 'twilio'
+    
+    def __init__(self, timeout):
+        self.client = Client(
+            settings.TWILIO_ACCOUNT_SID,
+            settings.TWILIO_AUTH_TOKEN,
+            http_client=TwilioHttpClient(pool_connections=True, timeout=timeout)
+        )
+        self.from_number = f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}"
+        self.status_callback = None
+        if settings.PUBLIC_API_URL:
+            self.status_callback = f"{settings.PUBLIC_API_URL}{reverse('notifications:twilio_webhook')}"
+        else:
+            logger.warning("PUBLIC_API_URL is not set; Twilio will not report delivery statuses")
+    
+    def _create(self, **kwargs):
+        if self.status_callback:
+            kwargs['status_callback'] = self.status_callback
+        try:
+            return self.client.messages.create(from_=self.from_number, **kwargs)
+        except TwilioRestException as e:
+            if e.status == 429:
+                raise ProviderThrottled() from e
+            if 400 <= e.status < 500:
+                raise ProviderRejected(str(e)) from e
+            raise
+    
+    def send(self, to_number, message, template_id=None):
+        msg = self._create(body=message, to=f"whatsapp:{to_number}")
+        logger.info(f"WhatsApp message sent via Twilio: {msg.sid}")
+        return {'success': True, 'message_id': msg.sid, 'status': msg.status}
+    
+    def send_template(self, to_number, template_name, template_params=None):
+        # Twilio uses content SID for templates
+        msg = self._create(
+            content_sid=template_name,
+            content_variables=dict(enumerate(template_params or [])),
+            to=f"whatsapp:{to_number}"
+        )
+        return {'success': True, 'message_id': msg.sid, 'status': msg.status}
+
+
+class TwilioSmsProvider(TwilioProvider):
+    """Twilio Programmable SMS: the same client and error mapping, plain numbers."""
+    
+    def __init__(self, timeout):
+        super().__init__(timeout)
+        self.from_number = settings.TWILIO_SMS_NUMBER
+    
+    def send(self, to_number, message, template_id=None):
+        msg = self._create(body=message, to=to_number)
+        logger.info(f"SMS sent via Twilio: {msg.sid}")
+        return {'success': True, 'message_id': msg.sid, 'status': msg.status}
+    
+    def send_template(self, to_number, template_name, template_params=None):
+        """
+        SMS has no provider-side templates, so the HMS template that
+        ``template_name`` names (by WhatsApp template id or by type) is
+        rendered here, its available_variables filled from
+        ``template_params`` in order, and sent as plain text.
+        """
+        from .models import NotificationTemplate
+        template = NotificationTemplate.objects.filter(
+            Q(whatsapp_template_id=template_name) | Q(template_type=template_name),
+            is_active=True
+        ).first()
+        if template is None:
+            raise ProviderRejected(f"No notification template named {template_name}")
+        context = dict(zip(template.available_variables, template_params or []))
+        return self.send(to_number, template.render(context))
+
+
+class WatiProvider(MessagingProvider):
+    """Wati API over a pooled requests session."""
+    name = 'wati'
+    
+    def __init__(self, timeout, pool_size):
+        self.timeout = timeout
+        self.wati_url = settings.WATI_API_URL
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {settings.WATI_API_TOKEN}',
+            'Content-Type': 'application/json'
+        })
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+    
+    def send(self, to_number, message, template_id=None):
+        # Remove + from number for Wati
+        clean_number = to_number.replace('+', '')
+        
+        if template_id:
+            # Send template message
+            url = f"{self.wati_url}/api/v1/sendTemplateMessage"
+            payload = {
+                'whatsappNumber': clean_number,
+                'templateName': template_id,
+                'broadcast_name': 'HMS Notification'
+            }
+        else:
+            # Send session message
+            url = f"{self.wati_url}/api/v1/sendSessionMessage/{clean_number}"
+            payload = {
+                'messageText': message
+            }
+        
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        if response.status_code == 429:
+            raise ProviderThrottled(float(response.headers.get('Retry-After') or 1))
+        if 400 <= response.status_code < 500:
+            raise ProviderRejected(f"Wati rejected the message: {response.status_code} {response.text[:200]}")
+        response.raise_for_status()
+        
+        data = response.json()
+        logger.info(f"WhatsApp message sent via Wati: {data}")
+        return {'success': True, 'message_id': data.get('id', ''), 'status': 'sent'}
+    
+    def send_template(self, to_number, template_name, template_params=None):
+        return self.send(to_number, '', template_name)
+
+
+class FakeProvider(MessagingProvider):
+    """
+    In-process stand-in for a real provider, for local development and load
+    tests. Each send sleeps for a log-normal latency around ``latency_ms``,
+    then fails with ``error_rate`` probability or answers 429 with
+    ``throttle_rate`` probability. Successful sends produce 'delivered'
+    status callbacks, plus 'read' ones with ``read_rate`` probability.
+    Callbacks go to ``on_status`` (by default the real webhook queue).
+    """
+    name = 'fake'
+    
+    def __init__(
+        self,
+        latency_ms=50,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        read_rate=0.5,
+        retry_after=0.1,
+        callbacks=True,
+        on_status=None,
+        seed=None
+    ):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.read_rate = read_rate
+        self.retry_after = retry_after
+        self.callbacks = callbacks
+        self.on_status = on_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+    
+    def _roll(self):
+        """Draw this call's latency and outcome (Random isn't thread-safe)."""
+        with self.lock:
+            self.calls += 1
+            latency = self.random.lognormvariate(math.log(self.latency_ms), 0.5) if self.latency_ms else 0
+            return latency / 1000, self.random.random(), self.random.random()
+    
+    def send(self, to_number, message, template_id=None):
+        latency, outcome, read = self._roll()
+        clock.sleep(latency)
+        if outcome < self.throttle_rate:
+            raise ProviderThrottled(self.retry_after)
+        if outcome < self.throttle_rate + self.error_rate:
+            raise RuntimeError('Simulated provider error')
+        
+        message_id = f"FAKE{uuid.uuid4().hex}"
+        if self.callbacks:
+            self._callback(message_id, 'delivered')
+            if read < self.read_rate:
+                self._callback(message_id, 'read')
+        return {'success': True, 'message_id': message_id, 'status': 'queued'}
+    
+    def send_template(self, to_number, template_name, template_params=None):
+        return self.send(to_number, '', template_name)
+    
+    def _callback(self, message_id, status):
+        from .webhooks import queue_status_event, status_event
+        (self.on_status or queue_status_event)(status_event(message_id, status))
+
+
+def build_provider(name, timeout, pool_size):
+    """Create the provider called ``name`` from settings."""
+    if name == 'twilio':
+        return TwilioProvider(timeout)
+    if name == 'wati':
+        return WatiProvider(timeout, pool_size)
+    if name == 'fake':
+        return FakeProvider(**settings.FAKE_WHATSAPP)
+    raise ValueError(f"Unknown WhatsApp provider: {name}")
+
+
+def build_sms_provider(name, timeout):
+    """Create the SMS provider called ``name`` from settings."""
+    if name == 'twilio':
+        return TwilioSmsProvider(timeout)
+    if name == 'fake':
+        return FakeProvider(**settings.FAKE_WHATSAPP)
+    raise ValueError(f"Unknown SMS provider: {name}")
@@ -0,0 +1,75 @@
+"""
+Daily appointment reminder run.
+
+Appointments are processed in chunks: each chunk is claimed with one
+locking query (select_related pulls in patient, doctor and clinic), its
+messages are rendered in memory and written to the notification outbox in
+the same transaction that sets reminder_sent. The outbox dispatcher then
+sends them in batches.
+
+Because the claim and the outbox rows commit together, a run that dies
+midway never queues a reminder twice: a restarted run skips claimed
+appointments, and the dispatcher picks up whatever was already queued.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from .messages import reminder_messages
+from .outbox import enqueue
+
+logger = logging.getLogger(__name__)
+
+REMINDER_STATUSES = ['scheduled', 'confirmed', 'rescheduled']
+
+
+def _claim_chunk(day, after_id, size):
+    """
+    Lock the next chunk of due appointments and queue their reminders.
+    Returns (last id seen, number of reminders queued).
+    """
+    due = Appointment.objects.filter(
+        appointment_date=day,
+        status__in=REMINDER_STATUSES,
+        reminder_sent=False,
+        is_active=True
+    )
+    if after_id:
+        due = due.filter(id__gt=after_id)
+    
+    with transaction.atomic():
+        appointments = list(
+            due.select_for_update(skip_locked=True, of=('self',))
+            .select_related('patient__user', 'doctor__user', 'clinic')
+            .order_by('id')[:size]
+        )
+        if not appointments:
+            return None, 0
+        
+        pending = [message for appointment in appointments for message in reminder_messages(appointment)]
+        enqueue(pending)
+        Appointment.objects.filter(
+            id__in=[notification.appointment_id for notification in pending]
+        ).update(reminder_sent=True, reminder_sent_at=timezone.now())
+    
+    return appointments[-1].id, len(pending)
+
+
+def send_daily_reminders(day: date = None) -> int:
+    """
+    Queue reminders for appointments on ``day`` (default: tomorrow).
+    Returns the number of reminders queued.
+    """
+    day = day or date.today() + timedelta(days=1)
+    queued = 0
+    after_id = None
+    while True:
+        after_id, count = _claim_chunk(day, after_id, settings.REMINDER_BATCH_SIZE)
+        if after_id is None:
+            break
+        queued += count
+    return queued
@@ -0,0 +1,12 @@
+"""
+Django signals that drop cached notification templates when they change.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import NotificationTemplate
+from .templates import invalidate_template
+
+
+@receiver([post_save, post_delete], sender=NotificationTemplate)
+def invalidate_template_cache(sender, instance, **kwargs):
+    invalidate_template(instance)
@@ -0,0 +1,36 @@
+"""
+SMS messaging service.
+
+SMS goes out through the same transport as WhatsApp: a pooled provider
+client, a Redis token bucket and a circuit breaker shared by all workers,
+429 retries and concurrent bulk sends. Only the provider, the rate limit
+and the Redis keys ('sms:<provider>') differ, so a WhatsApp outage doesn't
+open the SMS circuit or spend SMS tokens.
+
+Like the WhatsApp service, it is built on first use by get_sms_service().
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+from .providers import build_sms_provider
+from .whatsapp import WhatsAppService
+
+
+class SmsService(WhatsAppService):
+    """
+    Service for sending SMS via Twilio or the fake provider.
+    """
+    channel = 'sms'
+    
+    def _rate_limits(self):
+        return settings.SMS_RATE_LIMITS
+    
+    def _build_backend(self):
+        return build_sms_provider(self.provider, self.timeout)
+
+
+@lru_cache(maxsize=None)
+def get_sms_service() -> SmsService:
+    """Get the process-wide SMS service, creating it on first use."""
+    return SmsService(provider=settings.SMS_PROVIDER)
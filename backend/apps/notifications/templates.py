@@ -0,0 +1,200 @@
+"""
+Notification template lookup and compiled rendering.
+
+Templates are looked up by type through a per-process cache instead of a
+get_or_create per message. Each body is compiled once into a render plan:
+a tuple of literal text and placeholder names, split at {{placeholders}}.
+Rendering then joins the plan with the context values in a single pass
+instead of scanning the whole body once per context key.
+
+Plans are keyed by template id and updated_at, so an edited template is
+never rendered with a stale plan. Saving or deleting a template clears
+that process's cached lookup right away. Other processes pick up the
+edit once their lookup expires after TEMPLATE_CACHE_TTL.
+"""
+import re
+import threading
+import time as clock
+
+from .models import NotificationTemplate
+
+PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+# Seconds a template looked up by type is reused before re-reading it
+TEMPLATE_CACHE_TTL = 60
+
+# Compiled plans kept per process; the oldest is dropped beyond this
+MAX_PLANS = 256
+
+DEFAULT_TEMPLATES = {
+    'appointment_confirmation': {
+        'name': 'Appointment Confirmation',
+        'channel': 'whatsapp',
+        'body': '''🏥 *Appointment Confirmed*
+
+Dear {{patient_name}},
+
+Your appointment has been scheduled:
+
+👨‍⚕️ Doctor: Dr. {{doctor_name}}
+📅 Date: {{date}}
+⏰ Time: {{time}}
+🏢 Clinic: {{clinic_name}}
+📍 Address: {{clinic_address}}
+🎫 Token: #{{token_number}}
+
+Please arrive 15 minutes early.
+
+Reply CANCEL to cancel or RESCHEDULE to change timing.''',
+        'available_variables': [
+            'patient_name', 'doctor_name', 'date', 'time',
+            'clinic_name', 'clinic_address', 'token_number'
+        ]
+    },
+    'appointment_reminder': {
+        'name': 'Appointment Reminder',
+        'channel': 'whatsapp',
+        'body': '''⏰ *Appointment Reminder*
+
+Dear {{patient_name}},
+
+This is a reminder for your upcoming appointment:
+
+👨‍⚕️ Doctor: Dr. {{doctor_name}}
+📅 Tomorrow: {{date}}
+⏰ Time: {{time}}
+🏢 Clinic: {{clinic_name}}
+🎫 Token: #{{token_number}}
+
+Please arrive 15 minutes early.
+Bring any relevant medical reports.
+
+Reply CONFIRM to confirm or CANCEL to cancel.''',
+        'available_variables': [
+            'patient_name', 'doctor_name', 'date', 'time',
+            'clinic_name', 'token_number'
+        ]
+    },
+    'appointment_reschedule': {
+        'name': 'Appointment Rescheduled',
+        'channel': 'whatsapp',
+        'body': '''📅 *Appointment Rescheduled*
+
+Dear {{recipient_name}},
+
+Your appointment has been rescheduled:
+
+*Previous:* {{original_date}} at {{original_time}}
+*New:* {{new_date}} at {{new_time}}
+
+👨‍⚕️ Doctor: Dr. {{doctor_name}}
+🏢 Clinic: {{clinic_name}}
+
+Reason: {{reason}}
+
+Reply CONFIRM to accept or call us to discuss.''',
+        'available_variables': [
+            'recipient_name', 'original_date', 'original_time',
+            'new_date', 'new_time', 'doctor_name', 'clinic_name', 'reason'
+        ]
+    },
+    'appointment_cancellation': {
+        'name': 'Appointment Cancelled',
+        'channel': 'whatsapp',
+        'body': '''❌ *Appointment Cancelled*
+
+Dear {{patient_name}},
+
+Your appointment has been cancelled:
+
+👨‍⚕️ Doctor: Dr. {{doctor_name}}
+📅 Date: {{date}}
+⏰ Time: {{time}}
+
+To reschedule, reply BOOK or visit our website.
+
+We apologize for any inconvenience.''',
+        'available_variables': ['patient_name', 'doctor_name', 'date', 'time']
+    },
+    'waitlist_notification': {
+        'name': 'Waitlist Slot Available',
+        'channel': 'whatsapp',
+        'body': '''🎉 *Good News! Slot Available*
+
+Dear {{patient_name}},
+
+A slot has opened up with Dr. {{doctor_name}} that matches your waitlist request!
+
+📅 Date: {{date}}
+⏰ Time: {{time}}
+🏢 Clinic: {{clinic_name}}
+
+Reply BOOK to confirm this slot immediately.
+This offer expires in 30 minutes.
+
+First come, first served!''',
+        'available_variables': [
+            'patient_name', 'doctor_name', 'date', 'time', 'clinic_name'
+        ]
+    },
+}
+
+
+_lock = threading.Lock()
+_plans = {}
+_by_type = {}
+
+
+def compile_template(body):
+    """
+    Split a body into a render plan: literals at even indexes, placeholder
+    names at odd indexes.
+    """
+    return tuple(PLACEHOLDER.split(body))
+
+
+def _plan(template):
+    key = (template.pk, template.updated_at)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = compile_template(template.body)
+        with _lock:
+            if len(_plans) >= MAX_PLANS:
+                _plans.pop(next(iter(_plans)))
+            _plans[key] = plan
+    return plan
+
+
+def render_template(template, context):
+    """Render a template; unknown placeholders are left as they are."""
+    plan = _plan(template)
+    parts = list(plan)
+    for index in range(1, len(plan), 2):
+        name = plan[index]
+        parts[index] = str(context[name]) if name in context else f"{{{{{name}}}}}"
+    return ''.join(parts)
+
+
+def get_template(template_type):
+    """
+    Return the active template for a type, creating it from
+    DEFAULT_TEMPLATES on first use.
+    """
+    cached = _by_type.get(template_type)
+    if cached and cached[1] > clock.monotonic():
+        return cached[0]
+    
+    template, _ = NotificationTemplate.objects.get_or_create(
+        template_type=template_type,
+        defaults=DEFAULT_TEMPLATES[template_type]
+    )
+    with _lock:
+        _by_type[template_type] = (template, clock.monotonic() + TEMPLATE_CACHE_TTL)
+    return template
+
+
+def invalidate_template(template):
+    with _lock:
+        _by_type.pop(template.template_type, None)
+        for key in [key for key in _plans if key[0] == template.pk]:
+            del _plans[key]
@@ -0,0 +1,35 @@
+"""
+Channel choice for users who have and haven't opted in to WhatsApp.
+"""
+import logging
+
+import pytest
+
+from apps.notifications.channels import choose_channel
+from apps.notifications.messages import _message
+from apps.users.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_whatsapp_only_reaches_everyone(settings):
+    settings.NOTIFICATION_CHANNELS = ['whatsapp']
+    user = UserFactory(whatsapp_opted_in=False)
+    
+    assert choose_channel(user, 'whatsapp') == ('whatsapp', user.phone_number)
+
+
+def test_opt_in_enforced_once_another_channel_is_enabled(settings):
+    settings.NOTIFICATION_CHANNELS = ['whatsapp', 'email']
+    
+    assert choose_channel(UserFactory(whatsapp_opted_in=False), 'whatsapp')[0] == 'email'
+    assert choose_channel(UserFactory(whatsapp_opted_in=True), 'whatsapp')[0] == 'whatsapp'
+
+
+def test_unreachable_recipient_is_logged(settings, caplog):
+    settings.NOTIFICATION_CHANNELS = ['whatsapp', 'sms']
+    user = UserFactory(whatsapp_opted_in=False, phone_number='', whatsapp_number='')
+    
+    with caplog.at_level(logging.WARNING, logger='apps.notifications.messages'):
+        assert _message('appointment_cancellation', 'key', user, {}) is None
+    assert str(user.id) in caplog.text
@@ -0,0 +1,54 @@
+"""
+The provider interface, Twilio status callbacks and SMS template sends.
+"""
+from unittest import mock
+
+import pytest
+
+from apps.notifications.providers import MessagingProvider, TwilioProvider, TwilioSmsProvider
+from apps.notifications.templates import get_template
+
+
+def test_every_send_carries_the_status_callback(settings):
+    settings.PUBLIC_API_URL = 'https://api.example.com'
+    settings.TWILIO_ACCOUNT_SID = 'AC123'
+    settings.TWILIO_AUTH_TOKEN = 'auth-token'
+    
+    for provider_class in (TwilioProvider, TwilioSmsProvider):
+        provider = provider_class(timeout=5)
+        with mock.patch.object(provider.client.messages, 'create') as create:
+            create.return_value = mock.Mock(sid='SM123', status='queued')
+            provider.send('+919800000000', 'Hello')
+        
+        assert create.call_args.kwargs['status_callback'] == (
+            'https://api.example.com/api/notifications/webhooks/twilio/'
+        )
+
+
+def test_provider_must_implement_both_sends():
+    class TextOnlyProvider(MessagingProvider):
+        def send(self, to_number, message, template_id=None):
+            return {'success': True, 'message_id': 'x', 'status': 'sent'}
+    
+    with pytest.raises(TypeError):
+        TextOnlyProvider()
+
+
+@pytest.mark.django_db
+def test_sms_template_is_rendered_and_sent_as_text(settings):
+    settings.TWILIO_ACCOUNT_SID = 'AC123'
+    settings.TWILIO_AUTH_TOKEN = 'auth-token'
+    template = get_template('appointment_cancellation')
+    
+    provider = TwilioSmsProvider(timeout=5)
+    with mock.patch.object(provider.client.messages, 'create') as create:
+        create.return_value = mock.Mock(sid='SM123', status='queued')
+        provider.send_template('+919800000000', 'appointment_cancellation', ['Asha', 'Rao', 'May 1', '10:00 AM'])
+    
+    assert 'content_sid' not in create.call_args.kwargs
+    assert create.call_args.kwargs['body'] == template.render({
+        'patient_name': 'Asha',
+        'doctor_name': 'Rao',
+        'date': 'May 1',
+        'time': '10:00 AM'
+    })
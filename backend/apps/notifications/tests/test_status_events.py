@@ -0,0 +1,113 @@
+"""
+Batched delivery-status events: coalescing per message, one bulk update per
+batch, and re-queueing events whose notification is not stored yet.
+"""
+import json
+import time as clock
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.notifications import webhooks
+from apps.notifications.factories import NotificationFactory
+from apps.notifications.webhooks import (
+    STATUS_EVENTS_KEY, UNMATCHED_EVENT_TTL, _coalesce, apply_status_events,
+    drain_status_events, status_event
+)
+
+
+class FakeRedisList:
+    """The list commands drain_status_events uses, over a dict of lists."""
+    
+    def __init__(self):
+        self.lists = {}
+    
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(value.encode() if isinstance(value, str) else value for value in values)
+    
+    def lrange(self, key, start, end):
+        return list(self.lists.get(key, [])[start:end + 1])
+    
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:] if end == -1 else self.lists.get(key, [])[start:end + 1]
+    
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+    
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.commands]
+
+
+def _event(external_id, status, at, error=''):
+    return dict(status_event(external_id, status, error), at=at)
+
+
+def test_coalesce_keeps_furthest_status():
+    merged = _coalesce([
+        _event('SM1', 'read', 30),
+        _event('SM1', 'sent', 10),
+        _event('SM1', 'delivered', 20),
+        _event('SM2', 'failed', 10, error='undeliverable'),
+        _event('SM2', 'sent', 5),
+    ])
+    
+    assert merged['SM1']['status'] == 'read'
+    assert merged['SM1']['seen'] == {'read': 30, 'sent': 10, 'delivered': 20}
+    assert merged['SM2']['status'] == 'failed'
+    assert merged['SM2']['error'] == 'undeliverable'
+
+
+@pytest.mark.django_db
+def test_read_implies_delivered():
+    notification = NotificationFactory(external_id='SM1', status='sent')
+    
+    apply_status_events([_event('SM1', 'read', 1_700_000_000)])
+    
+    notification.refresh_from_db()
+    assert notification.status == 'read'
+    assert notification.read_at is not None
+    assert notification.delivered_at == notification.read_at
+
+
+@pytest.mark.django_db
+def test_batch_is_one_select_and_one_bulk_update():
+    notifications = [NotificationFactory(external_id=f'SM{index}', status='sent') for index in range(5)]
+    events = [_event(n.external_id, status, at) for n in notifications for at, status in [(1, 'delivered'), (2, 'read')]]
+    
+    with CaptureQueriesContext(connection) as queries:
+        updated, unmatched = apply_status_events(events)
+    
+    assert updated == 5
+    assert unmatched == []
+    assert [query['sql'].split()[0] for query in queries] == ['SELECT', 'UPDATE']
+
+
+@pytest.mark.django_db
+def test_drain_requeues_recent_unmatched_events(monkeypatch):
+    client = FakeRedisList()
+    monkeypatch.setattr(webhooks, 'get_redis_client', lambda: client)
+    NotificationFactory(external_id='SM1', status='sent')
+    
+    recent = _event('SM-pending', 'delivered', clock.time())
+    stale = _event('SM-gone', 'delivered', clock.time() - UNMATCHED_EVENT_TTL - 1)
+    for event in [_event('SM1', 'delivered', clock.time()), recent, stale]:
+        client.rpush(STATUS_EVENTS_KEY, json.dumps(event))
+    
+    assert drain_status_events(batch_size=2) == 1
+    assert [json.loads(item) for item in client.lists[STATUS_EVENTS_KEY]] == [recent]
@@ -0,0 +1,31 @@
+"""
+Twilio signature checks for callbacks that reach the app through the TLS proxy.
+"""
+from django.test import RequestFactory
+from twilio.request_validator import RequestValidator
+
+from apps.notifications.webhooks import verify_twilio_signature
+
+PATH = '/api/notifications/webhooks/twilio/'
+FORM = {'MessageSid': 'SM123', 'MessageStatus': 'delivered'}
+
+
+def _signed_request(public_url, **headers):
+    signature = RequestValidator('auth-token').compute_signature(f"{public_url}{PATH}", FORM)
+    return RequestFactory().post(PATH, FORM, HTTP_X_TWILIO_SIGNATURE=signature, **headers)
+
+
+def test_signature_checked_against_public_url(settings):
+    settings.TWILIO_AUTH_TOKEN = 'auth-token'
+    settings.PUBLIC_API_URL = 'https://api.example.com'
+    
+    assert verify_twilio_signature(_signed_request('https://api.example.com'))
+    assert not verify_twilio_signature(_signed_request('https://attacker.example.com'))
+
+
+def test_signature_uses_forwarded_scheme(settings):
+    settings.TWILIO_AUTH_TOKEN = 'auth-token'
+    settings.PUBLIC_API_URL = ''
+    settings.SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    
+    assert verify_twilio_signature(_signed_request('https://testserver', HTTP_X_FORWARDED_PROTO='https'))
@@ -4,7 +4,8 @@ URL patterns for notifications.
 from django.urls import path
 from .views import (
     NotificationListView, NotificationDetailView,
-    NotificationTemplateListView, NotificationTemplateCreateView
+    NotificationTemplateListView, NotificationTemplateCreateView,
+    TwilioStatusWebhookView, WatiStatusWebhookView
 )
 
 app_name = 'notifications'
@@ -14,4 +15,6 @@ urlpatterns = [
     path('<uuid:pk>/', NotificationDetailView.as_view(), name='detail'),
     path('templates/', NotificationTemplateListView.as_view(), name='template_list'),
     path('templates/create/', NotificationTemplateCreateView.as_view(), name='template_create'),
+    path('webhooks/twilio/', TwilioStatusWebhookView.as_view(), name='twilio_webhook'),
+    path('webhooks/wati/', WatiStatusWebhookView.as_view(), name='wati_webhook'),
 ]
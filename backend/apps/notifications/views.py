@@ -1,11 +1,17 @@
 """
 Views for notification management.
 """
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 
 from .models import Notification, NotificationTemplate
 from .serializers import NotificationSerializer, NotificationTemplateSerializer
+from .webhooks import (
+    parse_twilio_event, parse_wati_event, queue_status_event,
+    verify_twilio_signature, verify_wati_token
+)
 
 
 class NotificationListView(generics.ListAPIView):
@@ -16,7 +22,7 @@ class NotificationListView(generics.ListAPIView):
     def get_queryset(self):
         return Notification.objects.filter(
             recipient=self.request.user
-        ).order_by('-created_at')
+        ).select_related('template', 'recipient').order_by('-created_at')
 
 
 class NotificationDetailView(generics.RetrieveAPIView):
@@ -25,7 +31,7 @@ class NotificationDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).select_related('template', 'recipient')
 
 
 class NotificationTemplateListView(generics.ListAPIView):
@@ -39,3 +45,33 @@ class NotificationTemplateCreateView(generics.CreateAPIView):
     """Create notification template (admin only)."""
     serializer_class = NotificationTemplateSerializer
     permission_classes = [permissions.IsAdminUser]
+
+
+class TwilioStatusWebhookView(APIView):
+    """Receive Twilio message status callbacks (signed with X-Twilio-Signature)."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        if not verify_twilio_signature(request):
+            return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+        
+        event = parse_twilio_event(request.POST)
+        if event:
+            queue_status_event(event)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class WatiStatusWebhookView(APIView):
+    """Receive Wati message status webhooks (authenticated by a URL token)."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        if not verify_wati_token(request):
+            return Response({'error': 'Invalid token'}, status=status.HTTP_403_FORBIDDEN)
+        
+        event = parse_wati_event(request.data)
+        if event:
+            queue_status_event(event)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,232 @@
+"""
+Delivery-status callbacks from WhatsApp providers.
+
+Providers post a callback for every status change of every message, often
+in bursts. The webhook view only verifies the request and pushes a small
+event onto a Redis list. The apply_notification_status_events task drains
+the list in batches. It keeps the furthest status reached per external_id,
+loads the matching notifications in one query, and writes them back with
+one bulk update.
+
+Callbacks can beat the outbox to the database: a message can be delivered
+before its dispatcher has stored the provider's message id. Events that
+match no notification are therefore pushed back and retried until they
+are UNMATCHED_EVENT_TTL seconds old.
+"""
+import hmac
+import json
+import logging
+import time as clock
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from twilio.request_validator import RequestValidator
+
+from apps.core.redis_utils import get_redis_client
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+STATUS_EVENTS_KEY = 'notifications:status_events'
+STATUS_BATCH_SIZE = 1000
+UNMATCHED_EVENT_TTL = 300
+
+# Provider status -> Notification status
+TWILIO_STATUSES = {
+    'sent': 'sent',
+    'delivered': 'delivered',
+    'read': 'read',
+    'failed': 'failed',
+    'undelivered': 'failed',
+}
+WATI_STATUSES = {
+    'SENT': 'sent',
+    'DELIVERED': 'delivered',
+    'READ': 'read',
+    'FAILED': 'failed',
+}
+
+# How far along a message is; a status never moves backwards
+STATUS_RANK = {
+    'pending': 0,
+    'sending': 0,
+    'sent': 1,
+    'failed': 2,
+    'delivered': 3,
+    'read': 4,
+}
+
+
+def verify_twilio_signature(request) -> bool:
+    """
+    Check X-Twilio-Signature against the full callback URL and form fields.
+    
+    Twilio signs the public URL it posted to. Behind a proxy the request
+    Django sees can differ in scheme or host, so the URL is rebuilt from
+    settings.PUBLIC_API_URL when it is set.
+    """
+    signature = request.headers.get('X-Twilio-Signature', '')
+    if not signature or not settings.TWILIO_AUTH_TOKEN:
+        return False
+    if settings.PUBLIC_API_URL:
+        url = f"{settings.PUBLIC_API_URL}{request.get_full_path()}"
+    else:
+        url = request.build_absolute_uri()
+    validator = RequestValidator(settings.TWILIO_AUTH_TOKEN)
+    return validator.validate(url, request.POST.dict(), signature)
+
+
+def verify_wati_token(request) -> bool:
+    """
+    Wati does not sign callbacks, so the webhook URL carries a shared secret
+    (?token=...) that is compared in constant time.
+    """
+    token = request.GET.get('token', '')
+    return bool(settings.WATI_WEBHOOK_TOKEN) and hmac.compare_digest(token, settings.WATI_WEBHOOK_TOKEN)
+
+
+def parse_twilio_event(data):
+    """Turn a Twilio status callback into a status event, or None to ignore it."""
+    status = TWILIO_STATUSES.get(data.get('MessageStatus', ''))
+    if not status or not data.get('MessageSid'):
+        return None
+    error = data.get('ErrorCode', '')
+    return status_event(data['MessageSid'], status, f"Twilio error {error}" if error else '')
+
+
+def parse_wati_event(data):
+    """Turn a Wati webhook payload into a status event, or None to ignore it."""
+    # eventType looks like "sentMessageDELIVERED" or "sentMessageDELIVERED_v2"
+    event_type = str(data.get('eventType', '')).split('_')[0]
+    status = next(
+        (status for suffix, status in WATI_STATUSES.items() if event_type.endswith(suffix)),
+        None
+    )
+    external_id = data.get('id') or data.get('localMessageId')
+    if not status or not external_id:
+        return None
+    return status_event(external_id, status, data.get('failedDetail', '') if status == 'failed' else '')
+
+
+def status_event(external_id, status, error=''):
+    """A status event as queued for the status worker."""
+    return {'id': str(external_id), 'status': status, 'error': error, 'at': clock.time()}
+
+
+def queue_status_event(event):
+    """
+    Push an event for the status worker. If Redis is down, apply it right
+    away instead so the callback is not lost.
+    """
+    try:
+        get_redis_client().rpush(STATUS_EVENTS_KEY, json.dumps(event))
+    except redis.RedisError as e:
+        logger.warning(f"Status event queue unavailable, applying inline: {e}")
+        apply_status_events([event])
+
+
+def _coalesce(events):
+    """Keep one event per external_id: its furthest status and when each was first reached."""
+    merged = {}
+    for event in events:
+        current = merged.setdefault(event['id'], {'status': 'sent', 'error': '', 'seen': {}})
+        seen = current['seen']
+        seen[event['status']] = min(seen.get(event['status'], event['at']), event['at'])
+        if STATUS_RANK[event['status']] >= STATUS_RANK[current['status']]:
+            current['status'] = event['status']
+            current['error'] = event['error'] or current['error']
+    return merged
+
+
+def _stamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def apply_status_events(events):
+    """
+    Apply status events to their notifications with one query and one bulk
+    update. Returns (notifications updated, events that matched nothing).
+    """
+    merged = _coalesce(events)
+    if not merged:
+        return 0, []
+    
+    notifications = Notification.objects.filter(external_id__in=list(merged)).only(
+        'id', 'external_id', 'status', 'delivered_at', 'read_at', 'error_message', 'updated_at'
+    )
+    
+    now = timezone.now()
+    changed = []
+    matched = set()
+    for notification in notifications:
+        matched.add(notification.external_id)
+        event = merged[notification.external_id]
+        seen = event['seen']
+        dirty = False
+        
+        if STATUS_RANK[event['status']] > STATUS_RANK[notification.status]:
+            notification.status = event['status']
+            if event['error']:
+                notification.error_message = event['error']
+            dirty = True
+        
+        # A read receipt implies delivery, even if that callback was lost
+        delivered = seen.get('delivered', seen.get('read'))
+        if delivered and not notification.delivered_at:
+            notification.delivered_at = _stamp(delivered)
+            dirty = True
+        if 'read' in seen and not notification.read_at:
+            notification.read_at = _stamp(seen['read'])
+            dirty = True
+        
+        if dirty:
+            notification.updated_at = now
+            changed.append(notification)
+    
+    if changed:
+        Notification.objects.bulk_update(
+            changed,
+            ['status', 'delivered_at', 'read_at', 'error_message', 'updated_at'],
+            batch_size=STATUS_BATCH_SIZE
+        )
+    
+    unmatched = [event for event in events if event['id'] not in matched]
+    return len(changed), unmatched
+
+
+def drain_status_events(batch_size=STATUS_BATCH_SIZE):
+    """
+    Apply queued status events until the queue is empty. Returns the
+    number of notifications updated.
+    """
+    client = get_redis_client()
+    updated = 0
+    retry = []
+    while True:
+        with client.pipeline() as pipe:
+            pipe.lrange(STATUS_EVENTS_KEY, 0, batch_size - 1)
+            pipe.ltrim(STATUS_EVENTS_KEY, batch_size, -1)
+            raw, _ = pipe.execute()
+        if not raw:
+            break
+        
+        events = [json.loads(item) for item in raw]
+        try:
+            count, unmatched = apply_status_events(events)
+        except Exception:
+            # Put the batch back for the next run rather than dropping it
+            client.rpush(STATUS_EVENTS_KEY, *raw)
+            raise
+        updated += count
+        
+        cutoff = clock.time() - UNMATCHED_EVENT_TTL
+        retry.extend(event for event in unmatched if event['at'] > cutoff)
+        if len(raw) < batch_size:
+            break
+    
+    # Re-queue after the loop so this run does not spin on them
+    if retry:
+        client.rpush(STATUS_EVENTS_KEY, *[json.dumps(event) for event in retry])
+    return updated
@@ -1,31 +1,117 @@
 """
 WhatsApp messaging service using Twilio/Wati API.
+
+The provider (settings.WHATSAPP_PROVIDER: 'twilio', 'wati' or the local
+'fake') is reached over a keep-alive connection pool that lives as long
+as the service, so messages after the first skip the TCP/TLS handshake.
+Every send first takes a token from a Redis token bucket shared by all
+workers, which keeps combined throughput under the provider's limit.
+send_bulk() sends many messages concurrently through the same pool and
+limiter.
+
+Sends also go through a circuit breaker shared by all workers. When the
+provider is failing, the circuit opens and sends return at once with a
+'deferred' result instead of waiting on calls that are sure to fail. The
+outbox parks those messages until the circuit is due to close.
+
+The service is built on first use by get_whatsapp_service(), not at
+import, so importing this module needs no provider credentials.
 """
 import logging
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 from django.conf import settings
-from twilio.rest import Client
-import requests
+
+from apps.core.circuit import CircuitBreaker
+from apps.core.ratelimit import RateLimitTimeout, TokenBucket
+from .providers import ProviderRejected, ProviderThrottled, build_provider
 
 logger = logging.getLogger(__name__)
 
+# Longest a provider's Retry-After is honoured before giving up on a message
+MAX_RETRY_AFTER = 10
+
 
 class WhatsAppService:
     """
-    Service for sending WhatsApp messages via Twilio or Wati.
+    Service for sending WhatsApp messages via Twilio, Wati or the fake provider.
     """
     
-    def __init__(self, provider='twilio'):
+    channel = 'whatsapp'
+    
+    def __init__(self, provider='twilio', backend=None):
         self.provider = provider
+        self.timeout = settings.WHATSAPP_HTTP_TIMEOUT
+        self.concurrency = settings.WHATSAPP_SEND_CONCURRENCY
+        self.rate_limiter = TokenBucket(
+            f"{self.channel}:{provider}",
+            rate=self._rate_limits()[provider]
+        )
+        self.circuit = CircuitBreaker(f"{self.channel}:{provider}", **settings.WHATSAPP_CIRCUIT)
+        self.backend = backend or self._build_backend()
+    
+    def _rate_limits(self):
+        return settings.WHATSAPP_RATE_LIMITS
+    
+    def _build_backend(self):
+        return build_provider(self.provider, self.timeout, self.concurrency)
+    
+    def _throttle(self):
+        """Wait for a send token; returns an error result if none came in time."""
+        try:
+            self.rate_limiter.acquire(timeout=settings.WHATSAPP_RATE_LIMIT_TIMEOUT)
+        except RateLimitTimeout as e:
+            logger.warning(str(e))
+            return {'success': False, 'error': str(e)}
+        return None
+    
+    def _call(self, send, *args):
+        """
+        Run a provider call, retrying once on 429; failures become error
+        results. Refused calls (circuit open) come back marked 'deferred'
+        with the seconds to wait, and rejected messages marked 'permanent'.
+        """
+        allowed, probe, retry_after = self.circuit.allow()
+        if not allowed:
+            return {
+                'success': False,
+                'error': f"{self.provider} circuit open",
+                'deferred': True,
+                'retry_after': retry_after
+            }
+        
+        throttled = self._throttle()
+        if throttled:
+            return throttled
+        
+        try:
+            try:
+                result = send(*args)
+            except ProviderThrottled as e:
+                # Rate limited despite the bucket (another sender on the account): retry once
+                clock.sleep(min(e.retry_after, MAX_RETRY_AFTER))
+                result = send(*args)
+        except ProviderRejected as e:
+            # The provider is up, it just won't take this message
+            self.circuit.record(True, probe)
+            logger.warning(f"{self.channel} message rejected by {self.provider}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'permanent': True
+            }
+        except Exception as e:
+            self.circuit.record(False, probe)
+            logger.error(f"Failed to send {self.channel} message via {self.provider}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
         
-        if provider == 'twilio':
-            self.client = Client(
-                settings.TWILIO_ACCOUNT_SID,
-                settings.TWILIO_AUTH_TOKEN
-            )
-            self.from_number = f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}"
-        else:
-            self.wati_url = settings.WATI_API_URL
-            self.wati_token = settings.WATI_API_TOKEN
+        self.circuit.record(True, probe)
+        return result
     
     def send_message(self, to_number: str, message: str, template_id: str = None) -> dict:
         """
@@ -35,7 +121,7 @@ class WhatsAppService:
             to_number: Recipient's phone number (with country code)
             message: Message body
             template_id: Optional WhatsApp template ID for template messages
-            
+        
         Returns:
             Dict with status and message ID
         """
@@ -43,77 +129,24 @@ class WhatsAppService:
         if not to_number.startswith('+'):
             to_number = f'+{to_number}'
         
-        if self.provider == 'twilio':
-            return self._send_via_twilio(to_number, message, template_id)
-        else:
-            return self._send_via_wati(to_number, message, template_id)
+        return self._call(self.backend.send, to_number, message, template_id)
     
-    def _send_via_twilio(self, to_number: str, message: str, template_id: str = None) -> dict:
-        """Send message via Twilio WhatsApp API."""
-        try:
-            msg = self.client.messages.create(
-                body=message,
-                from_=self.from_number,
-                to=f"whatsapp:{to_number}"
-            )
-            
-            logger.info(f"WhatsApp message sent via Twilio: {msg.sid}")
-            
-            return {
-                'success': True,
-                'message_id': msg.sid,
-                'status': msg.status
-            }
-        except Exception as e:
-            logger.error(f"Failed to send WhatsApp via Twilio: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
-    
-    def _send_via_wati(self, to_number: str, message: str, template_id: str = None) -> dict:
-        """Send message via Wati API."""
-        try:
-            headers = {
-                'Authorization': f'Bearer {self.wati_token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Remove + from number for Wati
-            clean_number = to_number.replace('+', '')
-            
-            if template_id:
-                # Send template message
-                url = f"{self.wati_url}/api/v1/sendTemplateMessage"
-                payload = {
-                    'whatsappNumber': clean_number,
-                    'templateName': template_id,
-                    'broadcast_name': 'HMS Notification'
-                }
-            else:
-                # Send session message
-                url = f"{self.wati_url}/api/v1/sendSessionMessage/{clean_number}"
-                payload = {
-                    'messageText': message
-                }
-            
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            logger.info(f"WhatsApp message sent via Wati: {data}")
-            
-            return {
-                'success': True,
-                'message_id': data.get('id', ''),
-                'status': 'sent'
-            }
-        except Exception as e:
-            logger.error(f"Failed to send WhatsApp via Wati: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+    def send_bulk(self, messages, concurrency: int = None) -> list:
+        """
+        Send many messages concurrently.
+        
+        Args:
+            messages: List of (to_number, message) pairs
+            concurrency: Most messages in flight (default WHATSAPP_SEND_CONCURRENCY)
+        
+        Returns:
+            List of send_message results, in the order of ``messages``
+        """
+        if not messages:
+            return []
+        workers = min(concurrency or self.concurrency, len(messages))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda pair: self.send_message(*pair), messages))
     
     def send_template_message(
         self,
@@ -128,36 +161,24 @@ class WhatsAppService:
             to_number: Recipient's phone number
             template_name: WhatsApp approved template name
             template_params: List of parameter values for the template
-            
+        
         Returns:
             Dict with status and message ID
         """
         if not to_number.startswith('+'):
             to_number = f'+{to_number}'
         
-        if self.provider == 'twilio':
-            try:
-                # Twilio uses content SID for templates
-                msg = self.client.messages.create(
-                    content_sid=template_name,
-                    content_variables=dict(enumerate(template_params or [])),
-                    from_=self.from_number,
-                    to=f"whatsapp:{to_number}"
-                )
-                
-                return {
-                    'success': True,
-                    'message_id': msg.sid,
-                    'status': msg.status
-                }
-            except Exception as e:
-                logger.error(f"Failed to send template via Twilio: {str(e)}")
-                return {'success': False, 'error': str(e)}
-        else:
-            return self._send_via_wati(to_number, '', template_name)
+        return self._call(self.backend.send_template, to_number, template_name, template_params)
+
+
+@lru_cache(maxsize=None)
+def get_whatsapp_service() -> WhatsAppService:
+    """Get the process-wide WhatsApp service, creating it on first use."""
+    return WhatsAppService(provider=settings.WHATSAPP_PROVIDER)
 
 
-# Singleton instance
-whatsapp_service = WhatsAppService(
-    provider='twilio' if settings.TWILIO_ACCOUNT_SID else 'wati'
-)
+def __getattr__(name):
+    # Keeps `from .whatsapp import whatsapp_service` working, lazily
+    if name == 'whatsapp_service':
+        return get_whatsapp_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,29 @@
+"""
+factory-boy factories for patients and waitlist entries.
+"""
+from datetime import date, timedelta
+
+import factory
+
+from apps.clinics.factories import ClinicFactory
+from apps.doctors.factories import DoctorFactory
+from apps.users.factories import UserFactory
+from .models import Patient, Waitlist
+
+
+class PatientFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Patient
+    
+    user = factory.SubFactory(UserFactory, user_type='patient')
+    gender = 'female'
+
+
+class WaitlistFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Waitlist
+    
+    patient = factory.SubFactory(PatientFactory)
+    doctor = factory.SubFactory(DoctorFactory)
+    clinic = factory.SubFactory(ClinicFactory)
+    preferred_date = factory.LazyFunction(lambda: date.today() + timedelta(days=1))
@@ -3,7 +3,7 @@ Patient models for HMS.
 """
 from django.db import models
 from django.conf import settings
-from apps.core.models import BaseModel
+from apps.core.models import BaseModel, FieldTrackerMixin
 from apps.core.qr_utils import generate_qr_base64
 
 
@@ -164,7 +164,7 @@ class PatientChronicCondition(BaseModel):
         return f"{self.patient.user.full_name} - {self.condition_name}"
 
 
-class Waitlist(BaseModel):
+class Waitlist(FieldTrackerMixin, BaseModel):
     """
     Waitlist for appointment slots.
     """
@@ -187,10 +187,18 @@ class Waitlist(BaseModel):
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
     notification_sent_at = models.DateTimeField(null=True, blank=True)
+    offer_expires_at = models.DateTimeField(null=True, blank=True)
+    
+    tracked_fields = ('status',)
     
     class Meta:
         db_table = 'patient_waitlist'
         ordering = ['preferred_date', 'created_at']
+        indexes = [
+            # Slot matching (see apps.patients.waitlist)
+            models.Index(fields=['doctor', 'clinic', 'preferred_date', 'status', 'created_at']),
+            models.Index(fields=['status', 'offer_expires_at']),
+        ]
     
     def __str__(self):
         return f"{self.patient.user.full_name} - Waitlist for Dr. {self.doctor.user.full_name}"
@@ -100,6 +100,6 @@ class WaitlistSerializer(serializers.ModelSerializer):
             'id', 'patient', 'patient_name', 'doctor', 'doctor_name',
             'clinic', 'clinic_name', 'preferred_date', 'preferred_time_start',
             'preferred_time_end', 'reason', 'status', 'notification_sent_at',
-            'created_at'
+            'offer_expires_at', 'created_at'
         ]
-        read_only_fields = ['id', 'notification_sent_at', 'created_at']
+        read_only_fields = ['id', 'notification_sent_at', 'offer_expires_at', 'created_at']
@@ -0,0 +1,20 @@
+"""
+Celery tasks for patient waitlist maintenance.
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def expire_waitlist_offers():
+    """
+    Return lapsed slot offers to the waitlist and expire past-dated entries.
+    Run every few minutes via Celery Beat.
+    """
+    from .waitlist import expire_offers
+    
+    lapsed, expired = expire_offers()
+    if lapsed or expired:
+        logger.info(f"Waitlist: {lapsed} offers lapsed, {expired} entries expired")
@@ -0,0 +1,23 @@
+"""
+Waitlist offers are only made for slots that are still free.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from apps.appointments.factories import AppointmentFactory
+from apps.patients.waitlist import slot_is_free
+
+pytestmark = pytest.mark.django_db
+
+
+def test_slot_rebooked_before_the_offer_is_not_free():
+    day = date.today() + timedelta(days=1)
+    appointment = AppointmentFactory(appointment_date=day, start_time=time(9, 0), end_time=time(9, 30), status='scheduled')
+    
+    assert not slot_is_free(appointment.doctor_id, day, time(9, 15), time(9, 45))
+    assert slot_is_free(appointment.doctor_id, day, time(9, 30), time(10, 0))
+    
+    appointment.status = 'cancelled'
+    appointment.save()
+    assert slot_is_free(appointment.doctor_id, day, time(9, 0), time(9, 30))
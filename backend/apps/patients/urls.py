@@ -19,7 +19,6 @@ urlpatterns = [
     path('search/', PatientSearchView.as_view(), name='search'),
     path('qr-code/', PatientQRCodeView.as_view(), name='qr_code'),
     path('list/', PatientListView.as_view(), name='list'),
-    path('<str:patient_id>/', PatientDetailView.as_view(), name='detail'),
     
     # Allergies
     path('allergies/', PatientAllergyListCreateView.as_view(), name='allergy_list'),
@@ -36,4 +35,7 @@ urlpatterns = [
     # Waitlist
     path('waitlist/', WaitlistListCreateView.as_view(), name='waitlist_list'),
     path('waitlist/<uuid:pk>/', WaitlistDetailView.as_view(), name='waitlist_detail'),
+    
+    # Last, so the catch-all patient ID doesn't shadow the routes above
+    path('<str:patient_id>/', PatientDetailView.as_view(), name='detail'),
 ]
@@ -49,7 +49,7 @@ class PatientListView(generics.ListAPIView):
     """List all patients (for doctors)."""
     serializer_class = PatientListSerializer
     permission_classes = [permissions.IsAuthenticated, IsDoctor]
-    queryset = Patient.objects.filter(is_active=True)
+    queryset = Patient.objects.filter(is_active=True).select_related('user')
     filterset_fields = ['blood_type', 'gender']
     search_fields = ['user__first_name', 'user__last_name', 'patient_id']
 
@@ -181,10 +181,12 @@ class WaitlistListCreateView(generics.ListCreateAPIView):
         user = self.request.user
         if user.user_type == 'patient':
             patient = get_object_or_404(Patient, user=user)
-            return Waitlist.objects.filter(patient=patient)
+            queryset = Waitlist.objects.filter(patient=patient)
         elif user.user_type == 'doctor':
-            return Waitlist.objects.filter(doctor__user=user)
-        return Waitlist.objects.none()
+            queryset = Waitlist.objects.filter(doctor__user=user)
+        else:
+            return Waitlist.objects.none()
+        return queryset.select_related('patient__user', 'doctor__user', 'clinic')
     
     def perform_create(self, serializer):
         patient = get_object_or_404(Patient, user=self.request.user)
@@ -195,4 +197,4 @@ class WaitlistDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a waitlist entry."""
     serializer_class = WaitlistSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Waitlist.objects.all()
+    queryset = Waitlist.objects.select_related('patient__user', 'doctor__user', 'clinic')
@@ -0,0 +1,94 @@
+"""
+Waitlist matching.
+
+When a slot frees up, find_matches() picks the waiting entries for that
+doctor, clinic and date whose preferred time window contains the slot. An
+entry with no window accepts any time, and one with only a start or end
+is open on the other side. Entries are ranked by how long they have
+waited. One query, served by the (doctor, clinic, preferred_date, status,
+created_at) index, loads the candidates along with the patient, doctor
+and clinic their offer message needs. slot_is_free() lets the caller
+skip a slot that was booked again before its offer went out.
+
+Offered entries are marked notified with one UPDATE that also sets
+offer_expires_at. expire_offers() puts lapsed offers back in the queue.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Waitlist
+
+# Patients offered each freed slot (first to book gets it)
+OFFER_SIZE = 3
+OFFER_TTL = timedelta(minutes=30)
+
+
+def slot_is_free(doctor_id, day, start_time, end_time=None):
+    """Whether no active booking of the doctor overlaps the slot; it may have been booked again since it freed up."""
+    from apps.appointments.models import BOOKED_STATUSES, Appointment
+    starts_before_end = Q(start_time__lt=end_time) if end_time else Q(start_time__lte=start_time)
+    return not Appointment.objects.filter(
+        starts_before_end,
+        doctor_id=doctor_id,
+        appointment_date=day,
+        status__in=BOOKED_STATUSES,
+        is_active=True,
+        end_time__gt=start_time
+    ).exists()
+
+
+def find_matches(doctor_id, clinic_id, day, start_time, end_time=None, limit=OFFER_SIZE, lock=False):
+    """
+    Waiting entries whose date and time window fit the slot, longest
+    waiting first. With ``lock``, rows are locked (skipping ones another
+    matcher holds); call inside a transaction.
+    """
+    end_time = end_time or start_time
+    matches = Waitlist.objects.filter(
+        doctor_id=doctor_id,
+        clinic_id=clinic_id,
+        preferred_date=day,
+        status='waiting',
+        is_active=True
+    ).filter(
+        Q(preferred_time_start__isnull=True) | Q(preferred_time_start__lte=start_time),
+        Q(preferred_time_end__isnull=True) | Q(preferred_time_end__gte=end_time)
+    )
+    if lock:
+        matches = matches.select_for_update(skip_locked=True, of=('self',))
+    return list(
+        matches.select_related('patient__user', 'doctor__user', 'clinic').order_by('created_at')[:limit]
+    )
+
+
+def mark_offered(entries):
+    """Mark entries as offered a slot, in one UPDATE."""
+    now = timezone.now()
+    return Waitlist.objects.filter(id__in=[entry.id for entry in entries]).update(
+        status='notified',
+        notification_sent_at=now,
+        offer_expires_at=now + OFFER_TTL,
+        updated_at=now
+    )
+
+
+def expire_offers():
+    """
+    Put entries whose offer lapsed back to waiting, so they are matched
+    again, and expire entries whose preferred date has passed.
+    Returns (offers lapsed, entries expired).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        expired = Waitlist.objects.filter(
+            status__in=['waiting', 'notified'],
+            preferred_date__lt=date.today()
+        ).update(status='expired', offer_expires_at=None, updated_at=now)
+        lapsed = Waitlist.objects.filter(
+            status='notified',
+            offer_expires_at__lt=now
+        ).update(status='waiting', offer_expires_at=None, updated_at=now)
+    return lapsed, expired
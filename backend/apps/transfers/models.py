@@ -6,11 +6,11 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from apps.core.models import BaseModel
+from apps.core.models import BaseModel, FieldTrackerMixin
 import secrets
 
 
-class PatientAccess(BaseModel):
+class PatientAccess(FieldTrackerMixin, BaseModel):
     """
     Tracks which doctors have access to which patients' records.
     Access is granted, not data copied (federated approach).
@@ -65,6 +65,8 @@ class PatientAccess(BaseModel):
     # Rejection/Revocation reason
     rejection_reason = models.TextField(blank=True)
     
+    tracked_fields = ('status',)
+    
     class Meta:
         db_table = 'patient_access'
         ordering = ['-requested_at']
@@ -0,0 +1,21 @@
+"""
+factory-boy factories for users.
+"""
+import factory
+from django.contrib.auth.hashers import make_password
+
+from .models import User
+
+
+class UserFactory(factory.django.DjangoModelFactory):
+    """User with an unusable password, so seeding many skips password hashing."""
+    
+    class Meta:
+        model = User
+    
+    email = factory.Sequence(lambda n: f"user{n}@example.com")
+    first_name = factory.Faker('first_name')
+    last_name = factory.Faker('last_name')
+    phone_number = factory.Sequence(lambda n: f"+91{n:010d}")
+    user_type = 'patient'
+    password = factory.LazyFunction(lambda: make_password(None))
@@ -0,0 +1,46 @@
+"""
+Shared pytest fixtures.
+
+Tests run against the configured database but never need Redis: the cache
+is swapped for a per-process local one and queue events stay in-process.
+Per-process lookups of database rows (notification templates) are
+dropped between tests, since each test's rows are rolled back.
+
+Query-budget cases report their counts and timings, printed as a table in
+the terminal summary.
+"""
+import pytest
+from django.core.cache import cache
+
+from apps.notifications import templates
+
+
+@pytest.fixture(autouse=True)
+def local_services(settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.QUEUE_EVENTS_BACKEND = 'local'
+    cache.clear()
+    templates._by_type.clear()
+    yield
+    cache.clear()
+
+
+def pytest_terminal_summary(terminalreporter):
+    rows = []
+    for reports in terminalreporter.stats.values():
+        for report in reports:
+            if getattr(report, 'when', None) != 'call':
+                continue
+            for name, value in report.user_properties:
+                if name == 'query_budget':
+                    rows.append((report.nodeid.rsplit('[', 1)[-1].rstrip(']'), value, report.outcome))
+    if not rows:
+        return
+    
+    sizes = rows[0][1]['sizes']
+    terminalreporter.section('query budgets')
+    header = [f'q@{size}' for size in sizes] + [f'ms@{size}' for size in sizes] + ['budget']
+    terminalreporter.write_line(f"{'endpoint':<30}" + ''.join(f'{column:>9}' for column in header) + '  status')
+    for endpoint, value, outcome in sorted(rows):
+        cells = [str(count) for count in value['counts']] + [f'{ms:.1f}' for ms in value['ms']] + [str(value['budget'])]
+        terminalreporter.write_line(f'{endpoint:<30}' + ''.join(f'{cell:>9}' for cell in cells) + f'  {outcome}')
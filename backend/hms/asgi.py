@@ -1,8 +1,30 @@
 """
 ASGI config for HMS project.
+
+The ASGI process serves only the long-lived server-sent event streams
+(e.g. /api/appointments/queue/stream/) and the health check. The REST API
+runs on WSGI (hms.wsgi): under ASGI, Django reads sync streaming responses
+such as the audit export and calendar feeds into memory before sending
+them. Run with an ASGI server such as
+`gunicorn hms.asgi:application -k uvicorn.workers.UvicornWorker`.
 """
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hms.settings')
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Paths served here; everything else belongs to the WSGI API
+ASGI_PATHS = ('/api/appointments/queue/stream/', '/api/health/')
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASGI_PATHS:
+        await send({
+            'type': 'http.response.start',
+            'status': 404,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': b'{"error": "Not found"}'})
+        return
+    await django_application(scope, receive, send)
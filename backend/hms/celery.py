@@ -1,15 +1,63 @@
 """
 Celery configuration for HMS project.
+
+Tasks run on three queues, so a burst of bulk work never delays
+time-critical messages:
+
+    realtime      booking confirmations, reschedules, cancellations and
+                  waitlist offers (offers expire in 30 minutes)
+    bulk          daily reminders, outbox sweeps, status callbacks
+    maintenance   housekeeping such as series materialisation
+
+Run one worker per queue so each gets its own concurrency and prefetch.
+Realtime workers reserve one task at a time so a long task never holds
+back others already fetched:
+
+    celery -A hms worker -Q realtime -n realtime@%h -c 8 --prefetch-multiplier 1 -O fair
+    celery -A hms worker -Q bulk -n bulk@%h -c 4 --prefetch-multiplier 4
+    celery -A hms worker -Q maintenance -n maintenance@%h -c 1
+
+Time spent waiting in each queue is recorded and checked against
+TASK_QUEUE_SLOS (see apps.core.task_metrics, `manage.py queue_latency`).
 """
 import os
 from celery import Celery
+from kombu import Queue
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hms.settings')
 
 app = Celery('hms')
 app.config_from_object('django.conf:settings', namespace='CELERY')
+
+app.conf.task_queues = (
+    Queue('realtime'),
+    Queue('bulk'),
+    Queue('maintenance'),
+)
+app.conf.task_default_queue = 'bulk'
+app.conf.task_routes = {
+    'apps.notifications.tasks.send_appointment_confirmation': {'queue': 'realtime'},
+    'apps.notifications.tasks.send_appointment_reschedule_notification': {'queue': 'realtime'},
+    'apps.notifications.tasks.send_appointment_cancellation_notification': {'queue': 'realtime'},
+    'apps.notifications.tasks.notify_waitlist_patients': {'queue': 'realtime'},
+    'apps.notifications.tasks.dispatch_realtime_notifications': {'queue': 'realtime'},
+    'apps.notifications.tasks.send_appointment_reminder': {'queue': 'bulk'},
+    'apps.notifications.tasks.send_daily_appointment_reminders': {'queue': 'bulk'},
+    'apps.notifications.tasks.dispatch_notification_outbox': {'queue': 'bulk'},
+    'apps.notifications.tasks.apply_notification_status_events': {'queue': 'bulk'},
+    'apps.appointments.tasks.materialize_appointment_series': {'queue': 'maintenance'},
+    'apps.patients.tasks.expire_waitlist_offers': {'queue': 'maintenance'},
+}
+
+# Every task is fire-and-forget; nothing reads results back
+app.conf.task_ignore_result = True
+app.conf.worker_prefetch_multiplier = 1
+
 app.autodiscover_tasks()
 
+# Queue wait metrics (signal handlers)
+from apps.core import task_metrics  # noqa: E402,F401
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
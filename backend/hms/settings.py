@@ -5,6 +5,7 @@ Django settings for HMS (Healthcare Management System) project.
 import os
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 import environ
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -71,6 +72,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'apps.audit.middleware.AuditMiddleware',
+    'apps.core.middleware.TaskDispatchMiddleware',
 ]
 
 ROOT_URLCONF = 'hms.urls'
@@ -203,6 +205,58 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
+CELERY_BEAT_SCHEDULE = {
+    'materialize-appointment-series': {
+        'task': 'apps.appointments.tasks.materialize_appointment_series',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'send-daily-appointment-reminders': {
+        'task': 'apps.notifications.tasks.send_daily_appointment_reminders',
+        'schedule': crontab(hour=12, minute=30),  # 18:00 IST
+    },
+    'dispatch-notification-outbox': {
+        'task': 'apps.notifications.tasks.dispatch_notification_outbox',
+        'schedule': 60.0,
+    },
+    'apply-notification-status-events': {
+        'task': 'apps.notifications.tasks.apply_notification_status_events',
+        'schedule': 10.0,
+    },
+    'expire-waitlist-offers': {
+        'task': 'apps.patients.tasks.expire_waitlist_offers',
+        'schedule': 300.0,
+    },
+}
+
+# Longest acceptable wait in each Celery queue, in seconds (see hms/celery.py)
+TASK_QUEUE_SLOS = {
+    'realtime': env.int('REALTIME_QUEUE_SLO', default=5),
+    'bulk': env.int('BULK_QUEUE_SLO', default=300),
+    'maintenance': env.int('MAINTENANCE_QUEUE_SLO', default=3600),
+}
+
+# Cache (shared by web and worker processes)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('CACHE_URL', default=REDIS_URL),
+    }
+}
+
+# Live queue event fan-out: 'redis' (multi-process) or 'local' (single process)
+QUEUE_EVENTS_BACKEND = env('QUEUE_EVENTS_BACKEND', default='redis')
+
+# Earliest-slot search limits
+SLOT_SEARCH_MAX_DAYS = env.int('SLOT_SEARCH_MAX_DAYS', default=14)
+SLOT_SEARCH_BUDGET_MS = env.int('SLOT_SEARCH_BUDGET_MS', default=500)
+
+# Daily reminder run: appointments claimed per chunk
+REMINDER_BATCH_SIZE = env.int('REMINDER_BATCH_SIZE', default=500)
+
+# Failed notification sends are retried with jittered exponential backoff:
+# about NOTIFICATION_RETRY_BASE seconds at first, at most NOTIFICATION_RETRY_MAX
+NOTIFICATION_RETRY_BASE = env.int('NOTIFICATION_RETRY_BASE', default=120)
+NOTIFICATION_RETRY_MAX = env.int('NOTIFICATION_RETRY_MAX', default=900)
 
 # AWS S3 Configuration
 AWS_ACCESS_KEY_ID = env('AWS_ACCESS_KEY_ID', default='')
@@ -229,10 +283,76 @@ else:
 TWILIO_ACCOUNT_SID = env('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = env('TWILIO_AUTH_TOKEN', default='')
 TWILIO_WHATSAPP_NUMBER = env('TWILIO_WHATSAPP_NUMBER', default='')
+TWILIO_SMS_NUMBER = env('TWILIO_SMS_NUMBER', default='')
+
+# Public base URL of this API (e.g. https://hms-backend.onrender.com). Provider
+# status callbacks are addressed to it and their signatures checked against it.
+PUBLIC_API_URL = env('PUBLIC_API_URL', default='').rstrip('/')
 
 # Wati API Configuration (Alternative to Twilio)
 WATI_API_URL = env('WATI_API_URL', default='')
 WATI_API_TOKEN = env('WATI_API_TOKEN', default='')
+WATI_WEBHOOK_TOKEN = env('WATI_WEBHOOK_TOKEN', default='')
+
+# Messaging provider: 'twilio', 'wati' or 'fake' (in-process, no network)
+WHATSAPP_PROVIDER = env('WHATSAPP_PROVIDER', default='twilio' if TWILIO_ACCOUNT_SID else 'wati')
+FAKE_WHATSAPP = {
+    'latency_ms': env.float('FAKE_WHATSAPP_LATENCY_MS', default=50),
+    'error_rate': env.float('FAKE_WHATSAPP_ERROR_RATE', default=0.0),
+    'throttle_rate': env.float('FAKE_WHATSAPP_THROTTLE_RATE', default=0.0),
+    'read_rate': env.float('FAKE_WHATSAPP_READ_RATE', default=0.5),
+}
+
+# WhatsApp transport: messages per second per provider (shared by all
+# workers), messages in flight per bulk send, and timeouts in seconds
+WHATSAPP_RATE_LIMITS = {
+    'twilio': env.int('TWILIO_MESSAGES_PER_SECOND', default=80),
+    'wati': env.int('WATI_MESSAGES_PER_SECOND', default=10),
+    'fake': env.int('FAKE_MESSAGES_PER_SECOND', default=1000),
+}
+WHATSAPP_SEND_CONCURRENCY = env.int('WHATSAPP_SEND_CONCURRENCY', default=16)
+WHATSAPP_HTTP_TIMEOUT = env.int('WHATSAPP_HTTP_TIMEOUT', default=10)
+WHATSAPP_RATE_LIMIT_TIMEOUT = env.int('WHATSAPP_RATE_LIMIT_TIMEOUT', default=30)
+
+# WhatsApp circuit breaker: opens when error_rate of at least min_calls sends
+# in a window (seconds) fail, for open_seconds, doubling on failed probes
+WHATSAPP_CIRCUIT = {
+    'error_rate': env.float('WHATSAPP_CIRCUIT_ERROR_RATE', default=0.5),
+    'min_calls': env.int('WHATSAPP_CIRCUIT_MIN_CALLS', default=20),
+    'window': env.int('WHATSAPP_CIRCUIT_WINDOW', default=60),
+    'open_seconds': env.int('WHATSAPP_CIRCUIT_OPEN_SECONDS', default=30),
+    'max_open_seconds': env.int('WHATSAPP_CIRCUIT_MAX_OPEN_SECONDS', default=600),
+}
+
+# SMS shares the WhatsApp transport settings above (concurrency, timeouts,
+# circuit thresholds) but has its own provider and rate limit
+SMS_PROVIDER = env('SMS_PROVIDER', default='twilio')
+SMS_RATE_LIMITS = {
+    'twilio': env.int('TWILIO_SMS_PER_SECOND', default=10),
+    'fake': env.int('FAKE_SMS_PER_SECOND', default=1000),
+}
+
+# Email notifications go out over SMTP, one connection per outbox batch
+EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = env('EMAIL_HOST', default='')
+EMAIL_PORT = env.int('EMAIL_PORT', default=587)
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=10)
+DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='HMS <noreply@hms.local>')
+
+# Channels notifications may use, in order of preference. Once another
+# channel is enabled, WhatsApp is only used for users who opted in and
+# everyone else gets the first other channel they can be reached on.
+# By default SMS and email are on once configured.
+NOTIFICATION_CHANNELS = env.list('NOTIFICATION_CHANNELS', default=[
+    channel for channel, configured in [
+        ('whatsapp', True),
+        ('sms', bool(TWILIO_SMS_NUMBER)),
+        ('email', bool(EMAIL_HOST)),
+    ] if configured
+])
 
 # Encryption Key for AES-256 (32 bytes for AES-256)
 AES_ENCRYPTION_KEY = env('AES_ENCRYPTION_KEY', default='your-32-byte-encryption-key-here')
@@ -252,6 +372,8 @@ SPECTACULAR_SETTINGS = {
 
 # Security Settings for Production
 if not DEBUG:
+    # TLS ends at the load balancer, which passes the original scheme on
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
     SECURE_SSL_REDIRECT = True
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True